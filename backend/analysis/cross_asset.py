@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class RollingCrossStats:
+    """
+    Rolling pairwise covariance/correlation of N return series over the last `window` bars.
+
+    Pairwise-complete sums are kept as N x N matrices (pair counts, sums of x_i where x_j
+    is present, sums of x_i^2 likewise, and cross products), so adding a bar and dropping
+    the one leaving the window is a handful of outer products: O(N^2) per bar, independent
+    of the window length. Missing returns (NaN) only drop out of the pairs they belong to.
+    Sums are rebuilt from the ring buffer every `window` bars to shed floating-point drift.
+    """
+
+    def __init__(self, n: int, window: int):
+        self.n = n
+        self.window = window
+        self.returns = np.full((window, n), np.nan) # Ring buffer of return rows
+        self.size = 0
+        self._next = 0
+        self._pushes = 0
+        self.count = np.zeros((n, n))
+        self.sum_x = np.zeros((n, n))   # [i, j]: sum of x_i over bars where both are present
+        self.sum_x2 = np.zeros((n, n))  # [i, j]: sum of x_i^2, same bars
+        self.sum_xy = np.zeros((n, n))  # [i, j]: sum of x_i * x_j
+
+    def _apply(self, row: np.ndarray, sign: float):
+        valid = np.isfinite(row)
+        x = np.where(valid, row, 0.0)
+        v = valid.astype(np.float64)
+        self.count += sign * np.outer(v, v)
+        self.sum_x += sign * np.outer(x, v)
+        self.sum_x2 += sign * np.outer(x * x, v)
+        self.sum_xy += sign * np.outer(x, x)
+
+    def push(self, row: np.ndarray):
+        if self.size == self.window:
+            self._apply(self.returns[self._next], -1.0)
+        self.returns[self._next] = row
+        self._apply(row, 1.0)
+        self._next = (self._next + 1) % self.window
+        self.size = min(self.size + 1, self.window)
+        self._pushes += 1
+        if self._pushes % self.window == 0:
+            self._rebuild()
+
+    def _rebuild(self):
+        rows = self.returns[:self.size]
+        valid = np.isfinite(rows)
+        x = np.where(valid, rows, 0.0)
+        v = valid.astype(np.float64)
+        self.count = v.T @ v
+        self.sum_x = x.T @ v
+        self.sum_x2 = (x * x).T @ v
+        self.sum_xy = x.T @ x
+
+    def matrices(self, min_periods: int = 20) -> Dict[str, np.ndarray]:
+        """
+        Sample covariance and correlation (NaN where a pair has fewer than min_periods bars)
+        and each series' own variance.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            count = np.where(self.count >= min_periods, self.count, np.nan)
+            cov = (self.sum_xy - self.sum_x * self.sum_x.T / count) / (count - 1)
+            var_pair = (self.sum_x2 - self.sum_x ** 2 / count) / (count - 1) # var of i over the pair's bars
+            corr = cov / np.sqrt(var_pair * var_pair.T)
+        np.clip(corr, -1.0, 1.0, out=corr)
+        return {"cov": cov, "corr": corr, "var_pair": var_pair, "var": np.diag(var_pair).copy()}
+
+
+class CrossAssetAnalytics:
+    """
+    Correlation, beta-to-benchmark and volatility across a universe of symbols, updated
+    once per closed bar.
+
+    Closes are aligned into a (bars x symbols) array: seeded from stored bars, then one row
+    per bar from hot-store bar closes. Each new row is an O(N^2) update of the rolling sums,
+    and the resulting matrices and their JSON are built off the event loop once per bar (`publish`).
+
+    A return is only taken between consecutive bars: a symbol missing from a bar has no
+    return for it or the next one, and bars nobody reported count as empty rows, so the
+    window stays `window` bars long (log(close).diff() over a complete index, in pandas terms).
+    """
+
+    def __init__(self, universe: List[str], benchmark: str = "BTC/USDT", window: int = 168,
+                 bar_seconds: int = 3600, grace_seconds: float = 15.0, min_periods: int = 20):
+        self.universe = list(dict.fromkeys(universe + [benchmark]))
+        self.index = {symbol: i for i, symbol in enumerate(self.universe)}
+        self.benchmark = benchmark
+        self.window = window
+        self.bar_ms = bar_seconds * 1000
+        self.grace_seconds = grace_seconds
+        self.min_periods = min_periods
+        self.periods_per_year = 365 * 24 * 3600 / bar_seconds # Crypto trades around the clock
+
+        n = len(self.universe)
+        self.stats = RollingCrossStats(n, window)
+        self.last_close = np.full(n, np.nan) # Closes of the last committed bar (NaN if missing)
+        self.last_bar: Optional[int] = None  # Open time of the last committed bar, ms
+        self._pending: Dict[int, np.ndarray] = {} # bar open time -> closes reported so far
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._payload: Optional[bytes] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_update_seconds: Optional[float] = None
+        self.last_publish_seconds: Optional[float] = None
+
+    # --- Feeding ---
+
+    def seed(self, closes: pd.DataFrame):
+        """
+        Loads history: closes indexed by bar open time, one column per symbol (oldest first).
+        """
+        closes = closes.reindex(columns=self.universe).sort_index()
+        timestamps = pd.to_datetime(closes.index).values.astype('datetime64[ms]').astype(np.int64)
+        for ts, row in zip(timestamps, closes.to_numpy(dtype=np.float64)):
+            self._commit(int(ts), row)
+
+    def on_bar_close(self, symbol: str, bar: dict):
+        """
+        Hot-store callback; the row for a bar is committed once the grace period has passed.
+        """
+        i = self.index.get(symbol)
+        if i is None or (self.last_bar is not None and bar['timestamp'] <= self.last_bar):
+            return
+        row = self._pending.get(bar['timestamp'])
+        if row is None:
+            row = self._pending[bar['timestamp']] = np.full(len(self.universe), np.nan)
+        row[i] = bar['close']
+
+    def _commit(self, timestamp: int, closes: np.ndarray):
+        if self.last_bar is not None and timestamp <= self.last_bar:
+            return
+        if self.last_bar is not None and timestamp - self.last_bar > self.bar_ms:
+            # Bars with no closes at all; beyond a window's worth they'd all drop out again
+            for _ in range(min((timestamp - self.last_bar) // self.bar_ms - 1, self.window)):
+                self.stats.push(np.full(len(self.universe), np.nan))
+            self.last_close = np.full(len(self.universe), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(closes / self.last_close)
+        self.last_close = np.array(closes, dtype=np.float64)
+        self.last_bar = timestamp
+        self.stats.push(returns)
+
+    def flush(self, now_ms: Optional[int] = None) -> bool:
+        """
+        Commits pending rows of bars that closed more than the grace period ago.
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        due = sorted(ts for ts in self._pending if ts + self.bar_ms + self.grace_seconds * 1000 <= now_ms)
+        if not due:
+            return False
+        started = time.perf_counter()
+        for ts in due:
+            self._commit(ts, self._pending.pop(ts))
+        self.version += 1
+        self.updated_at = time.time()
+        self.last_update_seconds = time.perf_counter() - started
+        return True
+
+    # --- Reading ---
+
+    def publish(self):
+        """
+        Builds the snapshot and its JSON (300 x 300 matrices aren't cheap to encode) and
+        swaps both in at once. Blocking: the updater runs it on a worker thread after each
+        flush, so requests never build or serialize the matrices.
+        """
+        started = time.perf_counter()
+        m = self.stats.matrices(self.min_periods)
+        b = self.index[self.benchmark]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = m["cov"][:, b] / m["var_pair"][b, :] # var of the benchmark over each pair's bars
+        volatility = np.sqrt(m["var"] * self.periods_per_year) * 100
+        snapshot = {
+            "symbols": self.universe,
+            "benchmark": self.benchmark,
+            "window": self.window,
+            "bars": self.stats.size,
+            "as_of": pd.Timestamp(self.last_bar, unit='ms').isoformat() if self.last_bar else None,
+            "version": self.version,
+            "volatility": _clean(volatility), # Annualized %, per symbol
+            "beta": _clean(beta),
+            "correlation": _clean(m["corr"]),
+            "covariance": _clean(m["cov"]),
+        }
+        payload = json.dumps(snapshot, allow_nan=False).encode()
+        self._snapshot, self._payload = snapshot, payload
+        self.last_publish_seconds = time.perf_counter() - started
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Latest published matrices as plain lists.
+        """
+        if self._snapshot is None:
+            self.publish() # Nothing published yet (not started)
+        return self._snapshot
+
+    def payload(self) -> bytes:
+        """
+        JSON of the latest published snapshot.
+        """
+        if self._payload is None:
+            self.publish()
+        return self._payload
+
+    def subset(self, symbols: List[str]) -> Dict[str, Any]:
+        snapshot = self.snapshot()
+        idx = [self.index[s] for s in symbols if s in self.index]
+        pick = lambda matrix: [[matrix[i][j] for j in idx] for i in idx]
+        return {
+            **{k: snapshot[k] for k in ("benchmark", "window", "bars", "as_of", "version")},
+            "symbols": [self.universe[i] for i in idx],
+            "volatility": [snapshot["volatility"][i] for i in idx],
+            "beta": [snapshot["beta"][i] for i in idx],
+            "correlation": pick(snapshot["correlation"]),
+            "covariance": pick(snapshot["covariance"]),
+        }
+
+    def volatility_of(self, symbol: str) -> Optional[float]:
+        i = self.index.get(symbol)
+        return self.snapshot()["volatility"][i] if i is not None else None
+
+    def beta_of(self, symbol: str) -> Optional[float]:
+        i = self.index.get(symbol)
+        return self.snapshot()["beta"][i] if i is not None else None
+
+    # --- Lifecycle ---
+
+    async def load_history(self):
+        """
+        Seeds from the last `window` + 1 stored bars of every symbol in one query.
+        """
+        from data.db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT symbol, timestamp, close FROM market_bars
+                WHERE timeframe = $1 AND symbol = ANY($2::varchar[])
+                  AND timestamp >= now() AT TIME ZONE 'UTC' - make_interval(secs => $3)
+                  AND timestamp < now() AT TIME ZONE 'UTC' - make_interval(secs => $4)
+            """, _timeframe(self.bar_ms), self.universe,
+                (self.window + 2) * self.bar_ms / 1000, self.bar_ms / 1000)
+        if rows:
+            df = pd.DataFrame(rows, columns=['symbol', 'timestamp', 'close'])
+            self.seed(df.pivot(index='timestamp', columns='symbol', values='close').astype(float))
+            self.version += 1
+            self.updated_at = time.time()
+
+    async def _run(self):
+        try:
+            await self.load_history()
+        except Exception as e:
+            logger.error(f"Cross-asset history load failed: {e}")
+        changed = True
+        while True:
+            try:
+                if changed:
+                    await asyncio.to_thread(self.publish)
+            except Exception as e:
+                logger.error(f"Cross-asset publish failed: {e}")
+            await asyncio.sleep(1.0)
+            try:
+                changed = self.flush()
+            except Exception as e:
+                changed = False
+                logger.error(f"Cross-asset update failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {"symbols": len(self.universe), "bars": self.stats.size, "version": self.version,
+                "pending_bars": len(self._pending), "last_update_seconds": self.last_update_seconds,
+                "last_publish_seconds": self.last_publish_seconds}
+
+
+def _clean(values: np.ndarray) -> list:
+    # NaN/inf aren't valid JSON
+    values = np.round(values.astype(np.float64), 6)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def _timeframe(bar_ms: int) -> str:
+    seconds = bar_ms // 1000
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    raise ValueError(f"Unsupported bar size: {seconds}s")
+
+
+def _cross_asset_from_env() -> CrossAssetAnalytics:
+    from data.scanner import DEFAULT_UNIVERSE
+    universe = [s for s in os.getenv("CROSS_ASSET_UNIVERSE", ",".join(DEFAULT_UNIVERSE)).split(',') if s]
+    return CrossAssetAnalytics(universe, benchmark=os.getenv("CROSS_ASSET_BENCHMARK", "BTC/USDT"),
+                               window=int(os.getenv("CROSS_ASSET_WINDOW", "168")))
+
+
+# Global instance (CROSS_ASSET_UNIVERSE: comma-separated pairs; 1h bars, 1 week window)
+cross_asset_analytics = _cross_asset_from_env()
@@ -1,7 +1,8 @@
-import yfinance as yf
 import pandas as pd
 import logging
 from typing import Dict, Any, Optional
+from data.yf_gateway import to_yf_symbol, yf_gateway
+from data.fundamentals_store import FundamentalsStore
 
 logger = logging.getLogger(__name__)
 
@@ -11,49 +12,60 @@ class FundamentalAnalysis:
     """
     
     @staticmethod
-    def get_fundamentals(symbol: str) -> Dict[str, Any]:
+    async def get_fundamentals(symbol: str) -> Dict[str, Any]:
         """
-        Retrieves key fundamental metrics.
+        Retrieves key fundamental metrics from the fundamentals store (refreshed in the background).
         """
         try:
-            # Handle crypto vs stocks
-            if "/" in symbol:
-                symbol = symbol.replace("/", "-")
-            
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            # Extract key metrics with safety checks
-            metrics = {
-                "market_cap": info.get("marketCap"),
-                "sector": info.get("sector"),
-                "industry": info.get("industry"),
-                "trailing_pe": info.get("trailingPE"),
-                "forward_pe": info.get("forwardPE"),
-                "peg_ratio": info.get("pegRatio"),
-                "price_to_book": info.get("priceToBook"),
-                "profit_margins": info.get("profitMargins"),
-                "beta": info.get("beta"),
-                "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
-                "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
-                "currency": info.get("currency"),
-                "description": info.get("longBusinessSummary"),
-            }
-            
-            # Simple valuation check
-            valuation_status = "Unknown"
-            if metrics["trailing_pe"]:
-                if metrics["trailing_pe"] < 15:
-                    valuation_status = "Undervalued"
-                elif metrics["trailing_pe"] > 30:
-                    valuation_status = "Overvalued"
-                else:
-                    valuation_status = "Fair Value"
-                    
-            metrics["valuation_assessment"] = valuation_status
-            
-            return metrics
-            
+            return await fundamentals_store.get(symbol)
         except Exception as e:
             logger.error(f"Error fetching fundamentals for {symbol}: {e}")
             return {"error": "Could not fetch fundamental data", "details": str(e)}
+    
+    @staticmethod
+    async def fetch_fundamentals(symbol: str) -> Dict[str, Any]:
+        """
+        Fetches and parses fundamentals from yfinance (store refreshes only; raises on failure).
+        """
+        # Handle crypto vs stocks
+        info = await yf_gateway.info(to_yf_symbol(symbol))
+        return FundamentalAnalysis.from_info(info)
+    
+    @staticmethod
+    def from_info(info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Key metrics and valuation classification from a yfinance .info dict.
+        """
+        # Extract key metrics with safety checks
+        metrics = {
+            "market_cap": info.get("marketCap"),
+            "sector": info.get("sector"),
+            "industry": info.get("industry"),
+            "trailing_pe": info.get("trailingPE"),
+            "forward_pe": info.get("forwardPE"),
+            "peg_ratio": info.get("pegRatio"),
+            "price_to_book": info.get("priceToBook"),
+            "profit_margins": info.get("profitMargins"),
+            "beta": info.get("beta"),
+            "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
+            "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
+            "currency": info.get("currency"),
+            "description": info.get("longBusinessSummary"),
+        }
+        
+        # Simple valuation check
+        valuation_status = "Unknown"
+        if metrics["trailing_pe"]:
+            if metrics["trailing_pe"] < 15:
+                valuation_status = "Undervalued"
+            elif metrics["trailing_pe"] > 30:
+                valuation_status = "Overvalued"
+            else:
+                valuation_status = "Fair Value"
+                
+        metrics["valuation_assessment"] = valuation_status
+        
+        return metrics
+
+# Global store (valuation is classified when a row is refreshed, not per read)
+fundamentals_store = FundamentalsStore(FundamentalAnalysis.fetch_fundamentals)
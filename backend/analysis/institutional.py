@@ -1,36 +1,129 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Awaitable, Callable, Hashable, Optional
 from analysis.regime import MarketRegimeDetector
+from analysis.regime_tracker import regime_tracker
 from analysis.fundamentals import FundamentalAnalysis
 from analysis.monte_carlo import MonteCarloSimulator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
 import pandas as pd
 import logging
 
 logger = logging.getLogger(__name__)
 
+MC_DAYS_AHEAD = 30
+
+
+class StageCache:
+    """
+    Results of the analysis stages per (stage, symbol), each tagged with the key it was
+    computed for (last bar for regime/MC, UTC day for fundamentals). A new key replaces
+    the entry. The running task is stored, so concurrent requests share one computation.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict() # (stage, symbol) -> (key, task)
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get_or_compute(self, stage: str, symbol: str, key: Hashable,
+                             compute: Callable[[], Awaitable[Any]],
+                             cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        slot = (stage, symbol)
+        entry = self._entries.get(slot)
+        if entry is not None and entry[0] == key:
+            self.stats["hits"] += 1
+            self._entries.move_to_end(slot)
+            return await asyncio.shield(entry[1])
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(compute())
+        self._entries[slot] = (key, task)
+        self._entries.move_to_end(slot)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        try:
+            result = await asyncio.shield(task)
+        except Exception:
+            self._discard(slot, task)
+            raise
+        if cacheable is not None and not cacheable(result):
+            self._discard(slot, task)
+        return result
+
+    def _discard(self, slot: tuple, task: asyncio.Future):
+        entry = self._entries.get(slot)
+        if entry is not None and entry[1] is task:
+            del self._entries[slot]
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._entries.clear()
+        else:
+            for slot in [slot for slot in self._entries if slot[1] == symbol]:
+                del self._entries[slot]
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "entries": len(self._entries)}
+
+
+# Monte Carlo is numpy work; keep it off the event loop and the default executor
+analysis_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ANALYSIS_WORKERS", "4")),
+                                       thread_name_prefix="analysis")
+stage_cache = StageCache()
+
+
+def _bar_key(df: pd.DataFrame) -> Hashable:
+    """
+    Identifies the newest bar: a new bar (not a tick inside the current one) invalidates.
+    """
+    if df.empty:
+        return None
+    last = df['timestamp'].iloc[-1] if 'timestamp' in df.columns else df.index[-1]
+    return str(last)
+
 class InstitutionalAnalyst:
     """
     The 'Brain' of the Stratix Quant Agent.
     Aggregates Regime, Fundamentals, and Monte Carlo into a structured Institutional Analysis.
     """
     
-    def __init__(self, data: pd.DataFrame, symbol: str):
+    def __init__(self, data: pd.DataFrame, symbol: str, track_regime: bool = False):
         self.data = data
         self.symbol = symbol
+        self.track_regime = track_regime # data holds the regime tracker's own (1h, stored) bars
         
-    def analyze(self) -> Dict[str, Any]:
+    async def analyze(self) -> Dict[str, Any]:
         """
         Produces the full "Wall Street" standard analysis report.
         """
         logger.info(f"Running Institutional Analysis for {self.symbol}")
+        loop = asyncio.get_running_loop()
+        bar_key = _bar_key(self.data)
+        day_key = time.strftime("%Y-%m-%d", time.gmtime())
         
-        # 1. Regime Analysis
-        regime = MarketRegimeDetector.detect_regime(self.data)
+        # 1. Regime Analysis: incremental tracker, only bars it hasn't seen are applied
+        regime = None
+        if self.track_regime and 'timestamp' in self.data.columns:
+            regime = await loop.run_in_executor(analysis_executor, regime_tracker.sync,
+                                                self.symbol.replace('-', '/'), self.data)
+        if regime is None:
+            regime = MarketRegimeDetector.detect_regime(self.data)
         
-        # 2. Monte Carlo Simulation (Probabilistic Engine)
-        simulation = MonteCarloSimulator.run_simulation(self.data, days_ahead=30)
+        def run_simulation():
+            return loop.run_in_executor(analysis_executor, MonteCarloSimulator.run_simulation,
+                                        self.data, MC_DAYS_AHEAD)
         
-        # 3. Fundamental Analysis (Data Layer)
-        fundamentals = FundamentalAnalysis.get_fundamentals(self.symbol)
+        # 2-3. Monte Carlo Simulation (Probabilistic Engine) and Fundamental Analysis
+        # (Data Layer), concurrently and cached per stage
+        simulation, fundamentals = await asyncio.gather(
+            stage_cache.get_or_compute("monte_carlo", self.symbol, (bar_key, MC_DAYS_AHEAD), run_simulation),
+            stage_cache.get_or_compute("fundamentals", self.symbol, day_key,
+                                       lambda: FundamentalAnalysis.get_fundamentals(self.symbol),
+                                       cacheable=lambda result: "error" not in result),
+        )
         
         # 4. Construct Probabilistic Scenarios (Synthesis)
         current_price = self.data['close'].iloc[-1] if not self.data.empty else 0
@@ -1,56 +1,123 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+class StreamingQuantiles:
+    """
+    Quantile estimates over values seen in chunks, from a fixed-bin histogram on [low, high].
+    Memory is O(bins) however many values are added; values outside the range count in the
+    edge bins. Two estimators with the same range merge by adding counts.
+    """
+
+    def __init__(self, low: float, high: float, bins: int = 8192):
+        self.low = low
+        self.high = high
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values: np.ndarray):
+        idx = np.searchsorted(self.edges, values, side='right') - 1
+        np.clip(idx, 0, len(self.counts) - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    def merge(self, other: "StreamingQuantiles"):
+        self.counts += other.counts
+
+    def quantile(self, q: float) -> float:
+        """
+        q in [0, 1], interpolated linearly within the bin.
+        """
+        cum = np.cumsum(self.counts)
+        total = cum[-1]
+        if total == 0:
+            return float('nan')
+        target = q * total
+        i = int(np.searchsorted(cum, target, side='left'))
+        i = min(i, len(self.counts) - 1)
+        before = cum[i - 1] if i > 0 else 0
+        frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return float(self.edges[i] + frac * (self.edges[i + 1] - self.edges[i]))
 
 class MonteCarloSimulator:
     """
     Performs Monte Carlo simulations for price projection and risk assessment.
     """
-    
+
     @staticmethod
-    def run_simulation(df: pd.DataFrame, days_ahead: int = 30, num_simulations: int = 1000) -> Dict[str, Any]:
+    def run_simulation(df: pd.DataFrame, days_ahead: int = 30, num_simulations: int = 1000,
+                       rng: Optional[np.random.Generator] = None, dtype=np.float64,
+                       chunk_size: int = 16384) -> Dict[str, Any]:
         """
         Simulates future price paths based on historical returns distribution.
+
+        Paths are generated `chunk_size` at a time as cumulative sums of log returns, so
+        memory stays at chunk_size x days_ahead whatever num_simulations is (float32 halves
+        it). Runs that fit in one chunk get exact percentiles; larger ones use merged
+        streaming estimates. Pass a seeded Generator for reproducible results. `df` is not modified.
         """
         if df.empty or len(df) < 50:
             return {"error": "Insufficient data for simulation"}
-            
+        rng = rng if rng is not None else np.random.default_rng()
+
         # Calculate daily log returns
-        df['log_ret'] = np.log(df['close'] / df['close'].shift(1))
-        
+        close = df['close'].to_numpy(dtype=np.float64)
+        log_ret = np.diff(np.log(close))
+        log_ret = log_ret[np.isfinite(log_ret)]
+
         # Determine drift and volatility
-        mean_return = df['log_ret'].mean()
-        var_return = df['log_ret'].var()
+        mean_return = log_ret.mean()
+        var_return = log_ret.var(ddof=1)
         drift = mean_return - (0.5 * var_return)
-        stdev = df['log_ret'].std()
-        
+        stdev = np.sqrt(var_return)
+
         last_price = df['close'].iloc[-1]
-        
-        # Generate random paths
-        # Z is random values from normal distribution
-        # Price_t = Price_0 * exp(cumsum(drift + stdev * Z))
-        
-        daily_returns = np.exp(drift + stdev * np.random.normal(0, 1, (days_ahead, num_simulations)))
-        
-        # Create price paths
-        price_paths = np.zeros_like(daily_returns)
-        price_paths[0] = last_price * daily_returns[0]
-        
-        for t in range(1, days_ahead):
-            price_paths[t] = price_paths[t-1] * daily_returns[t]
-            
-        # Final prices distribution
-        final_prices = price_paths[-1]
-        
-        # Calculate percentiles (Confidence Intervals)
-        p95 = np.percentile(final_prices, 95) # Bull case
-        p50 = np.percentile(final_prices, 50) # Base case
-        p05 = np.percentile(final_prices, 5)  # Bear case
-        
+
+        # Log price paths: log(Price_t / Price_0) = cumsum(drift + stdev * Z)
+        # Final log returns and the deepest drop along each path are all we keep per chunk
+        single_chunk = num_simulations <= chunk_size
+        if single_chunk:
+            finals: List[np.ndarray] = []
+            lows: List[np.ndarray] = []
+        else:
+            spread = 8 * stdev * np.sqrt(days_ahead) + 1e-12
+            final_q = StreamingQuantiles(drift * days_ahead - spread, drift * days_ahead + spread)
+            low_q = StreamingQuantiles(min(drift * days_ahead, 0.0) - spread, 0.0)
+
+        remaining = num_simulations
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            remaining -= n
+            paths = rng.standard_normal((n, days_ahead), dtype=dtype)
+            paths *= float(stdev)
+            paths += float(drift)
+            np.cumsum(paths, axis=1, out=paths)
+            final = paths[:, -1]
+            low = np.minimum(paths.min(axis=1), 0.0) # Worst point vs. today's price
+            if single_chunk:
+                finals.append(final)
+                lows.append(low)
+            else:
+                final_q.update(final)
+                low_q.update(low)
+
+        # Calculate percentiles (Confidence Intervals) in log space; exp is monotonic
+        if single_chunk:
+            final = np.concatenate(finals).astype(np.float64)
+            low = np.concatenate(lows).astype(np.float64)
+            q95, q50, q05 = np.percentile(final, [95, 50, 5])
+            low_05 = np.percentile(low, 5)
+        else:
+            q95, q50, q05 = (final_q.quantile(q) for q in (0.95, 0.50, 0.05))
+            low_05 = low_q.quantile(0.05)
+
+        p95 = last_price * np.exp(q95) # Bull case
+        p50 = last_price * np.exp(q50) # Base case
+        p05 = last_price * np.exp(q05) # Bear case
+
         # Monte Carlo VaR (Value at Risk) - 95% confidence
         # Maximum expected loss in % from current price
         var_95 = (last_price - p05) / last_price * 100
-        
+
         return {
             "current_price": last_price,
             "projected_range": {
@@ -61,7 +128,9 @@ class MonteCarloSimulator:
             "metrics": {
                 "volatility_annualized": float(stdev * np.sqrt(252)),
                 "drift_annualized": float(mean_return * 252),
-                "var_95_percent": float(var_95)
+                "var_95_percent": float(var_95),
+                # Drawdown below today's price at any point of the horizon, 95% confidence
+                "max_drawdown_95_percent": float((1 - np.exp(low_05)) * 100)
             },
             "simulation_params": {
                 "days_ahead": days_ahead,
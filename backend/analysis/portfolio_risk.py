@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# loader(symbol, limit) -> frame with 'timestamp' and 'close' (daily bars, oldest first)
+HistoryLoader = Callable[[str, int], Awaitable[pd.DataFrame]]
+PriceSource = Callable[[str], Optional[float]]
+
+
+def ewma_covariance(returns: np.ndarray, lam: float = 0.94) -> np.ndarray:
+    """
+    RiskMetrics covariance of a (days x assets) return matrix: zero mean, weights lam^age.
+    """
+    weights = lam ** np.arange(len(returns) - 1, -1, -1, dtype=np.float64)
+    weights /= weights.sum()
+    return (returns * weights[:, None]).T @ returns
+
+
+def shrinkage_covariance(returns: np.ndarray) -> np.ndarray:
+    """
+    Ledoit-Wolf (2004) shrinkage of the sample covariance towards a scaled identity,
+    with the optimal intensity estimated from the data.
+    """
+    x = returns - returns.mean(axis=0)
+    t, n = x.shape
+    sample = x.T @ x / t
+    target = np.trace(sample) / n * np.eye(n)
+    d2 = np.sum((sample - target) ** 2)
+    if d2 == 0:
+        return sample
+    # sum_t ||x_t x_t' - S||^2 = sum_t |x_t|^4 - t ||S||^2
+    b2 = (np.sum(np.sum(x * x, axis=1) ** 2) - t * np.sum(sample ** 2)) / t ** 2
+    delta = min(max(b2 / d2, 0.0), 1.0)
+    return delta * target + (1 - delta) * sample
+
+
+def cholesky(cov: np.ndarray) -> np.ndarray:
+    """
+    Lower Cholesky factor; adds growing diagonal jitter if the matrix isn't positive definite.
+    """
+    jitter = 0.0
+    scale = np.trace(cov) / len(cov) if len(cov) else 1.0
+    for _ in range(8):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 100
+    raise np.linalg.LinAlgError("Covariance matrix is not positive definite")
+
+
+class PortfolioRiskModel:
+    """
+    Simulated joint returns for a fixed set of symbols over the horizon.
+
+    Correlated log returns are drawn as Z @ L.T in chunks of `chunk_size` paths and stored
+    as simple returns (paths x assets, float32). They don't depend on position sizes or
+    prices, so repricing the portfolio is one matrix-vector product.
+    """
+
+    def __init__(self, symbols: List[str], cov: np.ndarray, horizon_days: int, num_paths: int,
+                 chunk_size: int, rng: np.random.Generator):
+        self.symbols = symbols
+        self.cov = cov
+        self.horizon_days = horizon_days
+        self.volatility = np.sqrt(np.diag(cov))
+        chol = cholesky(cov).T.astype(np.float32) * np.float32(math.sqrt(horizon_days))
+        self.scenarios = np.empty((num_paths, len(symbols)), dtype=np.float32)
+        for start in range(0, num_paths, chunk_size):
+            chunk = self.scenarios[start:start + chunk_size]
+            z = rng.standard_normal(chunk.shape, dtype=np.float32)
+            np.matmul(z, chol, out=chunk)
+            np.expm1(chunk, out=chunk)
+        self._return_quantiles: Dict[float, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def return_quantiles(self, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-asset lower and upper tail returns, computed once per confidence level.
+        """
+        cached = self._return_quantiles.get(confidence)
+        if cached is None:
+            lower, upper = np.quantile(self.scenarios, [1 - confidence, confidence], axis=0)
+            cached = self._return_quantiles[confidence] = (lower.astype(np.float64), upper.astype(np.float64))
+        return cached
+
+    def evaluate(self, exposures: np.ndarray, confidence: float) -> Dict[str, Any]:
+        """
+        VaR/CVaR of the P&L for signed notional `exposures`, with each position's Euler
+        contribution to CVaR (its mean P&L over the tail scenarios; they sum to CVaR).
+        """
+        pnl = self.scenarios @ exposures.astype(np.float32)
+        tail_size = max(1, int(len(pnl) * (1 - confidence)))
+        tail = np.argpartition(pnl, tail_size - 1)[:tail_size]
+        var = -float(np.max(pnl[tail]))
+        cvar = -float(np.mean(pnl[tail], dtype=np.float64))
+        contributions = -(self.scenarios[tail].mean(axis=0, dtype=np.float64) * exposures)
+        # Standalone (undiversified) VaR per position: longs lose in the lower tail, shorts in the upper
+        lower, upper = self.return_quantiles(confidence)
+        standalone = np.where(exposures >= 0, -lower * exposures, -upper * exposures)
+        return {"var": var, "cvar": cvar, "contributions": contributions, "standalone_var": standalone,
+                "pnl_std": float(pnl.std(dtype=np.float64))}
+
+
+class PortfolioRiskEngine:
+    """
+    Portfolio VaR/CVaR by correlated multi-asset Monte Carlo.
+
+    Daily closes are loaded once per symbol (refreshed after `history_ttl`), the covariance
+    (EWMA or Ledoit-Wolf shrinkage) and simulated scenarios are rebuilt only when the set
+    of held symbols or their history changes, and position or price changes only reprice
+    the stored scenarios.
+    """
+
+    def __init__(self, history_loader: HistoryLoader, price_source: Optional[PriceSource] = None,
+                 horizon_days: int = 1, num_paths: int = 100_000, chunk_size: int = 10_000,
+                 confidence: float = 0.95, method: str = "ewma", lam: float = 0.94,
+                 lookback_days: int = 250, min_days: int = 30, history_ttl: float = 3600.0,
+                 seed: Optional[int] = None):
+        if method not in ("ewma", "shrinkage"):
+            raise ValueError(f"Unknown covariance method: {method}")
+        self.history_loader = history_loader
+        self.price_source = price_source
+        self.horizon_days = horizon_days
+        self.num_paths = num_paths
+        self.chunk_size = chunk_size
+        self.confidence = confidence
+        self.method = method
+        self.lam = lam
+        self.lookback_days = lookback_days
+        self.min_days = min_days
+        self.history_ttl = history_ttl
+        self.rng = np.random.default_rng(seed)
+
+        self._history: Dict[str, Tuple[float, pd.Series]] = {} # symbol -> (loaded_at, daily closes)
+        self._model: Optional[PortfolioRiskModel] = None
+        self._model_key: Optional[tuple] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"model_builds": 0, "evaluations": 0, "last_build_seconds": None, "last_eval_seconds": None}
+
+    async def _closes(self, symbol: str) -> Optional[pd.Series]:
+        cached = self._history.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] < self.history_ttl:
+            return cached[1]
+        try:
+            df = await self.history_loader(symbol, self.lookback_days + 1)
+        except Exception as e:
+            logger.error(f"Risk history load failed for {symbol}: {e}")
+            return cached[1] if cached is not None else None
+        if df is None or df.empty:
+            closes = None
+        else:
+            closes = pd.Series(df['close'].to_numpy(dtype=float),
+                               index=pd.to_datetime(df['timestamp']).dt.normalize()).groupby(level=0).last()
+        self._history[symbol] = (time.monotonic(), closes)
+        return closes
+
+    def _build(self, closes: Dict[str, pd.Series]) -> Optional[PortfolioRiskModel]:
+        symbols = sorted(closes)
+        # Only days every symbol traded on (equities skip weekends, crypto doesn't)
+        frame = pd.DataFrame(closes)[symbols].dropna()
+        returns = np.diff(np.log(frame.to_numpy(dtype=np.float64)), axis=0)[-self.lookback_days:]
+        if len(returns) < self.min_days:
+            return None
+        cov = ewma_covariance(returns, self.lam) if self.method == "ewma" else shrinkage_covariance(returns)
+        return PortfolioRiskModel(symbols, cov, self.horizon_days, self.num_paths, self.chunk_size, self.rng)
+
+    async def evaluate(self, positions: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Risk report for `positions` (PortfolioManager.positions: symbol -> Position).
+        """
+        async with self._lock:
+            closes = {}
+            unmodeled = []
+            for symbol in sorted(positions):
+                series = await self._closes(symbol)
+                if series is None or len(series) <= self.min_days:
+                    unmodeled.append(symbol)
+                else:
+                    closes[symbol] = series
+
+            key = tuple((s, self._history[s][0]) for s in closes) # Symbol set and history loads
+            if key != self._model_key:
+                started = time.perf_counter()
+                self._model = await asyncio.to_thread(self._build, closes) if closes else None
+                self._model_key = key
+                self.stats["model_builds"] += 1
+                self.stats["last_build_seconds"] = time.perf_counter() - started
+            model = self._model
+
+        if model is None:
+            return {"positions": [], "unmodeled": sorted(positions), "var": 0.0, "cvar": 0.0,
+                    "confidence": self.confidence, "horizon_days": self.horizon_days, "paths": 0}
+
+        prices, exposures = [], []
+        for symbol in model.symbols:
+            pos = positions[symbol]
+            price = (self.price_source(symbol) if self.price_source else None) or pos.entry_price
+            prices.append(price)
+            exposures.append(pos.size * price * (1 if pos.side == 'long' else -1))
+        exposures = np.array(exposures, dtype=np.float64)
+
+        started = time.perf_counter()
+        result = await asyncio.to_thread(model.evaluate, exposures, self.confidence)
+        self.stats["evaluations"] += 1
+        self.stats["last_eval_seconds"] = time.perf_counter() - started
+
+        gross = float(np.abs(exposures).sum())
+        cvar = result["cvar"]
+        return {
+            "var": result["var"],
+            "cvar": cvar,
+            "var_percent": result["var"] / gross * 100 if gross else 0.0,
+            "cvar_percent": cvar / gross * 100 if gross else 0.0,
+            "diversification_benefit": float(result["standalone_var"].sum()) - result["var"],
+            "gross_exposure": gross,
+            "net_exposure": float(exposures.sum()),
+            "confidence": self.confidence,
+            "horizon_days": self.horizon_days,
+            "paths": self.num_paths,
+            "method": self.method,
+            "positions": [
+                {
+                    "symbol": symbol,
+                    "price": prices[i],
+                    "exposure": float(exposures[i]),
+                    "volatility_daily": float(model.volatility[i]),
+                    "standalone_var": float(result["standalone_var"][i]),
+                    "cvar_contribution": float(result["contributions"][i]),
+                    "cvar_contribution_pct": float(result["contributions"][i] / cvar * 100) if cvar else 0.0,
+                }
+                for i, symbol in enumerate(model.symbols)
+            ],
+            "correlation": _correlation(model.cov).round(4).tolist(),
+            "unmodeled": unmodeled,
+        }
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "symbols": len(self._model.symbols) if self._model else 0,
+                "histories": len(self._history)}
+
+
+def _correlation(cov: np.ndarray) -> np.ndarray:
+    vol = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(vol, vol)
+    return np.nan_to_num(corr)
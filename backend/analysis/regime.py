@@ -1,15 +1,114 @@
 import pandas as pd
 import numpy as np
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+# Regime codes: position in these tuples (int8 in timelines)
+TREND_LABELS = ("Neutral", "Strong Bullish", "Strong Bearish", "Mild Bullish", "Mild Bearish")
+VOLATILITY_LABELS = ("Normal", "High Volatility", "Low Volatility (Squeeze)")
+LIQUIDITY_LABELS = ("Normal", "High Volume", "Low Liquidity")
+REGIME_LABELS = {"trend": TREND_LABELS, "volatility": VOLATILITY_LABELS, "liquidity": LIQUIDITY_LABELS}
+
 class MarketRegimeDetector:
     """
     Detects market regimes: Volatility, Trend, and Liquidity.
     """
     
+    @staticmethod
+    def _indicators(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Rolling inputs of the classification for every bar. The caller's frame is not modified.
+        """
+        close, high, low = df['close'], df['high'], df['low']
+        # 1. Trend Regime (SMA + ADX proxy)
+        # Using simple SMA slope and relation for robustness
+        sma_50 = close.rolling(window=50).mean()
+        sma_200 = close.rolling(window=200).mean()
+        # 2. Volatility Regime (ATR / Historical Vol)
+        tr = np.maximum(high - low, np.abs(high - close.shift(1)))
+        atr_14 = tr.rolling(window=14).mean()
+        avg_atr = atr_14.rolling(window=50).mean()
+        # 3. Liquidity/Volume Regime
+        avg_volume = df['volume'].rolling(window=20).mean()
+        return {
+            "close": close.to_numpy(dtype=float), "sma_50": sma_50.to_numpy(), "sma_200": sma_200.to_numpy(),
+            "atr_14": atr_14.to_numpy(), "avg_atr": avg_atr.to_numpy(),
+            "volume": df['volume'].to_numpy(dtype=float), "avg_volume": avg_volume.to_numpy(),
+        }
+    
+    @staticmethod
+    def _classify(ind: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Codes per bar. Comparisons against NaN (warm-up) are False, so those bars fall through
+        to Neutral/Normal exactly like the single-bar checks did.
+        """
+        close, sma_50, sma_200 = ind["close"], ind["sma_50"], ind["sma_200"]
+        with np.errstate(invalid='ignore'):
+            trend = np.select(
+                [(close > sma_50) & (sma_50 > sma_200), (close < sma_50) & (sma_50 < sma_200),
+                 close > sma_200, close < sma_200],
+                [1, 2, 3, 4], default=0).astype(np.int8)
+            volatility = np.select(
+                [ind["atr_14"] > ind["avg_atr"] * 1.5, ind["atr_14"] < ind["avg_atr"] * 0.7],
+                [1, 2], default=0).astype(np.int8)
+            liquidity = np.select(
+                [ind["volume"] > ind["avg_volume"] * 1.5, ind["volume"] < ind["avg_volume"] * 0.6],
+                [1, 2], default=0).astype(np.int8)
+        return {"trend": trend, "volatility": volatility, "liquidity": liquidity}
+    
+    @staticmethod
+    def _classify_bar(last: Dict[str, float]) -> tuple:
+        """
+        Scalar twin of _classify for a single bar (trend, volatility, liquidity codes);
+        NaN comparisons are False here too.
+        """
+        close, sma_50, sma_200 = last["close"], last["sma_50"], last["sma_200"]
+        if close > sma_50 > sma_200:
+            trend = 1
+        elif close < sma_50 < sma_200:
+            trend = 2
+        elif close > sma_200:
+            trend = 3
+        elif close < sma_200:
+            trend = 4
+        else:
+            trend = 0
+        atr, avg_atr = last["atr_14"], last["avg_atr"]
+        volatility = 1 if atr > avg_atr * 1.5 else 2 if atr < avg_atr * 0.7 else 0
+        volume, avg_volume = last["volume"], last["avg_volume"]
+        liquidity = 1 if volume > avg_volume * 1.5 else 2 if volume < avg_volume * 0.6 else 0
+        return trend, volatility, liquidity
+    
+    @staticmethod
+    def regime_timeline(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Regime of every bar in one vectorized pass: int8 'trend', 'volatility' and 'liquidity'
+        code columns (see *_LABELS) on the frame's index.
+        """
+        if df.empty:
+            return pd.DataFrame({k: np.array([], dtype=np.int8) for k in REGIME_LABELS}, index=df.index)
+        codes = MarketRegimeDetector._classify(MarketRegimeDetector._indicators(df))
+        return pd.DataFrame(codes, index=df.index)
+    
+    @staticmethod
+    def regime_mask(timeline: pd.DataFrame, allowed: Dict[str, List[str]]) -> np.ndarray:
+        """
+        True for bars whose regime matches the filter, e.g.
+        {"trend": ["Strong Bullish"], "volatility": ["Normal"]}. Dimensions left out match anything.
+        """
+        mask = np.ones(len(timeline), dtype=bool)
+        for dimension, labels in (allowed or {}).items():
+            if dimension not in REGIME_LABELS:
+                raise ValueError(f"Unknown regime dimension: {dimension}")
+            names = REGIME_LABELS[dimension]
+            unknown = [label for label in labels if label not in names]
+            if unknown:
+                raise ValueError(f"Unknown {dimension} regime(s): {unknown}")
+            mask &= np.isin(timeline[dimension].to_numpy(), [names.index(label) for label in labels])
+        return mask
+    
     @staticmethod
     def detect_regime(df: pd.DataFrame) -> Dict[str, Any]:
         """
@@ -20,66 +119,43 @@ class MarketRegimeDetector:
             return {"regime": "Insufficient Data"}
             
         try:
-            # 1. Trend Regime (SMA + ADX proxy)
-            # Using simple SMA slope and relation for robustness
-            df['sma_50'] = df['close'].rolling(window=50).mean()
-            df['sma_200'] = df['close'].rolling(window=200).mean()
-            
-            current_close = df['close'].iloc[-1]
-            sma_50 = df['sma_50'].iloc[-1]
-            sma_200 = df['sma_200'].iloc[-1]
-            
-            trend = "Neutral"
-            if current_close > sma_50 > sma_200:
-                trend = "Strong Bullish"
-            elif current_close < sma_50 < sma_200:
-                trend = "Strong Bearish"
-            elif current_close > sma_200:
-                trend = "Mild Bullish"
-            elif current_close < sma_200:
-                trend = "Mild Bearish"
-                
-            # 2. Volatility Regime (ATR / Historical Vol)
-            df['tr'] = np.maximum(
-                df['high'] - df['low'],
-                np.abs(df['high'] - df['close'].shift(1))
-            )
-            df['atr_14'] = df['tr'].rolling(window=14).mean()
-            
-            current_atr = df['atr_14'].iloc[-1]
-            avg_atr = df['atr_14'].rolling(window=50).mean().iloc[-1]
-            
-            volatility = "Normal"
-            if current_atr > avg_atr * 1.5:
-                volatility = "High Volatility"
-            elif current_atr < avg_atr * 0.7:
-                volatility = "Low Volatility (Squeeze)"
-                
-            # 3. Liquidity/Volume Regime
-            avg_volume = df['volume'].rolling(window=20).mean().iloc[-1]
-            current_volume = df['volume'].iloc[-1]
-            
-            liquidity = "Normal"
-            if current_volume > avg_volume * 1.5:
-                liquidity = "High Volume"
-            elif current_volume < avg_volume * 0.6:
-                liquidity = "Low Liquidity"
-                
-            # 4. Composite Regime Tag
-            regime_tag = f"{trend} / {volatility}"
-            
-            return {
-                "trend": trend,
-                "volatility": volatility,
-                "liquidity": liquidity,
-                "summary": regime_tag,
-                "metrics": {
-                    "sma_50_dist_pct": (current_close - sma_50) / sma_50 * 100 if sma_50 else 0,
-                    "atr_ratio": current_atr / avg_atr if avg_atr else 1,
-                    "volume_ratio": current_volume / avg_volume if avg_volume else 1
-                }
-            }
+            # Only the windows ending at the last bar matter (SMA 200 is the longest)
+            ind = MarketRegimeDetector._indicators(df.iloc[-200:])
+            return MarketRegimeDetector.regime_report({k: v[-1] for k, v in ind.items()})
             
         except Exception as e:
             logger.error(f"Error detecting regime: {e}")
             return {"error": str(e)}
+    
+    @staticmethod
+    def regime_report(last: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Classifies one bar from its indicator values (the keys of _indicators).
+        """
+        trend_code, volatility_code, liquidity_code = MarketRegimeDetector._classify_bar(last)
+        
+        current_close = last["close"]
+        sma_50 = last["sma_50"]
+        current_atr = last["atr_14"]
+        avg_atr = last["avg_atr"]
+        current_volume = last["volume"]
+        avg_volume = last["avg_volume"]
+        
+        trend = TREND_LABELS[trend_code]
+        volatility = VOLATILITY_LABELS[volatility_code]
+        liquidity = LIQUIDITY_LABELS[liquidity_code]
+            
+        # 4. Composite Regime Tag
+        regime_tag = f"{trend} / {volatility}"
+        
+        return {
+            "trend": trend,
+            "volatility": volatility,
+            "liquidity": liquidity,
+            "summary": regime_tag,
+            "metrics": {
+                "sma_50_dist_pct": (current_close - sma_50) / sma_50 * 100 if sma_50 else 0,
+                "atr_ratio": current_atr / avg_atr if avg_atr else 1,
+                "volume_ratio": current_volume / avg_volume if avg_volume else 1
+            }
+        }
@@ -0,0 +1,210 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.regime import MarketRegimeDetector
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+class RollingMean:
+    """
+    Mean of the last `window` values from a running sum; NaN until the window is full
+    (like pandas rolling().mean()). The sum is rebuilt every `window` * 64 pushes so
+    floating-point drift can't accumulate.
+    """
+
+    __slots__ = ('window', 'values', 'total', '_pushes')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self.total = 0.0
+        self._pushes = 0
+
+    def push(self, value: float) -> float:
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._pushes += 1
+        if self._pushes % (self.window * 64) == 0:
+            self.total = math.fsum(self.values)
+        return self.mean
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.window if len(self.values) == self.window else NAN
+
+
+class RegimeState:
+    """
+    Running indicators of one symbol, updated in O(1) per closed bar: SMA 50/200 of close,
+    ATR 14, the 50-bar mean of ATR 14 and the 20-bar volume mean.
+    """
+
+    __slots__ = ('sma_50', 'sma_200', 'atr_14', 'avg_atr', 'avg_volume', 'prev_close',
+                 'last', 'bars', 'last_timestamp', 'report')
+
+    def __init__(self):
+        self.sma_50 = RollingMean(50)
+        self.sma_200 = RollingMean(200)
+        self.atr_14 = RollingMean(14)
+        self.avg_atr = RollingMean(50)
+        self.avg_volume = RollingMean(20)
+        self.prev_close: Optional[float] = None
+        self.last: Dict[str, float] = {}
+        self.bars = 0
+        self.last_timestamp: Optional[int] = None # Open time of the last applied bar, ms
+        self.report: Dict[str, Any] = {"regime": "Insufficient Data"}
+
+    def update(self, timestamp: int, high: float, low: float, close: float, volume: float, classify: bool = True):
+        if self.prev_close is None:
+            atr = NAN # No previous close for the first true range
+        else:
+            atr = self.atr_14.push(max(high - low, abs(high - self.prev_close)))
+        self.last = {
+            "close": close,
+            "sma_50": self.sma_50.push(close),
+            "sma_200": self.sma_200.push(close),
+            "atr_14": atr,
+            "avg_atr": self.avg_atr.push(atr) if not math.isnan(atr) else NAN,
+            "volume": volume,
+            "avg_volume": self.avg_volume.push(volume),
+        }
+        self.prev_close = close
+        self.bars += 1
+        self.last_timestamp = timestamp
+        if classify:
+            self.classify()
+
+    def classify(self):
+        if self.bars >= 50:
+            self.report = MarketRegimeDetector.regime_report(self.last)
+
+
+class RegimeTracker:
+    """
+    Current regime of every tracked symbol, kept up to date bar by bar instead of
+    recomputing rolling windows over the history on every request.
+
+    Symbols are seeded once from history (`sync`), then each closed bar (hot-store
+    callback or newer bars passed to `sync`) is an O(1) update. Callbacks get a
+    regime_change event whenever a symbol's trend, volatility or liquidity regime changes.
+    `sync` runs on the analysis executor while bar closes arrive on the event loop, so
+    both hold `lock`; callbacks may be called from either thread.
+    """
+
+    def __init__(self, bar_seconds: int = 3600, max_symbols: int = 2000):
+        self.bar_ms = bar_seconds * 1000
+        self.max_symbols = max_symbols
+        self.states: Dict[str, RegimeState] = {}
+        self.callbacks: List[Callable] = []
+        self.stats = {"updates": 0, "changes": 0, "seeded": 0, "rejected": 0}
+        self.lock = threading.Lock()
+
+    def register_callback(self, callback: Callable):
+        """
+        callback(event) for each regime change:
+        {"type": "regime_change", "symbol", "timestamp", "previous", "current"}.
+        """
+        self.callbacks.append(callback)
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        state = self.states.get(symbol)
+        return state.report if state is not None else None
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        state = self.states.get(symbol)
+        return state.last_timestamp if state is not None else None
+
+    def on_bar_close(self, symbol: str, bar: dict):
+        """
+        Hot-store callback. Only symbols already seeded are tracked; an unseeded symbol
+        would need 200 live bars before its regime is meaningful.
+        """
+        with self.lock:
+            if symbol in self.states:
+                self.update(symbol, bar['timestamp'], bar['high'], bar['low'], bar['close'], bar['volume'])
+
+    def update(self, symbol: str, timestamp: int, high: float, low: float, close: float, volume: float,
+               seeding: bool = False):
+        state = self.states.get(symbol)
+        if state is None:
+            if len(self.states) >= self.max_symbols:
+                return
+            state = self.states[symbol] = RegimeState()
+        elif state.last_timestamp is not None and timestamp <= state.last_timestamp:
+            return # Already applied (e.g. seeded and then delivered by the live feed)
+
+        previous = state.report
+        state.update(timestamp, high, low, close, volume, classify=not seeding)
+        self.stats["updates"] += 1
+
+        current = state.report
+        if seeding or "trend" not in previous:
+            return # Warm-up: the first classification isn't a change
+        if any(previous.get(k) != current[k] for k in ("trend", "volatility", "liquidity")):
+            self.stats["changes"] += 1
+            event = {"type": "regime_change", "symbol": symbol, "timestamp": timestamp,
+                     "previous": {k: previous.get(k) for k in ("trend", "volatility", "liquidity")},
+                     "current": {k: current[k] for k in ("trend", "volatility", "liquidity")}}
+            for callback in self.callbacks:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Regime callback failed for {symbol}: {e}")
+
+    def sync(self, symbol: str, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """
+        Applies the closed bars of `df` (oldest first, 'timestamp' column) the tracker
+        hasn't seen yet and returns the current regime. The first call seeds the symbol
+        from the last 200 bars (enough to fill every window); later calls only touch new bars.
+        The bar still forming (open time within the last bar period) is skipped.
+        Frames of another timeframe (e.g. daily fallback bars) are refused and return None
+        without touching the state: the caller classifies them with detect_regime instead.
+        Blocking (up to 200 bar updates): call it on the analysis executor.
+        """
+        if df.empty:
+            return self.get(symbol)
+        timestamps = pd.to_datetime(df['timestamp']).values.astype('datetime64[ms]').astype('int64')
+        if len(timestamps) > 1 and int(np.median(np.diff(timestamps[-50:]))) != self.bar_ms:
+            self.stats["rejected"] += 1
+            return None
+        high, low = df['high'].to_numpy(dtype=float), df['low'].to_numpy(dtype=float)
+        close, volume = df['close'].to_numpy(dtype=float), df['volume'].to_numpy(dtype=float)
+        with self.lock:
+            return self._sync(symbol, timestamps, high, low, close, volume)
+
+    def _sync(self, symbol: str, timestamps, high, low, close, volume) -> Optional[Dict[str, Any]]:
+        closed_before = int(time.time() * 1000) - self.bar_ms
+        last = self.last_timestamp(symbol)
+        start = max(0, len(timestamps) - 200) if last is None else int(timestamps.searchsorted(last, side='right'))
+        if last is None:
+            self.stats["seeded"] += 1
+        for i in range(start, len(timestamps)):
+            if timestamps[i] > closed_before:
+                break
+            self.update(symbol, int(timestamps[i]), high[i], low[i], close[i], volume[i], seeding=last is None)
+        if last is None and symbol in self.states:
+            self.states[symbol].classify() # Seeding only classifies the newest bar
+        return self.get(symbol)
+
+    def drop(self, symbol: str):
+        with self.lock:
+            self.states.pop(symbol, None)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "symbols": len(self.states), "callbacks": len(self.callbacks)}
+
+
+# Global instance (fed 1h bars: the hot store's and the analysis timeframe)
+regime_tracker = RegimeTracker()
@@ -0,0 +1,217 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# compute(symbol) -> report, or None when there is no data for the symbol
+ReportComputer = Callable[[str], Awaitable[Optional[dict]]]
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class ReportStore:
+    """
+    Latest analysis reports per symbol, versioned. The last `history` versions are kept in
+    memory; with a directory, the latest version of each symbol is also written to
+    `<directory>/<symbol>.json` and reloaded on start, so a restart serves reports at once.
+    """
+
+    def __init__(self, directory: Optional[str] = None, history: int = 3):
+        self.directory = directory
+        self.history = history
+        self._reports: Dict[str, Deque[dict]] = {}
+
+    def latest(self, symbol: str) -> Optional[dict]:
+        versions = self._reports.get(symbol)
+        return versions[-1] if versions else None
+
+    def versions(self, symbol: str) -> List[dict]:
+        return list(self._reports.get(symbol, ()))
+
+    async def put(self, symbol: str, report: dict, bar_open: float) -> dict:
+        latest = self.latest(symbol)
+        entry = {
+            "symbol": symbol,
+            "version": latest["version"] + 1 if latest else 1,
+            "bar_open": bar_open, # Open time (epoch seconds) of the bar the report was computed in
+            "computed_at": time.time(),
+            "report": report,
+        }
+        versions = self._reports.get(symbol)
+        if versions is None:
+            versions = self._reports[symbol] = deque(maxlen=self.history)
+        versions.append(entry)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write, entry)
+            except Exception as e:
+                logger.error(f"Failed to persist analysis report for {symbol}: {e}")
+        return entry
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, symbol.replace('/', '-') + ".json")
+
+    def _write(self, entry: dict):
+        path = self._path(entry["symbol"])
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f, default=_json_default)
+        os.replace(tmp, path) # Readers never see a half-written file
+
+    def load(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    entry = json.load(f)
+                self._reports[entry["symbol"]] = deque([entry], maxlen=self.history)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable analysis report {name}: {e}")
+
+    def __len__(self):
+        return len(self._reports)
+
+
+class AnalysisScheduler:
+    """
+    Precomputes analysis reports for a watchlist so requests never compute.
+
+    The watchlist is the configured symbols plus the most viewed ones, up to `max_symbols`.
+    A symbol is queued when a bar closes for it (hot-store callback) and by a periodic
+    sweep that queues every watched symbol whose report is from an earlier bar, so reports
+    are at most one bar old even for symbols without a live feed. `workers` tasks drain a
+    priority queue ordered by view count; a symbol is never queued twice.
+    """
+
+    def __init__(self, compute: ReportComputer, store: ReportStore, watchlist: Optional[List[str]] = None,
+                 max_symbols: int = 200, workers: int = 4, bar_seconds: int = 3600,
+                 sweep_interval: float = 30.0):
+        self.compute = compute
+        self.store = store
+        self.configured = list(watchlist or [])
+        self.max_symbols = max_symbols
+        self.workers = workers
+        self.bar_seconds = bar_seconds
+        self.sweep_interval = sweep_interval
+
+        self.views: Dict[str, float] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._queued: set = set()
+        self._seq = itertools.count() # FIFO among equally viewed symbols
+        self._decayed_bar = self._bar_open()
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"computed": 0, "failed": 0, "empty": 0, "last_duration": None}
+
+    def _bar_open(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return now - now % self.bar_seconds
+
+    def watchlist(self) -> List[str]:
+        symbols = list(dict.fromkeys(self.configured))
+        if len(symbols) < self.max_symbols:
+            chosen = set(symbols)
+            by_views = sorted(self.views, key=self.views.get, reverse=True)
+            symbols += [s for s in by_views if s not in chosen][:self.max_symbols - len(symbols)]
+        return symbols
+
+    def record_view(self, symbol: str):
+        self.views[symbol] = self.views.get(symbol, 0.0) + 1.0
+
+    def is_stale(self, symbol: str) -> bool:
+        latest = self.store.latest(symbol)
+        return latest is None or latest["bar_open"] < self._bar_open()
+
+    def enqueue(self, symbol: str):
+        if symbol in self._queued:
+            return
+        self._queued.add(symbol)
+        self._queue.put_nowait((-self.views.get(symbol, 0.0), next(self._seq), symbol))
+
+    def on_bar_close(self, symbol: str, bar: dict):
+        """
+        Hot-store callback: the symbol's report is now one bar behind.
+        """
+        if symbol in self.views or symbol in self.configured:
+            self.enqueue(symbol)
+
+    def sweep(self):
+        bar_open = self._bar_open()
+        if bar_open > self._decayed_bar:
+            # Halve view counts every bar so the watchlist follows recent interest
+            self._decayed_bar = bar_open
+            self.views = {s: v / 2 for s, v in self.views.items() if v >= 0.1}
+        for symbol in self.watchlist():
+            if self.is_stale(symbol):
+                self.enqueue(symbol)
+
+    async def refresh(self, symbol: str) -> Optional[dict]:
+        """
+        Computes and stores a report now; returns the stored entry, or None (and the
+        symbol stops being watched for its views) when there is no data for it.
+        """
+        bar_open = self._bar_open()
+        started = time.perf_counter()
+        try:
+            report = await self.compute(symbol)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Scheduled analysis failed for {symbol}: {e}")
+            return None
+        self.stats["last_duration"] = time.perf_counter() - started
+        if report is None:
+            self.stats["empty"] += 1
+            self.views.pop(symbol, None) # No data (anymore): stop watching it
+            return None
+        self.stats["computed"] += 1
+        return await self.store.put(symbol, report, bar_open)
+
+    async def _worker(self):
+        while True:
+            _, _, symbol = await self._queue.get()
+            self._queued.discard(symbol)
+            try:
+                if self.is_stale(symbol):
+                    await self.refresh(symbol)
+            finally:
+                self._queue.task_done()
+
+    async def _sweeper(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Analysis sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self):
+        if self._tasks:
+            return
+        self.store.load()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "watchlist": len(self.watchlist()), "queued": self._queue.qsize(),
+                "reports": len(self.store)}
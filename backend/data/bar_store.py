@@ -0,0 +1,323 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import numpy as np
+import pandas as pd
+from .resample import timeframe_to_seconds
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarRingBuffer:
+    """
+    Fixed-capacity ring buffer of OHLCV bars backed by NumPy arrays.
+    Appending overwrites the oldest bar once full; the newest bar can be updated in place.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64) # Bar open time, ms since epoch
+        self.values = np.zeros((capacity, len(FIELDS)), dtype=np.float64)
+        self.size = 0
+        self._next = 0 # Slot the next append writes to
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_index(self) -> int:
+        return (self._next - 1) % self.capacity
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[self.last_index]) if self.size else None
+
+    def append(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float):
+        i = self._next
+        self.timestamps[i] = timestamp
+        self.values[i] = (open_, high, low, close, volume)
+        self._next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last(self, n: int) -> np.ndarray:
+        """
+        Positions of the newest `n` bars in chronological order.
+        """
+        n = min(n, self.size)
+        return (np.arange(self._next - n, self._next)) % self.capacity
+
+    def find(self, timestamp: int) -> Optional[int]:
+        """
+        Slot holding the bar that opened at `timestamp`, if any.
+        """
+        idx = self.last(self.size)
+        pos = int(np.searchsorted(self.timestamps[idx], timestamp))
+        if pos < len(idx) and self.timestamps[idx[pos]] == timestamp:
+            return int(idx[pos])
+        return None
+
+    def insert(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float):
+        """
+        Inserts a bar older than the newest one (e.g. recovered by a backfill).
+        Rewrites the buffer in order, so it's O(capacity); the oldest bar drops out if full.
+        """
+        idx = self.last(self.size)
+        timestamps = self.timestamps[idx]
+        pos = int(np.searchsorted(timestamps, timestamp))
+        timestamps = np.insert(timestamps, pos, timestamp)[-self.capacity:]
+        values = np.insert(self.values[idx], pos, (open_, high, low, close, volume), axis=0)[-self.capacity:]
+        n = len(timestamps)
+        self.timestamps[:n] = timestamps
+        self.values[:n] = values
+        self.size = n
+        self._next = n % self.capacity
+
+    def bar(self, i: int) -> Dict[str, float]:
+        bar = dict(zip(FIELDS, self.values[i].tolist()))
+        bar['timestamp'] = int(self.timestamps[i])
+        return bar
+
+    def to_frame(self, n: int) -> pd.DataFrame:
+        idx = self.last(n)
+        df = pd.DataFrame(self.values[idx], columns=FIELDS)
+        df.insert(0, 'timestamp', pd.to_datetime(self.timestamps[idx], unit='ms'))
+        return df
+
+
+class HotBarStore:
+    """
+    Hot-data tier: the most recent bars of each streamed symbol, kept in memory.
+    Seeded once from the DB, then kept current from live feed callbacks, so reads for
+    hot symbols need no DB round trip. Ranges beyond the window are left to the DB.
+
+    The first tick of a new bar arrives before the old bar's last 1m candle, so a bar is
+    only reported closed once that candle has been folded in, or `close_grace_seconds`
+    (of feed time) after the bar ended if it never comes.
+    """
+
+    def __init__(self, timeframe: str = '1h', capacity: int = 1000, close_grace_seconds: float = 5.0):
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self.bar_ms = timeframe_to_seconds(timeframe) * 1000
+        self.close_grace_ms = int(close_grace_seconds * 1000)
+        self.buffers: Dict[str, BarRingBuffer] = {}
+        self.bar_close_callbacks: List[Callable] = []
+        self._unreported: Dict[str, int] = {} # symbol -> open time of a superseded bar not reported yet
+        self.hits = 0
+        self.misses = 0
+        self.seeded: Set[str] = set() # Symbols loaded from storage (live bars alone don't count)
+        self._warm_locks: Dict[str, asyncio.Lock] = {}
+
+    def register_bar_close_callback(self, callback: Callable):
+        """
+        callback(symbol, bar) is called once per bar when it is complete (see the class docstring).
+        """
+        self.bar_close_callbacks.append(callback)
+
+    def _buffer(self, symbol: str) -> BarRingBuffer:
+        buf = self.buffers.get(symbol)
+        if buf is None:
+            buf = self.buffers[symbol] = BarRingBuffer(self.capacity)
+        return buf
+
+    def on_tick(self, event: dict):
+        """
+        Live feed callback: folds a price tick into the current bar.
+        """
+        self.update(event['symbol'], event['timestamp'], event['price'], event.get('quantity', 0.0))
+
+    def update(self, symbol: str, timestamp_ms: int, price: float, quantity: float = 0.0):
+        buf = self._buffer(symbol)
+        bucket = timestamp_ms - timestamp_ms % self.bar_ms
+        last_ts = buf.last_timestamp
+
+        if last_ts is not None and bucket == last_ts:
+            row = buf.values[buf.last_index]
+            row[1] = max(row[1], price)
+            row[2] = min(row[2], price)
+            row[3] = price
+            row[4] += quantity
+        elif last_ts is None or bucket > last_ts:
+            self._roll(symbol, buf, bucket, price, price, price, price, quantity)
+        # Ticks older than the current bar are ignored
+        self._report_overdue(symbol, buf, timestamp_ms)
+
+    def on_candle(self, candle):
+        """
+        Candle callback: folds a closed lower-timeframe candle (e.g. 1m) into the current bar.
+        Price ticks keep the close fresher, so only range and volume are taken from it.
+        """
+        buf = self._buffer(candle.symbol)
+        bucket = candle.timestamp - candle.timestamp % self.bar_ms
+        last_ts = buf.last_timestamp
+        if last_ts is not None and bucket == last_ts:
+            row = buf.values[buf.last_index]
+            row[1] = max(row[1], candle.high)
+            row[2] = min(row[2], candle.low)
+            row[4] += candle.volume
+        elif last_ts is None or bucket > last_ts:
+            # Candles arrive in order, so the previous bar already has its last one
+            self._roll(candle.symbol, buf, bucket, candle.open, candle.high, candle.low, candle.close,
+                       candle.volume, complete=True)
+        else:
+            # Late candle for an older bar, e.g. from a reconnect backfill: fill the gap
+            i = buf.find(bucket)
+            if i is not None:
+                row = buf.values[i]
+                row[1] = max(row[1], candle.high)
+                row[2] = min(row[2], candle.low)
+                row[3] = candle.close if candle.timestamp + 60_000 >= bucket + self.bar_ms else row[3]
+                row[4] += candle.volume
+                if candle.timestamp + 60_000 >= bucket + self.bar_ms and self._unreported.get(candle.symbol) == bucket:
+                    del self._unreported[candle.symbol] # Its final minute is in
+                    self._report(candle.symbol, buf, bucket)
+            elif bucket > buf.timestamps[buf.last(buf.size)[0]]:
+                buf.insert(bucket, candle.open, candle.high, candle.low, candle.close, candle.volume)
+        self._report_overdue(candle.symbol, buf, candle.timestamp + 60_000)
+
+    def on_bar(self, symbol: str, timestamp_ms: int, open_: float, high: float, low: float, close: float, volume: float):
+        """
+        Applies a complete bar at this store's timeframe (e.g. from a candle stream or backfill).
+        Replaces the current bar if it has the same open time.
+        """
+        buf = self._buffer(symbol)
+        last_ts = buf.last_timestamp
+        if last_ts is not None and timestamp_ms == last_ts:
+            buf.values[buf.last_index] = (open_, high, low, close, volume)
+        elif last_ts is None or timestamp_ms > last_ts:
+            self._roll(symbol, buf, timestamp_ms, open_, high, low, close, volume, complete=True)
+
+    def _roll(self, symbol: str, buf: BarRingBuffer, timestamp_ms: int, *ohlcv: float, complete: bool = False):
+        """
+        Starts a new bar. The one it supersedes is reported now if `complete`, otherwise
+        once its final 1m candle or the grace period has passed.
+        """
+        closed = buf.last_timestamp
+        buf.append(timestamp_ms, *ohlcv)
+        waiting = self._unreported.pop(symbol, None)
+        if waiting is not None:
+            self._report(symbol, buf, waiting) # Superseded twice: as complete as it gets
+        if closed is not None:
+            if complete:
+                self._report(symbol, buf, closed)
+            else:
+                self._unreported[symbol] = closed
+
+    def _report_overdue(self, symbol: str, buf: BarRingBuffer, now_ms: int):
+        waiting = self._unreported.get(symbol)
+        if waiting is not None and now_ms >= waiting + self.bar_ms + self.close_grace_ms:
+            del self._unreported[symbol]
+            self._report(symbol, buf, waiting)
+
+    def _report(self, symbol: str, buf: BarRingBuffer, timestamp_ms: int):
+        i = buf.find(timestamp_ms)
+        if i is None:
+            return # Dropped out of the window
+        closed = buf.bar(i)
+        for callback in self.bar_close_callbacks:
+            try:
+                callback(symbol, closed)
+            except Exception as e:
+                logger.error(f"Bar close callback failed for {symbol}: {e}")
+
+    def seed(self, symbol: str, df: pd.DataFrame):
+        """
+        Loads historical bars (oldest first), keeping any newer live bars already held.
+        """
+        self.seeded.add(symbol)
+        if df.empty:
+            return # Nothing stored yet; live bars are all there is
+        old = self.buffers.get(symbol)
+        buf = BarRingBuffer(self.capacity)
+
+        timestamps = pd.to_datetime(df['timestamp']).values.astype('datetime64[ms]').astype(np.int64)
+        values = df[list(FIELDS)].to_numpy(dtype=np.float64)
+        n = min(len(df), self.capacity)
+        buf.timestamps[:n] = timestamps[-n:]
+        buf.values[:n] = values[-n:]
+        buf.size = n
+        buf._next = n % self.capacity
+
+        if old is not None and old.size:
+            for i in old.last(old.size):
+                if old.timestamps[i] >= buf.last_timestamp:
+                    bar = old.bar(i)
+                    if bar['timestamp'] == buf.last_timestamp:
+                        # Live bar only saw ticks since startup: keep the stored open
+                        row = buf.values[buf.last_index]
+                        row[1] = max(row[1], bar['high'])
+                        row[2] = min(row[2], bar['low'])
+                        row[3] = bar['close']
+                        row[4] = max(row[4], bar['volume'])
+                    else:
+                        buf.append(bar['timestamp'], *[bar[f] for f in FIELDS])
+        self.buffers[symbol] = buf
+
+    def drop(self, symbol: str):
+        """
+        Forgets a symbol (e.g. when it stops streaming), so it is re-seeded next time.
+        """
+        self.buffers.pop(symbol, None)
+        self._unreported.pop(symbol, None)
+        self.seeded.discard(symbol)
+
+    def is_warm(self, symbol: str) -> bool:
+        """
+        True once the symbol has been seeded from storage, however many live bars it has built.
+        """
+        return symbol in self.seeded
+
+    def get_bars(self, symbol: str, limit: int) -> Optional[pd.DataFrame]:
+        """
+        Returns the newest `limit` bars, or None if the store can't serve the whole range.
+        """
+        buf = self.buffers.get(symbol)
+        if buf is None or limit > buf.size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return buf.to_frame(limit)
+
+    def latest(self, symbol: str) -> Optional[Dict[str, float]]:
+        """
+        Current bar plus the previous close, without touching the DB.
+        """
+        buf = self.buffers.get(symbol)
+        if buf is None or buf.size == 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        bar = buf.bar(buf.last_index)
+        bar['previous_close'] = buf.bar(buf.last(2)[0])['close'] if buf.size > 1 else bar['open']
+        return bar
+
+    async def get_or_load(self, symbol: str, limit: int, loader: Callable[[str, int], Awaitable[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+        """
+        Serves from memory, seeding the symbol once via `loader(symbol, capacity)` if it is cold.
+        Returns None when `limit` exceeds the window or nothing could be loaded.
+        """
+        if limit > self.capacity:
+            self.misses += 1
+            return None
+        if not self.is_warm(symbol):
+            lock = self._warm_locks.setdefault(symbol, asyncio.Lock())
+            async with lock:
+                if not self.is_warm(symbol):
+                    self.seed(symbol, await loader(symbol, self.capacity))
+        return self.get_bars(symbol, limit)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "timeframe": self.timeframe,
+            "symbols": len(self.buffers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# Global instance
+hot_bar_store = HotBarStore()
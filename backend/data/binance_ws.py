@@ -1,73 +1,348 @@
 import asyncio
 import json
 import logging
+import random
+import time
 import websockets
-from typing import List, Callable, Dict
+from typing import Awaitable, List, Callable, Dict, Optional, Set
 from datetime import datetime
+from .fanout import FanOut, Subscriber
+from .metrics import FeedMetrics
 
 logger = logging.getLogger(__name__)
 
+# Fastest available JSON decoder: orjson, then msgspec, then the stdlib
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        json_loads = msgspec.json.Decoder().decode
+    except ImportError:
+        json_loads = json.loads
+
+class TickerEvent:
+    """
+    Ticker update handed to callbacks. Slotted to keep the per-message allocation small;
+    the ISO `datetime` string is only formatted if a consumer reads it.
+    Supports dict-style access (event['price'], event.get(...)) for existing consumers.
+    """
+    __slots__ = ('symbol', 'price', 'timestamp', '_datetime')
+
+    def __init__(self, symbol: str, price: float, timestamp: int):
+        self.symbol = symbol
+        self.price = price
+        self.timestamp = timestamp # Exchange event time, ms since epoch
+        self._datetime = None
+
+    @property
+    def datetime(self) -> str:
+        if self._datetime is None:
+            self._datetime = datetime.utcfromtimestamp(self.timestamp / 1000.0).isoformat()
+        return self._datetime
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        return {'symbol': self.symbol, 'price': self.price, 'timestamp': self.timestamp, 'datetime': self.datetime}
+
+class StaleStreamError(Exception):
+    """
+    Raised when a connection stays open but stops delivering messages.
+    """
+
 class BinanceWebSocketClient:
-    def __init__(self, symbols: List[str], update_interval: int = 1):
-        self.symbols = [s.replace('/', '').lower() for s in symbols]
-        self.base_url = "wss://stream.binance.com:9443/stream?streams="
-        self.callbacks: List[Callable] = []
+    # Binance allows 1024 streams and 5 incoming control messages per second per connection
+    MAX_STREAMS = 1024
+    CONTROL_INTERVAL = 0.25
+    CONTROL_BATCH = 200
+
+    def __init__(self, symbols: List[str], update_interval: int = 1, streams: Optional[List[str]] = None,
+                 ticker_fanout: Optional[FanOut] = None, market_fanout: Optional[FanOut] = None,
+                 reconnect_base_delay: float = 1.0, reconnect_max_delay: float = 60.0,
+                 stale_after: float = 30.0, ping_interval: float = 20.0,
+                 on_reconnect: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None,
+                 metrics: Optional[FeedMetrics] = None, recorder=None, base_url: Optional[str] = None):
+        self.symbols: Set[str] = {s.replace('/', '').lower() for s in symbols}
+        # Stream types per symbol, e.g. ['ticker', 'kline_1m'] or ['ticker', 'trade']
+        self.streams = streams or ['ticker']
+        # Overridable to point at a local stand-in (see data.exchange_sim)
+        self.base_url = base_url or "wss://stream.binance.com:9443/stream?streams="
+        # Each consumer gets its own bounded queue and task; the receive loop never waits on them.
+        # Fan-outs may be shared between connections (see LiveDataManager).
+        self._owns_fanout = ticker_fanout is None
+        self.ticker_fanout = ticker_fanout or FanOut()
+        self.market_fanout = market_fanout or FanOut()
         self.running = False
         self.latest_prices: Dict[str, float] = {}
+        self._symbol_map: Dict[str, str] = {} # BTCUSDT -> BTC/USDT
+        
+        self._websocket = None
+        self._active_streams: Set[str] = set() # Streams the current connection carries
+        self._has_symbols: Optional[asyncio.Event] = None
+        self._control_lock: Optional[asyncio.Lock] = None
+        self._last_control = 0.0
+        self._request_id = 0
+        
+        # Reconnect policy: exponential backoff with jitter, heartbeat pings, stale-stream timeout
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.stale_after = stale_after
+        self.ping_interval = ping_interval
+        # on_reconnect(gaps) gets symbol -> open time (ms) of the last 1m bar seen before the outage
+        self.on_reconnect = on_reconnect
+        self.reconnects = 0
+        self.stale_disconnects = 0
+        self.messages_received = 0
+        self.last_error: Optional[str] = None
+        self._last_bar_ms: Dict[str, int] = {}
+        self._backfill_tasks: Set[asyncio.Task] = set()
+        # Optional latency/throughput instrumentation (see data.metrics)
+        self.metrics = metrics
+        # Optional raw message log for replay (see data.recorder.FeedRecorder)
+        self.recorder = recorder
+
+    def register_callback(self, callback: Callable, policy: str = 'drop_newest', maxsize: int = 10000) -> Subscriber:
+        """
+        callback(event) for ticker events: {'symbol', 'price', 'timestamp', 'datetime'}.
+        policy: 'drop_newest', 'drop_oldest', 'conflate' (latest event per symbol) or 'inline'
+        (called on the receive path, lossless; cheap callbacks only), see Subscriber.
+        """
+        return self.ticker_fanout.subscribe(callback, policy, maxsize)
+
+    def register_market_callback(self, callback: Callable, policy: str = 'drop_newest', maxsize: int = 10000) -> Subscriber:
+        """
+        callback(event_type, symbol, payload) for the raw kline/trade payloads.
+        """
+        return self.market_fanout.subscribe(callback, policy, maxsize)
+
+    def subscriber_stats(self) -> List[dict]:
+        return self.ticker_fanout.stats() + self.market_fanout.stats()
+
+    @property
+    def stream_count(self) -> int:
+        return len(self.symbols) * len(self.streams)
 
-    def register_callback(self, callback: Callable):
-        self.callbacks.append(callback)
+    def _streams_for(self, symbols) -> List[str]:
+        return [f"{s}@{stream}" for s in symbols for stream in self.streams]
+
+    def reserve(self, symbols: List[str]) -> bool:
+        """
+        Adds symbols to the desired set without messaging the exchange yet.
+        Returns True if anything was added.
+        """
+        new = {s.replace('/', '').lower() for s in symbols} - self.symbols
+        if not new:
+            return False
+        if self.stream_count + len(new) * len(self.streams) > self.MAX_STREAMS:
+            raise ValueError("Stream limit per connection exceeded")
+        self.symbols |= new
+        if self._has_symbols is not None:
+            self._has_symbols.set()
+        return True
+
+    async def subscribe(self, symbols: List[str]):
+        """
+        Adds symbols at runtime via a SUBSCRIBE message on the open connection.
+        """
+        if self.reserve(symbols):
+            await self.sync_streams()
+
+    async def unsubscribe(self, symbols: List[str]):
+        """
+        Removes symbols at runtime via an UNSUBSCRIBE message.
+        """
+        gone = {s.replace('/', '').lower() for s in symbols} & self.symbols
+        if not gone:
+            return
+        self.symbols -= gone
+        await self.sync_streams()
+
+    async def sync_streams(self):
+        """
+        Brings the live connection's streams in line with self.symbols.
+        """
+        if self._websocket is None:
+            return # Picked up from the URL on the next connect
+        if self._control_lock is None:
+            self._control_lock = asyncio.Lock()
+        async with self._control_lock:
+            desired = set(self._streams_for(self.symbols))
+            for method, streams in (('SUBSCRIBE', desired - self._active_streams),
+                                    ('UNSUBSCRIBE', self._active_streams - desired)):
+                streams = sorted(streams)
+                for i in range(0, len(streams), self.CONTROL_BATCH):
+                    await self._send_control(method, streams[i:i + self.CONTROL_BATCH])
+
+    async def _send_control(self, method: str, params: List[str]):
+        wait = self._last_control + self.CONTROL_INTERVAL - asyncio.get_running_loop().time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        websocket = self._websocket
+        if websocket is None:
+            return
+        self._request_id += 1
+        await websocket.send(json.dumps({"method": method, "params": params, "id": self._request_id}))
+        self._last_control = asyncio.get_running_loop().time()
+        if method == 'SUBSCRIBE':
+            self._active_streams.update(params)
+        else:
+            self._active_streams.difference_update(params)
 
     async def start(self):
         self.running = True
-        streams = [f"{s}@ticker" for s in self.symbols]
-        url = self.base_url + "/".join(streams)
-        
-        logger.info(f"Connecting to Binance WebSocket: {url}")
+        self.ticker_fanout.start()
+        self.market_fanout.start()
+        self._has_symbols = asyncio.Event()
+        attempt = 0
         
         while self.running:
+            if not self.symbols:
+                # Nothing to stream yet: wait for a subscription instead of holding a connection
+                self._has_symbols.clear()
+                try:
+                    await asyncio.wait_for(self._has_symbols.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            streams = self._streams_for(self.symbols)
+            url = self.base_url + "/".join(streams)
+            logger.info(f"Connecting to Binance WebSocket with {len(streams)} streams")
+            stale = False
+            received_before = self.messages_received
+            
             try:
-                async with websockets.connect(url) as websocket:
+                async with websockets.connect(url, ping_interval=self.ping_interval,
+                                              ping_timeout=self.ping_interval) as websocket:
                     logger.info("Connected to Binance WebSocket")
-                    while self.running:
-                        message = await websocket.recv()
-                        data = json.loads(message)
-                        
-                        if 'data' in data:
-                            ticker = data['data']
-                            symbol = ticker['s']
-                            # Convert back to slash format if needed, but for now map clean
-                            # Binance returns symbol like BTCUSDT
-                            
-                            # Simple normalization: Insert / before last 3-4 chars? 
-                            # Better: maintain a map.
-                            normalized_symbol = self._normalize_symbol(symbol)
-                            
-                            price = float(ticker['c'])
-                            self.latest_prices[normalized_symbol] = price
-                            
-                            event = {
-                                'symbol': normalized_symbol,
-                                'price': price,
-                                'timestamp': ticker['E'],
-                                'datetime': datetime.utcfromtimestamp(ticker['E'] / 1000.0).isoformat()
-                            }
-                            
-                            for callback in self.callbacks:
-                                if asyncio.iscoroutinefunction(callback):
-                                    await callback(event)
-                                else:
-                                    callback(event)
-                                    
+                    self._websocket = websocket
+                    self._active_streams = set(streams)
+                    # Catch subscriptions that changed while connecting
+                    await self.sync_streams()
+                    if self.reconnects:
+                        self._schedule_backfill()
+                    watchdog = asyncio.create_task(self._watch_stale(websocket))
+                    try:
+                        await self._receive(websocket)
+                    except websockets.ConnectionClosed:
+                        if watchdog.done():
+                            raise StaleStreamError(f"No messages for {self.stale_after}s")
+                        raise
+                    finally:
+                        watchdog.cancel()
             except Exception as e:
+                stale = isinstance(e, StaleStreamError)
+                self.last_error = str(e)
                 logger.error(f"WebSocket Error: {e}")
-                await asyncio.sleep(5) # Reconnect delay
+            finally:
+                self._websocket = None
+            
+            if not self.running:
+                break
+            if self.messages_received > received_before:
+                attempt = 0 # The connection was healthy: reset the backoff
+            self.reconnects += 1
+            if self.metrics is not None:
+                self.metrics.on_reconnect(stale=stale)
+            delay = self._backoff_delay(attempt)
+            attempt += 1
+            logger.info(f"Reconnecting in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+    # Messages handled before yielding to consumers; recv() doesn't suspend while frames are buffered
+    YIELD_EVERY = 64
+
+    async def _receive(self, websocket):
+        while self.running:
+            message = await websocket.recv()
+            self.messages_received += 1
+            if self.messages_received % self.YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            if self.metrics is not None or self.recorder is not None:
+                received_at, received_mono = time.time(), time.monotonic()
+                if self.recorder is not None:
+                    self.recorder.record(message, received_at)
+            payload = json_loads(message).get('data')
+            if payload is not None:
+                self._handle_payload(payload)
+                if self.metrics is not None:
+                    self._observe(payload, received_at, received_mono)
+
+    async def _watch_stale(self, websocket) -> bool:
+        """
+        Drops the connection if no message arrived for `stale_after` seconds and returns True.
+        Checking a counter periodically keeps timers out of the per-message path.
+        """
+        seen = self.messages_received
+        while True:
+            await asyncio.sleep(self.stale_after)
+            if self.messages_received == seen:
+                self.stale_disconnects += 1
+                websocket.transport.abort()
+                return True
+            seen = self.messages_received
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        Exponential backoff with jitter, so many connections don't reconnect in lockstep.
+        """
+        ceiling = min(self.reconnect_max_delay, self.reconnect_base_delay * (2 ** attempt))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def _schedule_backfill(self):
+        """
+        Hands the missed interval per symbol to on_reconnect, without holding up the receive loop.
+        """
+        if self.on_reconnect is None or not self._last_bar_ms:
+            return
+        gaps = {self._normalize_symbol(s.upper()): ts for s, ts in self._last_bar_ms.items() if s in self.symbols}
+        task = asyncio.create_task(self.on_reconnect(gaps))
+        self._backfill_tasks.add(task)
+        task.add_done_callback(self._backfill_tasks.discard)
+
+    def _handle_payload(self, payload: dict):
+        event_type = payload.get('e')
+        symbol = self._normalize_symbol(payload['s'])
+        
+        if event_type in ('24hrTicker', '24hrMiniTicker'):
+            price = float(payload['c'])
+            self.latest_prices[symbol] = price
+            self.ticker_fanout.publish(symbol, TickerEvent(symbol, price, payload['E']))
+        elif event_type in ('kline', 'trade'):
+            # Remember the latest 1m bar per symbol so a reconnect knows where the gap starts
+            if event_type == 'kline':
+                self._last_bar_ms[payload['s'].lower()] = payload['k']['t']
+            else:
+                self._last_bar_ms[payload['s'].lower()] = payload['T'] - payload['T'] % 60_000
+            self.market_fanout.publish(symbol, event_type, symbol, payload)
+        elif event_type == 'depthUpdate':
+            self.market_fanout.publish(symbol, 'depth', symbol, payload)
+
+    def _observe(self, payload: dict, received_at: float, received_mono: float):
+        self.metrics.observe_message(self._normalize_symbol(payload['s']), payload.get('e'), payload.get('E'),
+                                     received_at, received_mono, time.monotonic())
 
     def _normalize_symbol(self, binance_symbol: str) -> str:
-        # Simple heuristic for common pairs
-        if binance_symbol.endswith("USDT"):
-            return f"{binance_symbol[:-4]}/USDT"
-        return binance_symbol
+        normalized = self._symbol_map.get(binance_symbol)
+        if normalized is None:
+            # Simple heuristic for common pairs
+            normalized = binance_symbol
+            if binance_symbol.endswith("USDT"):
+                normalized = f"{binance_symbol[:-4]}/USDT"
+            self._symbol_map[binance_symbol] = normalized
+        return normalized
 
     def stop(self):
         self.running = False
+        if self._owns_fanout:
+            self.ticker_fanout.stop()
+            self.market_fanout.stop()
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+from .db import get_pool
+
+logger = logging.getLogger(__name__)
+
+CANDLE_MS = 60_000 # The aggregator builds 1m bars
+CLOSED_HORIZON_MS = 86_400_000 # How far back closed bars are remembered to keep emissions exactly-once
+
+
+class Candle:
+    __slots__ = ('symbol', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'closed')
+
+    def __init__(self, symbol: str, timestamp: int, open_: float, high: float, low: float,
+                 close: float, volume: float, closed: bool = False):
+        self.symbol = symbol
+        self.timestamp = timestamp # Open time, ms since epoch
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.closed = closed
+
+    def to_record(self) -> tuple:
+        return (self.symbol, '1m', datetime.utcfromtimestamp(self.timestamp / 1000.0),
+                self.open, self.high, self.low, self.close, self.volume)
+
+
+class CandleAggregator:
+    """
+    Turns live @kline_1m or @trade payloads into 1m OHLCV bars per symbol.
+    Closed bars are passed to registered callbacks exactly once, whichever of the live
+    stream and a reconnect backfill delivers them first (open times of the last day of
+    closed bars are remembered per symbol).
+    """
+
+    def __init__(self):
+        self.current: Dict[str, Candle] = {}
+        self.last_closed: Dict[str, int] = {} # Open time of the newest closed bar per symbol
+        self.closed: Dict[str, Set[int]] = {} # Open times of recently closed bars per symbol
+        self.callbacks: List[Callable] = []
+
+    def register_callback(self, callback: Callable):
+        """
+        callback(candle) for each closed 1m candle.
+        """
+        self.callbacks.append(callback)
+
+    def on_market_event(self, event_type: str, symbol: str, payload: dict):
+        if event_type == 'kline':
+            self._on_kline(symbol, payload['k'])
+        elif event_type == 'trade':
+            self._on_trade(symbol, int(payload['T']), float(payload['p']), float(payload['q']))
+        elif event_type == 'backfill':
+            self._on_backfill(symbol, payload['rows'], payload['until'])
+
+    def _on_backfill(self, symbol: str, rows: List[list], until_ms: int):
+        """
+        Closes bars recovered over REST after a reconnect, oldest first.
+        Bars still forming at `until_ms` or already closed are skipped. The live bar from
+        before the outage never got its final update, so it is taken from here in full.
+        """
+        horizon = self.last_closed.get(symbol, -1) - CLOSED_HORIZON_MS
+        for t, o, h, l, c, v in rows:
+            t = int(t)
+            if t + CANDLE_MS > until_ms or t <= horizon:
+                continue
+            self._close(Candle(symbol, t, float(o), float(h), float(l), float(c), float(v)))
+
+    def _on_kline(self, symbol: str, k: dict):
+        # The exchange sends the running bar repeatedly, then once more with x=true
+        candle = Candle(symbol, int(k['t']), float(k['o']), float(k['h']), float(k['l']),
+                        float(k['c']), float(k['v']), bool(k['x']))
+        # A previous bar that never got its x=true update was cut off by a disconnect.
+        # It is not emitted with partial data; the reconnect backfill delivers it in full.
+        self.current[symbol] = candle
+        if candle.closed:
+            self._close(candle)
+
+    def _on_trade(self, symbol: str, trade_time: int, price: float, quantity: float):
+        bucket = trade_time - trade_time % CANDLE_MS
+        candle = self.current.get(symbol)
+        if candle is None or bucket > candle.timestamp:
+            if candle is not None and not candle.closed:
+                self._close(candle)
+            self.current[symbol] = Candle(symbol, bucket, price, price, price, price, quantity)
+        elif bucket == candle.timestamp:
+            candle.high = max(candle.high, price)
+            candle.low = min(candle.low, price)
+            candle.close = price
+            candle.volume += quantity
+        # Late trades for an already closed bar are dropped
+
+    def _close(self, candle: Candle):
+        candle.closed = True
+        closed = self.closed.setdefault(candle.symbol, set())
+        if candle.timestamp in closed:
+            return # Delivered by the backfill and the live stream
+        closed.add(candle.timestamp)
+        last = max(self.last_closed.get(candle.symbol, -1), candle.timestamp)
+        self.last_closed[candle.symbol] = last
+        if len(closed) > 2 * CLOSED_HORIZON_MS // CANDLE_MS:
+            self.closed[candle.symbol] = {t for t in closed if t > last - CLOSED_HORIZON_MS}
+        for callback in self.callbacks:
+            try:
+                callback(candle)
+            except Exception as e:
+                logger.error(f"Candle callback failed for {candle.symbol}: {e}")
+
+
+class MarketDataWriter:
+    """
+    Buffers closed candles and writes them to market_data in batches.
+    A batch is flushed when it reaches `batch_size` rows or every `flush_interval`
+    seconds, as one multi-row upsert, followed by a rollup refresh per symbol from
+    the oldest bar written for it. The monthly partitions a batch touches (and the
+    month after) are created first, so rows never pile up in the default partition.
+    """
+
+    UPSERT = """
+        INSERT INTO market_data (symbol, timeframe, timestamp, open, high, low, close, volume)
+        SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::timestamp[],
+                             $4::float8[], $5::float8[], $6::float8[], $7::float8[], $8::float8[])
+        ON CONFLICT (symbol, timeframe, timestamp) DO UPDATE SET
+            open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+            close = EXCLUDED.close, volume = EXCLUDED.volume
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 5.0, max_buffer: int = 50_000,
+                 stop_timeout: float = 30.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer # Rows kept while the DB is unreachable
+        self.stop_timeout = stop_timeout # How long stop() waits for an in-flight write
+        self.buffer: List[tuple] = []
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self._partitions: Set[datetime] = set() # Month starts known to have a partition
+        self._flush_event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def add(self, candle: Candle):
+        self.buffer.append(candle.to_record())
+        if len(self.buffer) > self.max_buffer:
+            overflow = len(self.buffer) - self.max_buffer
+            del self.buffer[:overflow]
+            self.rows_dropped += overflow
+        if len(self.buffer) >= self.batch_size and self._flush_event is not None:
+            self._flush_event.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._flush_event = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Lets the writer loop finish its current batch and exit, then writes what is left.
+        """
+        if self._task is not None:
+            task, self._task = self._task, None
+            self._stopping = True
+            self._flush_event.set()
+            try:
+                # A write stuck past the timeout is cancelled; flush() puts its batch back
+                await asyncio.wait_for(task, timeout=self.stop_timeout)
+            except asyncio.TimeoutError:
+                pass
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        columns = list(zip(*batch))
+        since: Dict[str, datetime] = {}
+        for symbol, timestamp in zip(columns[0], columns[2]):
+            if symbol not in since or timestamp < since[symbol]:
+                since[symbol] = timestamp
+        months = {_month_start(ts) for ts in columns[2]}
+        months |= {_next_month(m) for m in months}
+        months -= self._partitions
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    for month in sorted(months):
+                        await conn.execute('SELECT ensure_market_data_partition($1)', month)
+                    await conn.execute(self.UPSERT, *columns)
+                    for symbol, first in since.items():
+                        await conn.execute('SELECT refresh_market_data_rollups($1, $2)', symbol, first)
+            self._partitions |= months
+            self.rows_written += len(batch)
+        except asyncio.CancelledError:
+            self.buffer = batch + self.buffer
+            raise
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} candles: {e}")
+            # Keep the rows for the next attempt
+            self.buffer = batch + self.buffer
+
+
+def _month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
@@ -0,0 +1,20 @@
+import os
+from typing import Optional
+
+
+def ccxt_options(rest_url: str) -> dict:
+    """
+    Options for ccxt.binance(...) that route public spot REST calls to `rest_url`.
+    """
+    return {
+        'urls': {'api': {'public': f"{rest_url}/api/v3"}},
+        'options': {'fetchMarkets': {'types': ['spot']}},
+    }
+
+
+def exchange_options_from_env() -> Optional[dict]:
+    """
+    ccxt options for BINANCE_REST_URL (e.g. the data.exchange_sim stand-in), or None for Binance itself.
+    """
+    rest_url = os.getenv("BINANCE_REST_URL")
+    return ccxt_options(rest_url) if rest_url else None
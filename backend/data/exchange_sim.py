@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Union
+from urllib.parse import parse_qs, urlsplit
+
+from .exchange_config import ccxt_options
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    __slots__ = ('websocket', 'streams', 'order', 'task')
+
+    def __init__(self, websocket, streams: List[str]):
+        self.websocket = websocket
+        self.streams: Set[str] = set(streams)
+        self.order: List[str] = sorted(self.streams)
+        self.task: Optional[asyncio.Task] = None
+
+    def update(self, method: str, params: List[str]):
+        if method == 'SUBSCRIBE':
+            self.streams.update(params)
+        else:
+            self.streams.difference_update(params)
+        self.order = sorted(self.streams)
+
+
+class ExchangeSimulator:
+    """
+    Local stand-in for Binance spot: the combined-stream websocket (/stream?streams=...,
+    SUBSCRIBE/UNSUBSCRIBE control messages) and the public REST endpoints the backend uses
+    (/api/v3/klines, /api/v3/ticker/24hr, /api/v3/ticker/price, /api/v3/exchangeInfo, ...).
+
+    Each connection receives `rate` messages per second, spread round-robin over its streams
+    (ticker, miniTicker, kline_1m, trade and depth diffs are generated; others are ignored).
+    Depth diffs carry consecutive U/u update ids that match /api/v3/depth snapshots.
+    Event times (E) are the simulator's wall clock, so a client on the same host can measure
+    end-to-end latency. `disconnect_every` drops every connection periodically to exercise
+    reconnects and backfill.
+    """
+
+    # Send schedule granularity
+    TICK = 0.005
+
+    def __init__(self, symbols: Union[int, List[str]] = 100, rate: float = 1000.0,
+                 host: str = '127.0.0.1', port: int = 0, disconnect_every: Optional[float] = None,
+                 seed: int = 0):
+        if isinstance(symbols, int):
+            symbols = [f"SIM{i}USDT" for i in range(symbols)]
+        # Binance style: BTCUSDT
+        self.symbols: List[str] = [s.replace('/', '').upper() for s in symbols]
+        self.rate = rate
+        self.host = host
+        self.port = port
+        self.disconnect_every = disconnect_every
+        self._random = random.Random(seed)
+        self.prices: Dict[str, float] = {s: self._base_price(s) for s in self.symbols}
+        self._candles: Dict[str, list] = {}
+        self._books: Dict[str, list] = {} # symbol -> [update id, bids {price: qty}, asks {price: qty}]
+        self._trade_id = 0
+        self.connections: Set[_Connection] = set()
+        self.messages_sent = 0
+        self.disconnects = 0
+        self._server = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def ws_url(self) -> str:
+        """
+        Prefix for BinanceWebSocketClient.base_url.
+        """
+        return f"ws://{self.host}:{self.port}/stream?streams="
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def ccxt_options(self) -> dict:
+        return ccxt_options(self.rest_url)
+
+    async def start(self):
+        from websockets.asyncio.server import serve
+        self._server = await serve(self._handle, self.host, self.port,
+                                   process_request=self._process_request, max_queue=None,
+                                   compression=None) # Binance streams are uncompressed
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.disconnect_every:
+            self._tasks.append(asyncio.create_task(self._disconnect_loop()))
+        logger.info(f"Exchange simulator on {self.rest_url} ({len(self.symbols)} symbols, {self.rate:g} msg/s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def disconnect_all(self):
+        """
+        Drops every connection without a close handshake, like a network failure.
+        """
+        for connection in list(self.connections):
+            connection.websocket.transport.abort()
+            self.disconnects += 1
+
+    async def _disconnect_loop(self):
+        while True:
+            await asyncio.sleep(self.disconnect_every)
+            self.disconnect_all()
+
+    # --- websocket ---
+
+    async def _handle(self, websocket):
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        streams = [s for s in query.get('streams', [''])[0].split('/') if s]
+        connection = _Connection(websocket, streams)
+        self.connections.add(connection)
+        connection.task = asyncio.create_task(self._stream(connection))
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                method = request.get('method')
+                if method in ('SUBSCRIBE', 'UNSUBSCRIBE'):
+                    connection.update(method, request.get('params', []))
+                    result = None
+                elif method == 'LIST_SUBSCRIPTIONS':
+                    result = connection.order
+                else:
+                    await websocket.send(json.dumps({"error": {"code": 2, "msg": "Invalid request"}, "id": request.get('id')}))
+                    continue
+                await websocket.send(json.dumps({"result": result, "id": request.get('id')}))
+        except Exception:
+            pass # Connection dropped, possibly on purpose
+        finally:
+            connection.task.cancel()
+            self.connections.discard(connection)
+
+    async def _stream(self, connection: _Connection):
+        started = time.monotonic()
+        sent = 0
+        index = 0
+        websocket = connection.websocket
+        while True:
+            await asyncio.sleep(self.TICK)
+            due = int((time.monotonic() - started) * self.rate) - sent
+            order = connection.order
+            if not order:
+                sent += due
+                continue
+            for _ in range(due):
+                index = (index + 1) % len(order)
+                message = self._message(order[index])
+                if message is not None:
+                    await websocket.send(message)
+                    self.messages_sent += 1
+                sent += 1
+
+    def _step(self, symbol: str) -> float:
+        price = self.prices[symbol] * (1.0 + self._random.gauss(0.0, 0.0005))
+        self.prices[symbol] = price
+        return price
+
+    def _message(self, stream: str) -> Optional[str]:
+        name, _, kind = stream.partition('@')
+        symbol = name.upper()
+        if symbol not in self.prices:
+            return None
+        price = self._step(symbol)
+        now = int(time.time() * 1000)
+
+        if kind == 'ticker' or kind == 'miniTicker':
+            event = '24hrTicker' if kind == 'ticker' else '24hrMiniTicker'
+            return (f'{{"stream":"{stream}","data":{{"e":"{event}","E":{now},"s":"{symbol}",'
+                    f'"c":"{price:.8f}","o":"{price:.8f}","h":"{price * 1.01:.8f}","l":"{price * 0.99:.8f}",'
+                    f'"v":"1000.0","q":"{price * 1000:.2f}"}}}}')
+
+        if kind == 'trade':
+            self._trade_id += 1
+            quantity = self._random.random()
+            return (f'{{"stream":"{stream}","data":{{"e":"trade","E":{now},"s":"{symbol}","t":{self._trade_id},'
+                    f'"p":"{price:.8f}","q":"{quantity:.8f}","T":{now},"m":false}}}}')
+
+        if kind == 'kline_1m':
+            minute = now - now % 60_000
+            candle = self._candles.get(symbol)
+            closed = None
+            if candle is None or candle[0] != minute:
+                closed = candle
+                candle = self._candles[symbol] = [minute, price, price, price, price, 0.0]
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] += self._random.random()
+            if closed is not None:
+                # The final update of the previous bar, as Binance sends it
+                return self._kline(stream, symbol, now, closed, True)
+            return self._kline(stream, symbol, now, candle, False)
+
+        if kind.startswith('depth'):
+            return self._depth(stream, symbol, now, price)
+
+        return None
+
+    DEPTH_LEVELS = 50
+
+    def _book(self, symbol: str) -> list:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = [1, {}, {}]
+            self._update_book(symbol, book, self.prices[symbol], self.DEPTH_LEVELS)
+        return book
+
+    def _update_book(self, symbol: str, book: list, price: float, levels: int) -> tuple:
+        """
+        Moves the book towards `price` and changes `levels` random levels per side.
+        Returns the changed (bids, asks) as [price, qty] string pairs.
+        """
+        tick = 10 ** (math.floor(math.log10(price)) - 4)
+        mid = round(price / tick) * tick
+        changed = ([], [])
+        for side, sign, out in ((book[1], -1, changed[0]), (book[2], 1, changed[1])):
+            # Levels now on the wrong side of the mid are removed
+            for level in [p for p in side if (p - mid) * sign <= 0]:
+                del side[level]
+                out.append([f"{level:.8f}", "0.00000000"])
+            for _ in range(levels):
+                level = round(mid + sign * tick * self._random.randint(1, self.DEPTH_LEVELS), 10)
+                quantity = 0.0 if self._random.random() < 0.2 and side else round(self._random.random() * 5, 8)
+                if quantity:
+                    side[level] = quantity
+                elif level in side:
+                    del side[level]
+                else:
+                    continue
+                out.append([f"{level:.8f}", f"{quantity:.8f}"])
+        return changed
+
+    def _depth(self, stream: str, symbol: str, now: int, price: float) -> str:
+        book = self._book(symbol)
+        bids, asks = self._update_book(symbol, book, price, 3)
+        first = book[0] + 1
+        book[0] += self._random.randint(1, 3) # Several exchange updates can fold into one event
+        return json.dumps({"stream": stream, "data": {"e": "depthUpdate", "E": now, "s": symbol,
+                                                     "U": first, "u": book[0], "b": bids, "a": asks}})
+
+    @staticmethod
+    def _kline(stream: str, symbol: str, now: int, candle: list, closed: bool) -> str:
+        t, o, h, l, c, v = candle
+        return (f'{{"stream":"{stream}","data":{{"e":"kline","E":{now},"s":"{symbol}","k":{{'
+                f'"t":{t},"T":{t + 59_999},"s":"{symbol}","i":"1m","o":"{o:.8f}","h":"{h:.8f}",'
+                f'"l":"{l:.8f}","c":"{c:.8f}","v":"{v:.8f}","x":{"true" if closed else "false"}}}}}}}')
+
+    # --- REST ---
+
+    @staticmethod
+    def _base_price(symbol: str) -> float:
+        return 1.0 + zlib.crc32(symbol.encode()) % 50_000
+
+    def historic_bar(self, symbol: str, t: int) -> list:
+        """
+        Deterministic synthetic 1m bar opening at `t` (ms), as a /api/v3/klines row,
+        so repeated backfills agree with each other.
+        """
+        base = self._base_price(symbol)
+        o = base * (1.0 + 0.02 * math.sin(t / 3_600_000.0))
+        c = base * (1.0 + 0.02 * math.sin((t + 60_000) / 3_600_000.0))
+        v = 10.0 + (zlib.crc32(f"{symbol}{t}".encode()) % 1000) / 10.0
+        return [t, f"{o:.8f}", f"{max(o, c) * 1.001:.8f}", f"{min(o, c) * 0.999:.8f}", f"{c:.8f}",
+                f"{v:.8f}", t + 59_999, f"{v * c:.8f}", 100, f"{v / 2:.8f}", f"{v * c / 2:.8f}", "0"]
+
+    def _ticker_24hr(self, symbol: str) -> dict:
+        price = self.prices[symbol]
+        return {
+            "symbol": symbol, "lastPrice": f"{price:.8f}", "openPrice": f"{price * 0.99:.8f}",
+            "highPrice": f"{price * 1.02:.8f}", "lowPrice": f"{price * 0.97:.8f}",
+            "priceChange": f"{price * 0.01:.8f}", "priceChangePercent": "1.0",
+            "volume": "1000.0", "quoteVolume": f"{price * 1000:.2f}",
+            "bidPrice": f"{price * 0.9999:.8f}", "askPrice": f"{price * 1.0001:.8f}",
+            "openTime": int(time.time() * 1000) - 86_400_000, "closeTime": int(time.time() * 1000),
+        }
+
+    def _rest(self, path: str, params: Dict[str, str]):
+        symbol = params.get('symbol')
+        if symbol is not None and symbol not in self.prices:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+
+        if path == '/api/v3/ping':
+            return 200, {}
+        if path == '/api/v3/time':
+            return 200, {"serverTime": int(time.time() * 1000)}
+        if path == '/api/v3/exchangeInfo':
+            return 200, {"timezone": "UTC", "serverTime": int(time.time() * 1000), "rateLimits": [], "symbols": [
+                {"symbol": s, "status": "TRADING", "baseAsset": s[:-4], "quoteAsset": "USDT",
+                 "baseAssetPrecision": 8, "quoteAssetPrecision": 8, "orderTypes": ["LIMIT", "MARKET"],
+                 "isSpotTradingAllowed": True, "isMarginTradingAllowed": False, "permissions": ["SPOT"],
+                 "filters": []}
+                for s in self.symbols
+            ]}
+        if path == '/api/v3/klines':
+            if symbol is None:
+                return 400, {"code": -1102, "msg": "Mandatory parameter 'symbol' was not sent."}
+            limit = min(int(params.get('limit', 500)), 1000)
+            now = int(time.time() * 1000)
+            end = int(params.get('endTime', now))
+            start = int(params.get('startTime', end - limit * 60_000))
+            first = start - start % 60_000 + (60_000 if start % 60_000 else 0)
+            # Only closed bars plus the one still forming, like the exchange
+            bars = [self.historic_bar(symbol, t) for t in range(first, min(end, now) + 1, 60_000)]
+            return 200, bars[:limit]
+        if path == '/api/v3/ticker/24hr':
+            if symbol is not None:
+                return 200, self._ticker_24hr(symbol)
+            return 200, [self._ticker_24hr(s) for s in self.symbols]
+        if path == '/api/v3/depth':
+            if symbol is None:
+                return 400, {"code": -1102, "msg": "Mandatory parameter 'symbol' was not sent."}
+            limit = min(int(params.get('limit', 100)), 5000)
+            update_id, bids, asks = self._book(symbol)
+            return 200, {
+                "lastUpdateId": update_id,
+                "bids": [[f"{p:.8f}", f"{q:.8f}"] for p, q in sorted(bids.items(), reverse=True)[:limit]],
+                "asks": [[f"{p:.8f}", f"{q:.8f}"] for p, q in sorted(asks.items())[:limit]],
+            }
+        if path == '/api/v3/ticker/price':
+            if symbol is not None:
+                return 200, {"symbol": symbol, "price": f"{self.prices[symbol]:.8f}"}
+            return 200, [{"symbol": s, "price": f"{p:.8f}"} for s, p in self.prices.items()]
+        return 404, {"code": -1, "msg": "Not found"}
+
+    def _process_request(self, connection, request):
+        from websockets.datastructures import Headers
+        from websockets.http11 import Response
+
+        url = urlsplit(request.path)
+        if url.path in ('/stream', '/ws') or url.path.startswith('/ws/'):
+            return None # Websocket handshake
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            status, body = self._rest(url.path, params)
+        except (TypeError, ValueError):
+            status, body = 400, {"code": -1100, "msg": "Illegal characters found in a parameter."}
+        payload = json.dumps(body).encode()
+        headers = Headers([("Content-Type", "application/json"), ("Content-Length", str(len(payload))),
+                           ("Connection", "close")])
+        return Response(status, "OK" if status == 200 else "Error", headers, payload)
+
+
+async def _main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Local Binance stand-in")
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=1000.0, help="Messages per second per connection")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9443)
+    parser.add_argument('--disconnect-every', type=float, default=None)
+    args = parser.parse_args()
+
+    simulator = ExchangeSimulator(args.symbols, args.rate, args.host, args.port, args.disconnect_every)
+    await simulator.start()
+    print(f"Websocket: {simulator.ws_url}<streams>  REST: {simulator.rest_url}/api/v3")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('drop_newest', 'drop_oldest', 'conflate', 'inline')
+
+
+class Subscriber:
+    """
+    One consumer of the feed with its own bounded queue and consumer task.
+    The producer only ever calls `offer`, which never waits. What happens when the
+    queue is full depends on the policy:
+      - drop_newest: queued events are kept and new ones are dropped until the consumer catches up
+      - drop_oldest: the oldest queued event is discarded to make room
+      - conflate: only the latest event per key (symbol) is kept
+    An `inline` subscriber has no queue: offer calls it right away on the producer's path,
+    so it sees every event in order. Only for cheap, synchronous callbacks.
+    """
+
+    def __init__(self, callback: Callable, policy: str = 'drop_newest', maxsize: int = 10000, name: Optional[str] = None,
+                 observer: Optional[Callable[[str, Hashable, float], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        if policy == 'inline' and asyncio.iscoroutinefunction(callback):
+            raise ValueError("Inline subscribers must be synchronous")
+        self.callback = callback
+        self.policy = policy
+        self.maxsize = maxsize
+        self.name = name or getattr(callback, '__qualname__', repr(callback))
+        self.is_async = asyncio.iscoroutinefunction(callback)
+        # observer(name, key, seconds) after each delivery, e.g. FeedMetrics.observe_delivery
+        self.observer = observer
+
+        self._items: deque = deque()
+        self._latest: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None # Set while the queue is empty and nothing is being handled
+        self._task: Optional[asyncio.Task] = None
+
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.errors = 0
+        self.max_lag = 0
+        self.last_delivery_lag_ms = 0.0
+
+    def __len__(self):
+        return len(self._latest) if self.policy == 'conflate' else len(self._items)
+
+    def offer(self, key: Hashable, args: tuple, enqueued_at: Optional[float] = None):
+        if self.policy == 'inline':
+            self._call(args)
+            self._delivered(key, enqueued_at or time.monotonic())
+            return
+        item = (enqueued_at or time.monotonic(), key, args)
+        if self.policy == 'conflate':
+            if key in self._latest:
+                self.conflated += 1
+                self._latest[key] = item
+            else:
+                if len(self._latest) >= self.maxsize:
+                    self._latest.popitem(last=False)
+                    self.dropped += 1
+                self._latest[key] = item
+        elif len(self._items) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == 'drop_oldest':
+                self._items.popleft()
+                self._items.append(item)
+        else:
+            self._items.append(item)
+
+        depth = len(self)
+        if depth > self.max_lag:
+            self.max_lag = depth
+        if self._idle is not None:
+            self._idle.clear()
+        if self._wakeup is not None and not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _next(self):
+        if self.policy == 'conflate':
+            return self._latest.popitem(last=False)[1] if self._latest else None
+        return self._items.popleft() if self._items else None
+
+    def start(self):
+        if self._task is None and self.policy != 'inline':
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._idle.set() # Nothing more will be handled: release join() waiters
+
+    async def join(self):
+        """
+        Waits until every queued event has been handled (returns at once if not running).
+        """
+        if self._idle is not None:
+            await self._idle.wait()
+
+    # Events handled per turn before yielding back to the event loop
+    BATCH = 64
+
+    async def _run(self):
+        handled = 0
+        while True:
+            item = self._next()
+            if item is None:
+                handled = 0
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            enqueued_at, key, args = item
+            if self.is_async:
+                try:
+                    await self.callback(*args)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Subscriber {self.name} failed: {e}")
+            else:
+                self._call(args)
+            self._delivered(key, enqueued_at)
+            handled += 1
+            if handled >= self.BATCH and not self.is_async:
+                # Let the receive loop run between batches
+                handled = 0
+                await asyncio.sleep(0)
+
+    def _call(self, args: tuple):
+        try:
+            self.callback(*args)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Subscriber {self.name} failed: {e}")
+
+    def _delivered(self, key: Hashable, enqueued_at: float):
+        self.delivered += 1
+        lag = time.monotonic() - enqueued_at
+        self.last_delivery_lag_ms = lag * 1000
+        if self.observer is not None:
+            self.observer(self.name, key, lag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "queued": len(self),
+            "max_lag": self.max_lag,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "errors": self.errors,
+            "last_delivery_lag_ms": round(self.last_delivery_lag_ms, 3),
+        }
+
+
+class FanOut:
+    """
+    Publishes events to independent subscribers without waiting on any of them.
+    """
+
+    def __init__(self, observer: Optional[Callable[[str, Hashable, float], None]] = None):
+        self.subscribers: List[Subscriber] = []
+        self.started = False
+        self.observer = observer
+
+    def subscribe(self, callback: Callable, policy: str = 'drop_newest', maxsize: int = 10000, name: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(callback, policy, maxsize, name, self.observer)
+        self.subscribers.append(subscriber)
+        if self.started:
+            subscriber.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.stop()
+        self.subscribers.remove(subscriber)
+
+    def publish(self, key: Hashable, *args):
+        if not self.subscribers:
+            return
+        now = time.monotonic()
+        for subscriber in self.subscribers:
+            subscriber.offer(key, args, now)
+
+    def start(self):
+        self.started = True
+        for subscriber in self.subscribers:
+            subscriber.start()
+
+    async def join(self):
+        """
+        Waits until every subscriber has handled what was published so far.
+        """
+        for subscriber in list(self.subscribers):
+            await subscriber.join()
+
+    def stop(self):
+        self.started = False
+        for subscriber in self.subscribers:
+            subscriber.stop()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [s.stats() for s in self.subscribers]
@@ -0,0 +1,127 @@
+"""
+End-to-end throughput and latency of the live data path against the local exchange simulator.
+
+    cd backend
+    python -m data.feed_benchmark --rates 1000,5000,10000,25000,50000 --symbols 200 --duration 10
+
+The simulator runs in its own process so it doesn't compete with the client for the GIL.
+Latency is local wall clock minus the event time E, which has millisecond resolution.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from .binance_ws import BinanceWebSocketClient
+from .exchange_sim import ExchangeSimulator
+from .metrics import FeedMetrics
+
+
+def _run_simulator(symbols: int, rate: float, ready):
+    async def main():
+        simulator = ExchangeSimulator(symbols, rate)
+        await simulator.start()
+        ready.send(simulator.ws_url)
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+
+class _TimedClient(BinanceWebSocketClient):
+    """
+    Records how long each message took to reach latest_prices.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.samples: List[float] = []
+        self.recording = False
+
+    def _handle_payload(self, payload: dict):
+        super()._handle_payload(payload)
+        if self.recording:
+            self.samples.append(time.time() * 1000 - payload['E'])
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": float('nan'), "p99": float('nan'), "max": float('nan')}
+    values = np.asarray(samples)
+    return {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99)),
+            "max": float(values.max())}
+
+
+async def run_once(rate: float, symbols: int = 200, duration: float = 10.0, consumers: int = 1,
+                   policy: str = 'drop_newest', warmup: float = 2.0) -> Dict[str, object]:
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    process = context.Process(target=_run_simulator, args=(symbols, rate, child), daemon=True)
+    process.start()
+    try:
+        ws_url = await asyncio.get_running_loop().run_in_executor(None, parent.recv)
+
+        metrics = FeedMetrics()
+        client = _TimedClient([f"SIM{i}/USDT" for i in range(symbols)], base_url=ws_url, metrics=metrics)
+        callback_samples: List[float] = []
+        recording = [False]
+
+        def consumer(event):
+            if recording[0]:
+                callback_samples.append(time.time() * 1000 - event.timestamp)
+
+        subscribers = [client.register_callback(consumer, policy) for _ in range(consumers)]
+        task = asyncio.create_task(client.start())
+
+        await asyncio.sleep(warmup)
+        received_before = sum(metrics.messages.values())
+        delivered_before = sum(s.delivered for s in subscribers)
+        client.recording = recording[0] = True
+        started = time.monotonic()
+        await asyncio.sleep(duration)
+        client.recording = recording[0] = False
+        elapsed = time.monotonic() - started
+        received = sum(metrics.messages.values()) - received_before
+        delivered = sum(s.delivered for s in subscribers) - delivered_before
+
+        client.stop()
+        task.cancel()
+        return {
+            "target_rate": rate,
+            "received_rate": received / elapsed,
+            "delivered_rate": delivered / elapsed,
+            "dropped": sum(s.dropped for s in subscribers),
+            "reconnects": client.reconnects,
+            "to_latest_prices_ms": _percentiles(client.samples),
+            "to_callback_ms": _percentiles(callback_samples),
+        }
+    finally:
+        process.terminate()
+        process.join()
+
+
+async def run(rates: List[float], **kwargs) -> List[Dict[str, object]]:
+    results = []
+    for rate in rates:
+        result = await run_once(rate, **kwargs)
+        results.append(result)
+        prices, callbacks = result["to_latest_prices_ms"], result["to_callback_ms"]
+        print(f"{rate:>8.0f} msg/s target | recv {result['received_rate']:>8.0f}/s "
+              f"| delivered {result['delivered_rate']:>8.0f}/s | dropped {result['dropped']:>7} "
+              f"| latest_prices p50 {prices['p50']:6.1f} p99 {prices['p99']:7.1f} ms "
+              f"| callback p50 {callbacks['p50']:6.1f} p99 {callbacks['p99']:7.1f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rates', default="1000,5000,10000,25000,50000")
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--consumers', type=int, default=1)
+    parser.add_argument('--policy', default='drop_newest', choices=['drop_newest', 'drop_oldest', 'conflate', 'inline'])
+    args = parser.parse_args()
+
+    asyncio.run(run([float(r) for r in args.rates.split(',')], symbols=args.symbols,
+                    duration=args.duration, consumers=args.consumers, policy=args.policy))
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .db import get_pool
+
+logger = logging.getLogger(__name__)
+
+# fetcher(symbol) -> parsed fundamentals (incl. valuation_assessment); raises on failure
+FundamentalsFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class FundamentalsStore:
+    """
+    Fundamentals per symbol, persisted in the `fundamentals` table.
+
+    Reads come from an in-process cache (`cache_ttl` seconds), then the table; only a
+    symbol never seen before is fetched on the request path. A background refresher
+    re-fetches rows older than `max_age` in batches of `batch_size`, at most
+    `concurrency` at a time, and upserts them together. Failed refreshes keep the old row
+    but are recorded on it: the symbol is retried after `retry_after` seconds, doubling
+    with each consecutive failure up to `max_backoff`, and queues behind rows not tried
+    as recently, so symbols that keep failing can't take up every batch.
+    While the database is unreachable, fetched results are only kept in memory (retried
+    after `db_retry` seconds).
+    """
+
+    def __init__(self, fetcher: FundamentalsFetcher, cache_ttl: float = 300.0, max_age: float = 86400.0,
+                 refresh_interval: float = 600.0, batch_size: int = 50, concurrency: int = 4,
+                 max_entries: int = 5000, db_retry: float = 60.0, retry_after: float = 3600.0,
+                 max_backoff: float = 7 * 86400.0):
+        self.fetcher = fetcher
+        self.cache_ttl = cache_ttl
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_entries = max_entries
+        self.db_retry = db_retry
+        self.retry_after = retry_after
+        self.max_backoff = max_backoff
+
+        self._cache: Dict[str, tuple] = {} # symbol -> (cached_at, data, fetched_at epoch)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._wanted: Set[str] = set() # Seen on reads with a stale row; refreshed next pass
+        self._db_down_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "db_reads": 0, "fetches": 0, "refreshed": 0, "failed": 0, "last_refresh": None}
+
+    async def get(self, symbol: str) -> Dict[str, Any]:
+        entry = self._cache.get(symbol)
+        if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+            self.stats["hits"] += 1
+            return entry[1]
+
+        row = await self._read(symbol)
+        if row is not None:
+            data, fetched_at, retry_at = row
+            now = time.time()
+            if now - fetched_at > self.max_age and now >= retry_at:
+                self._wanted.add(symbol)
+            self._remember(symbol, data, fetched_at)
+            return data
+
+        # Never fetched: this request pays for it once, concurrent ones share the fetch
+        future = self._inflight.get(symbol)
+        if future is None:
+            future = self._inflight[symbol] = asyncio.ensure_future(self._fetch_and_store([symbol]))
+            future.add_done_callback(lambda _: self._inflight.pop(symbol, None))
+        results = await asyncio.shield(future)
+        if symbol not in results:
+            raise LookupError(f"No fundamentals for {symbol}")
+        return results[symbol]
+
+    def _remember(self, symbol: str, data: Dict[str, Any], fetched_at: float):
+        self._cache[symbol] = (time.monotonic(), data, fetched_at)
+        if len(self._cache) > self.max_entries:
+            oldest = min(self._cache, key=lambda s: self._cache[s][0])
+            del self._cache[oldest]
+
+    @property
+    def _db_available(self) -> bool:
+        return time.monotonic() >= self._db_down_until
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.retry_after * 2 ** (min(failures, 20) - 1), self.max_backoff)
+
+    async def _read(self, symbol: str) -> Optional[tuple]:
+        """
+        (data, fetched_at, earliest refresh retry) as epoch seconds, or None if never fetched.
+        """
+        if not self._db_available:
+            entry = self._cache.get(symbol)
+            return (entry[1], entry[2], 0.0) if entry is not None else None
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT data, EXTRACT(EPOCH FROM fetched_at) AS fetched_at,
+                           EXTRACT(EPOCH FROM attempted_at) AS attempted_at, failures
+                    FROM fundamentals WHERE symbol = $1
+                """, symbol)
+        except Exception as e:
+            if self._db_available:
+                logger.warning(f"Fundamentals table unavailable ({e}), keeping fundamentals in memory for now")
+            self._db_down_until = time.monotonic() + self.db_retry
+            return await self._read(symbol)
+        self.stats["db_reads"] += 1
+        if row is None:
+            return None
+        retry_at = float(row['attempted_at']) + self._backoff(row['failures']) if row['failures'] else 0.0
+        return json.loads(row['data']), float(row['fetched_at']), retry_at
+
+    async def _fetch_and_store(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches `symbols` with bounded concurrency and upserts the successful ones in one batch.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(symbol):
+            async with semaphore:
+                self.stats["fetches"] += 1
+                try:
+                    return symbol, await self.fetcher(symbol)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.error(f"Fundamentals refresh failed for {symbol}: {e}")
+                    return symbol, None
+
+        results = {symbol: data for symbol, data in await asyncio.gather(*(fetch(s) for s in symbols))
+                   if data is not None}
+        failed = [symbol for symbol in symbols if symbol not in results]
+        now = time.time()
+        for symbol, data in results.items():
+            self._remember(symbol, data, now)
+        # Failed ones come back through the table once their backoff has passed
+        self._wanted.difference_update(symbols)
+        if (results or failed) and self._db_available:
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    if results:
+                        await conn.executemany("""
+                            INSERT INTO fundamentals (symbol, data, valuation, fetched_at, attempted_at, failures)
+                            VALUES ($1, $2::jsonb, $3, now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC', 0)
+                            ON CONFLICT (symbol) DO UPDATE SET
+                                data = EXCLUDED.data, valuation = EXCLUDED.valuation, fetched_at = EXCLUDED.fetched_at,
+                                attempted_at = EXCLUDED.attempted_at, failures = 0
+                        """, [(symbol, json.dumps(data), data.get("valuation_assessment"))
+                              for symbol, data in results.items()])
+                    if failed:
+                        await conn.execute("""
+                            UPDATE fundamentals SET attempted_at = now() AT TIME ZONE 'UTC', failures = failures + 1
+                            WHERE symbol = ANY($1::varchar[])
+                        """, failed)
+            except Exception as e:
+                logger.error(f"Failed to store fundamentals for {len(symbols)} symbols: {e}")
+        return results
+
+    async def _stale_symbols(self) -> List[str]:
+        wanted = list(self._wanted)[:self.batch_size]
+        if not self._db_available or len(wanted) >= self.batch_size:
+            return wanted
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # Same backoff as _backoff; the least recently tried go first
+            rows = await conn.fetch("""
+                SELECT symbol FROM fundamentals
+                WHERE fetched_at < now() AT TIME ZONE 'UTC' - make_interval(secs => $1)
+                  AND (failures = 0 OR attempted_at < now() AT TIME ZONE 'UTC'
+                       - make_interval(secs => LEAST($3 * power(2, LEAST(failures, 20) - 1), $4)))
+                ORDER BY COALESCE(attempted_at, fetched_at) LIMIT $2
+            """, self.max_age, self.batch_size - len(wanted), self.retry_after, self.max_backoff)
+        return list(dict.fromkeys(wanted + [row['symbol'] for row in rows]))
+
+    async def refresh_stale(self) -> int:
+        """
+        One refresher pass: re-fetches up to batch_size of the oldest stale rows.
+        """
+        symbols = await self._stale_symbols()
+        if not symbols:
+            return 0
+        results = await self._fetch_and_store(symbols)
+        self.stats["refreshed"] += len(results)
+        self.stats["last_refresh"] = time.time()
+        return len(results)
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep going while whole batches come back stale
+                while await self.refresh_stale() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Fundamentals refresher failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def invalidate(self, symbol: str):
+        self._cache.pop(symbol, None)
+        self._wanted.add(symbol)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "cached": len(self._cache), "wanted": len(self._wanted),
+                "persistent": self._db_available}
@@ -1,28 +1,286 @@
-from typing import Callable, List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional, Set
+import asyncio
 import logging
+import os
+import time
 from .binance_ws import BinanceWebSocketClient
+from .candles import CandleAggregator, MarketDataWriter
+from .fanout import FanOut
+from .backfill import KlineBackfiller
+from .metrics import FeedMetrics, feed_metrics
+from .recorder import FeedRecorder
+from .exchange_config import exchange_options_from_env
 
 logger = logging.getLogger(__name__)
 
 class LiveDataManager:
-    def __init__(self, symbols: List[str]):
+    def __init__(self, symbols: List[str], streams: Optional[List[str]] = None,
+                 max_streams_per_connection: int = 400, max_symbols: int = 500, idle_ttl: float = 900.0,
+                 metrics: Optional[FeedMetrics] = None, recorder: Optional[FeedRecorder] = None,
+                 ws_url: Optional[str] = None, exchange_options: Optional[dict] = None,
+                 market_loader: Optional[Callable[[], Awaitable[Set[str]]]] = None):
         """
         Manages real-time data fetching using WebSockets for lower latency.
+
+        `symbols` are always streamed. Other symbols are subscribed on demand when API
+        clients ask for them (see `request`) and dropped again after `idle_ttl` seconds
+        without requests. Symbols are spread across as many connections as needed to keep
+        each under `max_streams_per_connection`.
+
+        Requested symbols must be listed by the exchange: `market_loader()` returns its
+        symbols (by default the ccxt spot markets) and is retried until it succeeds.
         """
-        self.symbols = symbols
-        self.client = BinanceWebSocketClient(symbols)
+        self.pinned: Dict[str, int] = dict.fromkeys(symbols, 1) # symbol -> pin count (constructor symbols hold one)
+        self.streams = streams or ['ticker', 'kline_1m']
+        self.max_streams_per_connection = max_streams_per_connection
+        self.max_symbols = max_symbols
+        self.idle_ttl = idle_ttl
         self.latest_prices: Dict[str, float] = {}
+        self.running = False
+
+        # Shared by all connections so consumers register once
+        self.metrics = metrics
+        self.recorder = recorder
+        self.ws_url = ws_url
+        observer = metrics.observe_delivery if metrics is not None else None
+        self.ticker_fanout = FanOut(observer)
+        self.market_fanout = FanOut(observer)
+        self.shards: List[BinanceWebSocketClient] = []
+        self._shard_of: Dict[str, BinanceWebSocketClient] = {}
+        self._last_requested: Dict[str, float] = {}
+        self._pending: Set[str] = set()
+        self._shard_tasks: List[asyncio.Task] = []
+        self.unsubscribe_callbacks: List[Callable] = []
+
+        # Missed 1m bars are recovered over REST after every reconnect
+        self.backfiller = KlineBackfiller(exchange_options=exchange_options)
+        self.market_loader = market_loader or self.backfiller.load_markets
+        self.markets: Optional[Set[str]] = None # Listed symbols, once loaded
+        self.rejected_requests = 0
+
+        # Live 1m candles, persisted to market_data in batches
+        self.candles = CandleAggregator()
+        self.writer = MarketDataWriter()
+        self.market_fanout.subscribe(self.candles.on_market_event)
+        self.candles.register_callback(self.writer.add)
+
+        for symbol in symbols:
+            self._assign(symbol)
+
+    @property
+    def symbols(self):
+        """
+        Currently streamed symbols (supports fast `in` checks).
+        """
+        return self._shard_of.keys()
+
+    def register_callback(self, callback: Callable, policy: str = 'drop_newest', maxsize: int = 10000):
+        return self.ticker_fanout.subscribe(callback, policy, maxsize)
+
+    def register_candle_callback(self, callback: Callable):
+        """
+        callback(candle) for each closed 1m candle.
+        """
+        self.candles.register_callback(callback)
+
+    def register_unsubscribe_callback(self, callback: Callable):
+        """
+        callback(symbol) when a symbol stops streaming, so derived state can be dropped.
+        """
+        self.unsubscribe_callbacks.append(callback)
+
+    def subscriber_stats(self) -> List[dict]:
+        """
+        Per-consumer queue depth, lag and drop counters.
+        """
+        return self.ticker_fanout.stats() + self.market_fanout.stats()
+
+    def connection_stats(self) -> List[dict]:
+        return [
+            {"connection": i, "symbols": len(shard.symbols), "streams": shard.stream_count,
+             "connected": shard._websocket is not None, "reconnects": shard.reconnects,
+             "stale_disconnects": shard.stale_disconnects, "last_error": shard.last_error}
+            for i, shard in enumerate(self.shards)
+        ]
+
+    @staticmethod
+    def is_supported(symbol: str) -> bool:
+        # Only Binance USDT spot pairs are streamed
+        return symbol.endswith('/USDT')
+
+    def _assign(self, symbol: str) -> BinanceWebSocketClient:
+        """
+        Picks (or creates) a connection with room for one more symbol.
+        """
+        per_symbol = len(self.streams)
+        for shard in self.shards:
+            if shard.stream_count + per_symbol <= self.max_streams_per_connection:
+                break
+        else:
+            shard = BinanceWebSocketClient([], streams=self.streams,
+                                           ticker_fanout=self.ticker_fanout, market_fanout=self.market_fanout,
+                                           on_reconnect=self._backfill_gaps, metrics=self.metrics,
+                                           recorder=self.recorder, base_url=self.ws_url)
+            shard.latest_prices = self.latest_prices
+            self.shards.append(shard)
+            if self.running:
+                self._shard_tasks.append(asyncio.create_task(shard.start()))
+        self._shard_of[symbol] = shard
+        # Reserve the slot now; the SUBSCRIBE message goes out in subscribe()
+        shard.reserve([symbol])
+        return shard
+
+    async def subscribe(self, symbols: List[str]):
+        by_shard: Dict[BinanceWebSocketClient, List[str]] = {}
+        for symbol in symbols:
+            if symbol in self._shard_of:
+                continue
+            shard = self._assign(symbol)
+            by_shard.setdefault(shard, []).append(symbol)
+        for shard in by_shard:
+            await shard.sync_streams()
+        if by_shard:
+            logger.info(f"Subscribed {sum(len(v) for v in by_shard.values())} symbols ({len(self._shard_of)} total)")
+
+    async def unsubscribe(self, symbols: List[str]):
+        for symbol in symbols:
+            shard = self._shard_of.pop(symbol, None)
+            self._last_requested.pop(symbol, None)
+            self.latest_prices.pop(symbol, None)
+            if shard is not None:
+                await shard.unsubscribe([symbol])
+                for callback in self.unsubscribe_callbacks:
+                    callback(symbol)
+
+    async def pin(self, symbols: List[str]):
+        """
+        Streams `symbols` for good, like the ones passed to the constructor: for consumers
+        that need every bar of a fixed universe rather than what API clients happen to ask for.
+        """
+        symbols = [s for s in symbols if self.is_supported(s)]
+        for symbol in symbols:
+            self.pinned[symbol] = self.pinned.get(symbol, 0) + 1
+        await self.subscribe(symbols)
+
+    def unpin(self, symbols: List[str]):
+        """
+        Releases one pin of each symbol (from `pin` or `request(pin=True)`). A symbol whose
+        last pin is released stays streamed until it has been idle for `idle_ttl`.
+        """
+        now = time.monotonic()
+        for symbol in symbols:
+            count = self.pinned.get(symbol)
+            if count is None:
+                continue
+            if count > 1:
+                self.pinned[symbol] = count - 1
+            else:
+                del self.pinned[symbol]
+                self._last_requested[symbol] = now
+
+    def request(self, symbol: str, pin: bool = False):
+        """
+        Marks a symbol as wanted by an API client, subscribing it if it isn't streamed yet.
+        With pin=True it is also pinned (never evicted) until a matching `unpin`.
+        """
+        if not self.is_supported(symbol):
+            return
+        if self.markets is not None and symbol not in self.markets:
+            self.rejected_requests += 1 # Not listed: would only hold a slot and a dead stream
+            return
+        self._last_requested[symbol] = time.monotonic()
+        if pin:
+            self.pinned[symbol] = self.pinned.get(symbol, 0) + 1
+        if symbol in self._shard_of or symbol in self._pending or not self.running:
+            return
+
+        if len(self._shard_of) >= self.max_symbols:
+            evictable = [s for s in self._shard_of if s not in self.pinned]
+            if not evictable:
+                return
+            victim = min(evictable, key=lambda s: self._last_requested.get(s, 0.0))
+            asyncio.create_task(self.unsubscribe([victim]))
 
-    def register_callback(self, callback: Callable):
-        self.client.register_callback(callback)
+        self._pending.add(symbol)
+
+        async def _subscribe():
+            try:
+                await self.subscribe([symbol])
+            except Exception as e:
+                logger.error(f"Failed to subscribe {symbol}: {e}")
+            finally:
+                self._pending.discard(symbol)
+
+        asyncio.create_task(_subscribe())
+
+    async def _backfill_gaps(self, gaps: Dict[str, int]):
+        """
+        Replays bars missed during an outage through the normal candle path,
+        so the DB, hot store and anything fed by candles end up gap-free.
+        """
+        until = int(time.time() * 1000)
+        recovered = await self.backfiller.backfill(gaps)
+        for symbol, rows in recovered.items():
+            if rows:
+                self.market_fanout.publish(symbol, 'backfill', symbol, {'rows': rows, 'until': until})
+        logger.info(f"Backfilled {sum(len(r) for r in recovered.values())} bars for {len(recovered)} symbols")
+
+    async def _load_markets(self):
+        try:
+            self.markets = set(await self.market_loader())
+            logger.info(f"Loaded {len(self.markets)} exchange markets")
+        except Exception as e:
+            logger.error(f"Failed to load exchange markets: {e}")
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        idle = [
+            s for s in list(self._shard_of)
+            if s not in self.pinned and now - self._last_requested.get(s, 0.0) > self.idle_ttl
+        ]
+        if idle:
+            logger.info(f"Unsubscribing {len(idle)} idle symbols")
+            await self.unsubscribe(idle)
 
     async def start(self):
-        # Hook into client's latest_prices
-        self.client.latest_prices = self.latest_prices
-        await self.client.start()
+        self.running = True
+        self.ticker_fanout.start()
+        self.market_fanout.start()
+        self.writer.start()
+        if self.recorder is not None:
+            self.recorder.start()
+        self._shard_tasks = [asyncio.create_task(shard.start()) for shard in self.shards]
+        await self._load_markets()
+
+        while self.running:
+            await asyncio.sleep(60)
+            if self.markets is None:
+                await self._load_markets()
+            try:
+                await self._evict_idle()
+            except Exception as e:
+                logger.error(f"Idle eviction failed: {e}")
 
-    def stop(self):
-        self.client.stop()
+    async def stop(self):
+        self.running = False
+        for shard in self.shards:
+            shard.stop()
+        for task in self._shard_tasks:
+            task.cancel()
+        self.ticker_fanout.stop()
+        self.market_fanout.stop()
+        await self.writer.stop()
+        await self.backfiller.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
-# Global instance
-live_data_manager = LiveDataManager(['BTC/USDT', 'ETH/USDT'])
+# Global instance (LIVE_SYMBOLS: comma-separated pairs that are always streamed,
+# FEED_RECORD_DIR: if set, every raw message is recorded there for replay,
+# BINANCE_WS_URL / BINANCE_REST_URL: point the feed and backfill at a stand-in, e.g. data.exchange_sim)
+live_data_manager = LiveDataManager(
+    os.getenv("LIVE_SYMBOLS", "BTC/USDT,ETH/USDT").split(','),
+    metrics=feed_metrics,
+    recorder=FeedRecorder(os.environ["FEED_RECORD_DIR"]) if os.getenv("FEED_RECORD_DIR") else None,
+    ws_url=os.getenv("BINANCE_WS_URL"),
+    exchange_options=exchange_options_from_env(),
+)
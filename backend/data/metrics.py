@@ -0,0 +1,140 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Hashable, List, Tuple
+
+# Upper bounds in seconds, from sub-millisecond parsing up to badly delayed network
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Pipeline stages timed per symbol
+EXCHANGE_TO_RECEIVE = 'exchange_to_receive'
+RECEIVE_TO_DISPATCH = 'receive_to_dispatch'
+DISPATCH_TO_DONE = 'dispatch_to_done'
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram; observe() is a bisect and two increments.
+    """
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        if seconds < 0:
+            seconds = 0.0 # Exchange clock slightly ahead of ours
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        out = []
+        for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), self.counts):
+            total += n
+            out.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return out
+
+
+class FeedMetrics:
+    """
+    Latency and throughput of the live feed, rendered in Prometheus text exposition format.
+
+      exchange_to_receive: exchange event time (E) to the message leaving recv()
+      receive_to_dispatch: recv() to the event being handed to the fan-out (parsing, routing)
+      dispatch_to_done:    fan-out to a consumer callback returning (queueing, slow consumers)
+    """
+
+    def __init__(self):
+        self.latency: Dict[str, Dict[str, LatencyHistogram]] = {
+            stage: defaultdict(LatencyHistogram)
+            for stage in (EXCHANGE_TO_RECEIVE, RECEIVE_TO_DISPATCH, DISPATCH_TO_DONE)
+        }
+        self.consumer_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.messages: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.reconnects = 0
+        self.stale_disconnects = 0
+        self.started_at = time.time()
+
+    def observe_message(self, symbol: str, event_type: str, event_time_ms, received_at: float,
+                        received_mono: float, dispatched_mono: float):
+        self.messages[(symbol, event_type)] += 1
+        if event_time_ms is not None:
+            self.latency[EXCHANGE_TO_RECEIVE][symbol].observe(received_at - event_time_ms / 1000.0)
+        self.latency[RECEIVE_TO_DISPATCH][symbol].observe(dispatched_mono - received_mono)
+
+    def observe_delivery(self, consumer: str, key: Hashable, seconds: float):
+        """
+        Fan-out delivery hook: called after each consumer callback returns.
+        """
+        self.latency[DISPATCH_TO_DONE][key].observe(seconds)
+        self.consumer_latency[consumer].observe(seconds)
+
+    def drop_symbol(self, symbol: str):
+        """
+        Forgets a symbol's series once it stops streaming (LiveDataManager unsubscribe
+        callback), so on-demand symbols don't grow the exposition forever.
+        """
+        for by_symbol in self.latency.values():
+            by_symbol.pop(symbol, None)
+        for key in [key for key in self.messages if key[0] == symbol]:
+            del self.messages[key]
+
+    def on_reconnect(self, stale: bool = False):
+        self.reconnects += 1
+        if stale:
+            self.stale_disconnects += 1
+
+    def render(self) -> str:
+        lines = [
+            '# HELP feed_latency_seconds Live feed latency per pipeline stage and symbol.',
+            '# TYPE feed_latency_seconds histogram',
+        ]
+        for stage, by_symbol in self.latency.items():
+            for symbol, hist in list(by_symbol.items()):
+                _render_histogram(lines, 'feed_latency_seconds', f'stage="{stage}",symbol="{_escape(str(symbol))}"', hist)
+
+        lines += [
+            '# HELP feed_consumer_latency_seconds Dispatch to callback completion per consumer.',
+            '# TYPE feed_consumer_latency_seconds histogram',
+        ]
+        for consumer, hist in list(self.consumer_latency.items()):
+            _render_histogram(lines, 'feed_consumer_latency_seconds', f'consumer="{_escape(consumer)}"', hist)
+
+        lines += [
+            '# HELP feed_messages_total Messages received from the exchange.',
+            '# TYPE feed_messages_total counter',
+        ]
+        for (symbol, event_type), n in list(self.messages.items()):
+            lines.append(f'feed_messages_total{{symbol="{_escape(symbol)}",type="{_escape(event_type)}"}} {n}')
+
+        lines += [
+            '# HELP feed_reconnects_total Websocket reconnects across all connections.',
+            '# TYPE feed_reconnects_total counter',
+            f'feed_reconnects_total {self.reconnects}',
+            '# HELP feed_stale_disconnects_total Reconnects caused by a silent connection.',
+            '# TYPE feed_stale_disconnects_total counter',
+            f'feed_stale_disconnects_total {self.stale_disconnects}',
+            '# HELP feed_start_time_seconds Unix time the metrics started counting.',
+            '# TYPE feed_start_time_seconds gauge',
+            f'feed_start_time_seconds {self.started_at}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_histogram(lines: List[str], name: str, labels: str, hist: LatencyHistogram):
+    for le, n in hist.cumulative():
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {n}')
+    lines.append(f'{name}_sum{{{labels}}} {hist.sum}')
+    lines.append(f'{name}_count{{{labels}}} {hist.count}')
+
+
+# Global instance shared by the live feed and the /api/metrics endpoint
+feed_metrics = FeedMetrics()
@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import os
+from bisect import bisect_left, insort
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from .binance_ws import BinanceWebSocketClient
+from .exchange_config import exchange_options_from_env
+from .fanout import FanOut, Subscriber
+
+logger = logging.getLogger(__name__)
+
+# fetcher(symbol, limit) -> {'bids': [[price, qty], ...], 'asks': [...], 'nonce': lastUpdateId}
+SnapshotFetcher = Callable[[str, int], Awaitable[dict]]
+
+
+class BookSide:
+    """
+    One side of an L2 book: price -> quantity plus the prices in ascending order, held as
+    sorted chunks of at most 2 * CHUNK prices with each chunk's maximum alongside (the
+    layout sortedcontainers uses). Lookups and quantity changes are O(1); a new or removed
+    level is two bisects plus a memmove within one chunk, O(log n + CHUNK) however deep
+    the book is. The best level is always at one end of the first or last chunk.
+    """
+    __slots__ = ('levels', 'chunks', 'maxes', 'is_bid')
+
+    CHUNK = 256
+
+    def __init__(self, is_bid: bool):
+        self.levels: Dict[float, float] = {}
+        self.chunks: List[List[float]] = []
+        self.maxes: List[float] = []
+        self.is_bid = is_bid
+
+    def __len__(self):
+        return len(self.levels)
+
+    def set(self, price: float, quantity: float):
+        if quantity == 0.0:
+            if self.levels.pop(price, None) is not None:
+                self._remove(price)
+        else:
+            if price not in self.levels:
+                self._insert(price)
+            self.levels[price] = quantity
+
+    def _insert(self, price: float):
+        if not self.chunks:
+            self.chunks.append([price])
+            self.maxes.append(price)
+            return
+        i = bisect_left(self.maxes, price)
+        if i == len(self.maxes):
+            i -= 1
+            self.chunks[i].append(price)
+            self.maxes[i] = price
+        else:
+            insort(self.chunks[i], price)
+        chunk = self.chunks[i]
+        if len(chunk) > 2 * self.CHUNK:
+            half = chunk[self.CHUNK:]
+            del chunk[self.CHUNK:]
+            self.chunks.insert(i + 1, half)
+            self.maxes.insert(i, chunk[-1])
+
+    def _remove(self, price: float):
+        i = bisect_left(self.maxes, price)
+        chunk = self.chunks[i]
+        del chunk[bisect_left(chunk, price)]
+        if not chunk:
+            del self.chunks[i]
+            del self.maxes[i]
+        else:
+            self.maxes[i] = chunk[-1]
+
+    def clear(self):
+        self.levels.clear()
+        self.chunks.clear()
+        self.maxes.clear()
+
+    def best(self) -> Optional[float]:
+        if not self.chunks:
+            return None
+        return self.chunks[-1][-1] if self.is_bid else self.chunks[0][0]
+
+    def top(self, n: int) -> List[Tuple[float, float]]:
+        prices: List[float] = []
+        for chunk in (reversed(self.chunks) if self.is_bid else self.chunks):
+            if len(prices) >= n:
+                break
+            prices.extend(chunk[:-n - 1:-1] if self.is_bid else chunk[:n])
+        return [(p, self.levels[p]) for p in prices[:n]]
+
+    def trim(self, max_levels: int):
+        """
+        Drops the levels furthest from the touch; deep levels the diff stream stopped
+        updating would otherwise go stale.
+        """
+        excess = len(self.levels) - max_levels
+        while excess > 0:
+            # Far end: the lowest bids, the highest asks
+            i = 0 if self.is_bid else -1
+            chunk = self.chunks[i]
+            if len(chunk) <= excess:
+                far = chunk
+                del self.chunks[i]
+                del self.maxes[i]
+            elif self.is_bid:
+                far = chunk[:excess]
+                del chunk[:excess]
+            else:
+                far = chunk[-excess:]
+                del chunk[-excess:]
+                self.maxes[i] = chunk[-1]
+            for price in far:
+                del self.levels[price]
+            excess -= len(far)
+
+
+class OrderBook:
+    """
+    L2 book for one symbol, kept in sync from a REST snapshot plus @depth diff events
+    following the exchange's sequencing rules (U/u update ids).
+    """
+
+    def __init__(self, symbol: str, max_levels: int = 5000):
+        self.symbol = symbol
+        self.max_levels = max_levels
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id = 0
+        self.synced = False
+        self.event_time = 0 # E of the last applied diff, ms
+        self.updates = 0
+
+    def apply_snapshot(self, snapshot: dict, buffered: List[dict] = ()) -> bool:
+        """
+        Loads a snapshot and replays the diffs buffered while it was fetched.
+        Returns False if the buffered diffs don't connect to the snapshot.
+        """
+        self.bids.clear()
+        self.asks.clear()
+        for price, quantity in snapshot['bids']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in snapshot['asks']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = int(snapshot['nonce'])
+        self.synced = True
+        for event in buffered:
+            if event['u'] <= self.last_update_id:
+                continue # Already contained in the snapshot
+            if not self.apply_diff(event):
+                return False
+        return True
+
+    def apply_diff(self, event: dict) -> bool:
+        """
+        Applies one depthUpdate event. Returns False (and marks the book unsynced)
+        when an update was missed and a new snapshot is needed.
+        """
+        first, last = event['U'], event['u']
+        if last <= self.last_update_id:
+            return True # Stale event
+        if first > self.last_update_id + 1:
+            self.synced = False
+            return False
+        for price, quantity in event['b']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event['a']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = last
+        self.event_time = event.get('E', self.event_time)
+        self.updates += 1
+        if len(self.bids) > self.max_levels:
+            self.bids.trim(self.max_levels)
+        if len(self.asks) > self.max_levels:
+            self.asks.trim(self.max_levels)
+        return True
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self.asks.best()
+
+    @property
+    def mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    @property
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask - bid
+
+    def snapshot(self, depth: int = 20) -> dict:
+        return {
+            "symbol": self.symbol,
+            "bids": self.bids.top(depth),
+            "asks": self.asks.top(depth),
+            "mid": self.mid,
+            "spread": self.spread,
+            "last_update_id": self.last_update_id,
+            "timestamp": self.event_time,
+            "synced": self.synced,
+        }
+
+
+class OrderBookManager:
+    """
+    Maintains L2 books for `symbols` from the @depth@100ms diff streams on a dedicated
+    connection, resyncing from a REST snapshot whenever a gap in update ids is detected.
+    Subscribers get book snapshots at most every `emit_interval` seconds per symbol,
+    and only for books that changed.
+    """
+
+    def __init__(self, symbols: List[str], snapshot_fetcher: Optional[SnapshotFetcher] = None,
+                 snapshot_limit: int = 1000, emit_interval: float = 0.25, emit_depth: int = 20,
+                 max_concurrent_snapshots: int = 2, max_buffered: int = 1000,
+                 ws_url: Optional[str] = None, exchange_options: Optional[dict] = None):
+        self.books: Dict[str, OrderBook] = {s: OrderBook(s) for s in symbols}
+        self.fetcher = snapshot_fetcher or self._fetch_ccxt
+        self.snapshot_limit = snapshot_limit
+        self.emit_interval = emit_interval
+        self.emit_depth = emit_depth
+        self.max_buffered = max_buffered
+        self.exchange_options = exchange_options or {}
+        self.fanout = FanOut()
+        self.resyncs = 0
+        self._exchange = None
+        self._buffers: Dict[str, List[dict]] = {}
+        self._resyncing: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+        self._semaphore = asyncio.Semaphore(max_concurrent_snapshots) # REST weight: depth?limit=1000 costs 50
+        self._task: Optional[asyncio.Task] = None
+        self._client_task: Optional[asyncio.Task] = None
+
+        self.client = BinanceWebSocketClient(symbols, streams=['depth@100ms'], base_url=ws_url)
+        self.client.register_market_callback(self.on_market_event)
+
+    def register_callback(self, callback: Callable, policy: str = 'conflate', maxsize: int = 1000) -> Subscriber:
+        """
+        callback(snapshot) with the top `emit_depth` levels, mid and spread, see OrderBook.snapshot.
+        """
+        return self.fanout.subscribe(callback, policy, maxsize)
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    async def _fetch_ccxt(self, symbol: str, limit: int) -> dict:
+        if self._exchange is None:
+            import ccxt.async_support as ccxt
+            self._exchange = ccxt.binance(self.exchange_options)
+        # ccxt puts the exchange's lastUpdateId in 'nonce'
+        return await self._exchange.fetch_order_book(symbol, limit)
+
+    def on_market_event(self, event_type: str, symbol: str, payload: dict):
+        if event_type != 'depth':
+            return
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        if not book.synced:
+            buffer = self._buffers.setdefault(symbol, [])
+            buffer.append(payload)
+            if len(buffer) > self.max_buffered:
+                del buffer[0]
+            self._resync(symbol)
+            return
+        if book.apply_diff(payload):
+            self._dirty.add(symbol)
+        else:
+            logger.warning(f"Order book gap for {symbol} at update {payload['U']}, resyncing")
+            self._buffers[symbol] = [payload]
+            self._resync(symbol)
+
+    def _resync(self, symbol: str):
+        if symbol in self._resyncing:
+            return
+        self.resyncs += 1
+        task = asyncio.create_task(self._load_snapshot(symbol))
+        self._resyncing[symbol] = task
+        task.add_done_callback(lambda _: self._resyncing.pop(symbol, None))
+
+    async def _load_snapshot(self, symbol: str):
+        async with self._semaphore:
+            try:
+                snapshot = await self.fetcher(symbol, self.snapshot_limit)
+            except Exception as e:
+                logger.error(f"Order book snapshot failed for {symbol}: {e}")
+                await asyncio.sleep(1.0)
+                return # The next diff triggers another attempt
+        book = self.books[symbol]
+        buffered = self._buffers.pop(symbol, [])
+        if book.apply_snapshot(snapshot, buffered):
+            self._dirty.add(symbol)
+        else:
+            # Snapshot older than the diffs we hold; the next diff triggers a fresh one
+            book.synced = False
+
+    async def _emit(self):
+        while True:
+            await asyncio.sleep(self.emit_interval)
+            if not self._dirty:
+                continue
+            dirty, self._dirty = self._dirty, set()
+            for symbol in dirty:
+                book = self.books[symbol]
+                if book.synced:
+                    self.fanout.publish(symbol, book.snapshot(self.emit_depth))
+
+    def stats(self) -> List[dict]:
+        return [
+            {"symbol": s, "synced": b.synced, "bids": len(b.bids), "asks": len(b.asks),
+             "updates": b.updates, "last_update_id": b.last_update_id}
+            for s, b in self.books.items()
+        ]
+
+    async def start(self):
+        if not self.books:
+            return
+        self.fanout.start()
+        self._task = asyncio.create_task(self._emit())
+        self._client_task = asyncio.create_task(self.client.start())
+
+    async def stop(self):
+        self.client.stop()
+        for task in (self._task, self._client_task, *self._resyncing.values()):
+            if task is not None:
+                task.cancel()
+        self.fanout.stop()
+        if self._exchange is not None:
+            await self._exchange.close()
+            self._exchange = None
+
+
+def _depth_manager_from_env() -> OrderBookManager:
+    symbols = [s for s in os.getenv("DEPTH_SYMBOLS", "BTC/USDT,ETH/USDT").split(',') if s]
+    return OrderBookManager(symbols, ws_url=os.getenv("BINANCE_WS_URL"),
+                            exchange_options=exchange_options_from_env())
+
+
+# Global instance (DEPTH_SYMBOLS: comma-separated pairs with a maintained L2 book)
+order_book_manager = _depth_manager_from_env()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PriceStreamClient:
+    """
+    One push subscriber (e.g. a browser WebSocket).
+    Updates are conflated per symbol and flushed as one batched frame at most
+    `max_rate` times per second, so memory per client is bounded by its symbol count.
+    A client that can't keep up is downgraded to a lower rate, then disconnected.
+    """
+
+    def __init__(self, send: Callable[[dict], Any], max_rate: float = 4.0, min_rate: float = 0.5,
+                 send_timeout: float = 5.0, max_symbols: int = 200):
+        self.send = send
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self.send_timeout = send_timeout
+        self.max_symbols = max_symbols
+        self.symbols: Set[str] = set()
+        self.pending: Dict[str, dict] = {}
+        self.frames_sent = 0
+        self.updates_conflated = 0
+        self.downgrades = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+
+    def push(self, symbol: str, update: dict):
+        if symbol in self.pending:
+            self.updates_conflated += 1
+        self.pending[symbol] = update
+        self._wakeup.set()
+
+    async def run(self):
+        """
+        Sender loop; returns when the client is closed or too slow to keep.
+        """
+        while not self.closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.pending:
+                continue
+            batch, self.pending = self.pending, {}
+
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self.send({"type": "prices", "data": batch}), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                logger.info("Disconnecting price stream client: send timed out")
+                self.closed = True
+                return
+            self.frames_sent += 1
+
+            interval = 1.0 / self.rate
+            elapsed = time.monotonic() - started
+            if elapsed > interval:
+                # Client (or its network) can't drain at this rate
+                if self.rate <= self.min_rate:
+                    logger.info("Disconnecting price stream client: too slow at minimum rate")
+                    self.closed = True
+                    return
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.downgrades += 1
+            await asyncio.sleep(max(0.0, interval - elapsed))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self.symbols),
+            "rate": self.rate,
+            "frames_sent": self.frames_sent,
+            "updates_conflated": self.updates_conflated,
+            "downgrades": self.downgrades,
+        }
+
+
+class PriceStreamHub:
+    """
+    Routes live ticker events to the push clients subscribed to each symbol.
+    Register `on_tick` on the live feed with the conflate policy.
+    """
+
+    def __init__(self, on_symbol_requested: Optional[Callable[[str], None]] = None):
+        self.clients: Set[PriceStreamClient] = set()
+        self.by_symbol: Dict[str, Set[PriceStreamClient]] = {}
+        # Lets the hub drive demand-based feed subscriptions (e.g. LiveDataManager.request)
+        self.on_symbol_requested = on_symbol_requested
+
+    def add(self, client: PriceStreamClient):
+        self.clients.add(client)
+
+    def remove(self, client: PriceStreamClient):
+        self.unsubscribe(client, list(client.symbols))
+        self.clients.discard(client)
+
+    def subscribe(self, client: PriceStreamClient, symbols: Iterable[str],
+                  snapshot: Optional[Dict[str, float]] = None) -> Set[str]:
+        """
+        Subscribes up to the client's symbol limit; returns the symbols accepted.
+        Symbols with a known price are pushed straight away.
+        """
+        accepted = set()
+        for symbol in symbols:
+            if symbol not in client.symbols and len(client.symbols) >= client.max_symbols:
+                break
+            client.symbols.add(symbol)
+            self.by_symbol.setdefault(symbol, set()).add(client)
+            accepted.add(symbol)
+            if self.on_symbol_requested:
+                self.on_symbol_requested(symbol)
+            if snapshot and symbol in snapshot:
+                client.push(symbol, {"price": snapshot[symbol]})
+        return accepted
+
+    def unsubscribe(self, client: PriceStreamClient, symbols: Iterable[str]):
+        for symbol in symbols:
+            client.symbols.discard(symbol)
+            client.pending.pop(symbol, None)
+            subscribers = self.by_symbol.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.by_symbol[symbol]
+
+    def on_tick(self, event):
+        subscribers = self.by_symbol.get(event.symbol)
+        if not subscribers:
+            return
+        update = {"price": event.price, "timestamp": event.timestamp}
+        for client in subscribers:
+            client.push(event.symbol, update)
+
+    def keep_alive(self):
+        """
+        Re-marks every streamed symbol as requested so the feed doesn't evict it as idle.
+        """
+        if self.on_symbol_requested:
+            for symbol in list(self.by_symbol):
+                self.on_symbol_requested(symbol)
+
+    async def run(self, interval: float = 60.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.keep_alive()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "symbols": len(self.by_symbol),
+            "frames_sent": sum(c.frames_sent for c in self.clients),
+            "updates_conflated": sum(c.updates_conflated for c in self.clients),
+        }
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+from .yf_gateway import to_yf_symbol, yf_gateway
+
+logger = logging.getLogger(__name__)
+
+# fetcher(symbols) -> {symbol: quote}; symbols without data are simply left out
+BatchFetcher = Callable[[List[str]], Awaitable[Dict[str, dict]]]
+
+
+class QuoteCache:
+    """
+    Quote cache in front of a slow batch source (yfinance).
+
+    - Fresh entries (younger than the symbol's TTL) are served from memory.
+    - Stale entries (up to `stale_ttl` old) are served immediately while a refresh runs
+      in the background.
+    - Concurrent misses for the same symbol share one in-flight fetch.
+    - Misses from concurrent requests that arrive within `batch_window` seconds are
+      fetched together in one upstream call.
+    - Symbols the source has no data for are remembered for `negative_ttl` seconds.
+    """
+
+    def __init__(self, fetcher: BatchFetcher, ttl: Union[float, Callable[[str], float]] = 30.0,
+                 stale_ttl: float = 600.0, negative_ttl: float = 120.0, batch_window: float = 0.02,
+                 max_batch: int = 100, max_entries: int = 5000):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_entries = max_entries
+
+        self._entries: Dict[str, tuple] = {} # symbol -> (fetched_at, quote or None)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._fetch_tasks: Set[asyncio.Task] = set() # Referenced until done so they can't be collected
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0}
+
+    def _ttl_for(self, symbol: str) -> float:
+        return self.ttl(symbol) if callable(self.ttl) else self.ttl
+
+    async def get(self, symbol: str) -> Optional[dict]:
+        return (await self.get_many([symbol])).get(symbol)
+
+    async def get_many(self, symbols: List[str]) -> Dict[str, Optional[dict]]:
+        now = time.monotonic()
+        results: Dict[str, Optional[dict]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for symbol in symbols:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                age = now - entry[0]
+                if entry[1] is None:
+                    if age < self.negative_ttl:
+                        results[symbol] = None
+                        continue
+                elif age < self._ttl_for(symbol):
+                    self.stats["hits"] += 1
+                    results[symbol] = entry[1]
+                    continue
+                elif age < self.stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    results[symbol] = entry[1]
+                    self._request(symbol) # Revalidate in the background
+                    continue
+            self.stats["misses"] += 1
+            waiting[symbol] = self._request(symbol)
+
+        if waiting:
+            done = await asyncio.gather(*waiting.values(), return_exceptions=True)
+            for symbol, quote in zip(waiting, done):
+                results[symbol] = None if isinstance(quote, BaseException) else quote
+        return results
+
+    def _request(self, symbol: str) -> asyncio.Future:
+        future = self._inflight.get(symbol)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[symbol] = future
+        self._pending.append(symbol)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._fetch(batch))
+            self._fetch_tasks.add(task)
+            task.add_done_callback(self._fetch_tasks.discard)
+
+    async def _fetch(self, batch: List[str]):
+        self.stats["upstream_calls"] += 1
+        try:
+            quotes = await self.fetcher(batch)
+        except Exception as e:
+            logger.error(f"Quote fetch failed for {len(batch)} symbols: {e}")
+            quotes = None
+
+        now = time.monotonic()
+        for symbol in batch:
+            future = self._inflight.pop(symbol, None)
+            if quotes is None:
+                # Keep serving whatever we had; don't cache the failure
+                entry = self._entries.get(symbol)
+                quote = entry[1] if entry is not None else None
+            else:
+                quote = quotes.get(symbol)
+                self._entries[symbol] = (now, quote)
+            if future is not None and not future.done():
+                future.set_result(quote)
+        self._evict()
+
+    def _evict(self):
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            for symbol in sorted(self._entries, key=lambda s: self._entries[s][0])[:excess]:
+                del self._entries[symbol]
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(symbol, None)
+
+
+def _quote_from_frame(df) -> Optional[dict]:
+    df = df.dropna(subset=['Close'])
+    if df.empty:
+        return None
+    last_close = float(df['Close'].iloc[-1])
+    prev_close = float(df['Close'].iloc[-2]) if len(df) > 1 else last_close
+    change = last_close - prev_close
+    return {
+        "price": last_close,
+        "change": change,
+        "changePercent": (change / prev_close) * 100 if prev_close != 0 else 0.0,
+        "volume": float(df['Volume'].iloc[-1]),
+        "marketCap": 0.0,
+        "high": float(df['High'].iloc[-1]),
+        "low": float(df['Low'].iloc[-1]),
+        "open": float(df['Open'].iloc[-1]),
+        "previousClose": prev_close,
+    }
+
+
+async def yf_quote_fetcher(symbols: List[str]) -> Dict[str, dict]:
+    """
+    One download for the whole batch through the yfinance gateway.
+    """
+    yf_map = {to_yf_symbol(s): s for s in symbols}
+    # 5 days covers weekends/holidays for the change calculation
+    data = await yf_gateway.download(list(yf_map), period="5d")
+    quotes = {}
+    if data is None or data.empty:
+        return quotes
+    for yf_symbol, symbol in yf_map.items():
+        try:
+            df = data[yf_symbol] if yf_symbol in data.columns.get_level_values(0) else data
+            quote = _quote_from_frame(df)
+        except Exception:
+            continue
+        if quote is not None:
+            quotes[symbol] = quote
+    return quotes
+
+
+def _default_ttl(symbol: str) -> float:
+    # Crypto trades around the clock; equity quotes move less often outside the live feed
+    return 15.0 if "USDT" in symbol or symbol in ("BTC", "ETH", "SOL") else 60.0
+
+
+# Global instance shared by /api/market/quotes and /api/market/quote
+quote_cache = QuoteCache(yf_quote_fetcher, ttl=_default_ttl)
@@ -0,0 +1,197 @@
+import asyncio
+import glob
+import logging
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+from .binance_ws import BinanceWebSocketClient, json_loads
+from .fanout import FanOut
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC, then records of <u32 length><f64 receive time, unix seconds><raw message bytes>,
+# where length counts the timestamp and the message.
+MAGIC = b'STXFEED1'
+_HEADER = struct.Struct('<I')
+_TIMESTAMP = struct.Struct('<d')
+
+
+def _day_of(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y%m%d')
+
+
+class FeedRecorder:
+    """
+    Appends every raw websocket message, stamped with its local receive time,
+    to a length-prefixed binary log under `directory`, one file per UTC day (feed-YYYYMMDD.bin).
+    Writes go to a large userspace buffer that is flushed every `flush_interval` seconds,
+    so recording doesn't add a syscall per message to the receive loop.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0, buffer_size: int = 1 << 20):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.records = 0
+        self.bytes_written = 0
+        self._file: Optional[BinaryIO] = None
+        self._day: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def path_for(self, ts: float) -> str:
+        return os.path.join(self.directory, f"feed-{_day_of(ts)}.bin")
+
+    def _rotate(self, ts: float):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(ts)
+        self._file = open(path, 'ab', buffering=self.buffer_size)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._day = int(ts // 86400)
+        logger.info(f"Recording live feed to {path}")
+
+    def record(self, message: Union[str, bytes], received_at: float):
+        if int(received_at // 86400) != self._day:
+            self._rotate(received_at)
+        if isinstance(message, str):
+            message = message.encode()
+        self._file.write(_HEADER.pack(_TIMESTAMP.size + len(message)))
+        self._file.write(_TIMESTAMP.pack(received_at))
+        self._file.write(message)
+        self.records += 1
+        self.bytes_written += _HEADER.size + _TIMESTAMP.size + len(message)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._day = None
+
+
+def read_records(path: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    Yields (receive time, raw message) from one log file. A record truncated by a crash
+    mid-write ends the file instead of raising.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a feed recording")
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            (length,) = _HEADER.unpack(header)
+            body = f.read(length)
+            if len(body) < length:
+                logger.warning(f"Truncated record at the end of {path}")
+                return
+            yield _TIMESTAMP.unpack_from(body)[0], body[_TIMESTAMP.size:]
+
+
+def recording_files(source: Union[str, Iterable[str]]) -> List[str]:
+    """
+    A recording directory (all days, in order), a single file, or an explicit list of files.
+    """
+    if isinstance(source, str):
+        if os.path.isdir(source):
+            return sorted(glob.glob(os.path.join(source, 'feed-*.bin')))
+        return [source]
+    return list(source)
+
+
+class FeedReplayer:
+    """
+    Feeds a recording back through the same fan-out/callback interface as the live client,
+    so ticker and market consumers can't tell a replay from the exchange.
+
+    speed: 1.0 replays in real time, N replays N times faster, None replays as fast as possible.
+    With `wait_for_consumers`, the replay pauses until every subscriber has drained its queue,
+    which keeps fast replays lossless and deterministic.
+    """
+
+    # Messages handled per turn before yielding to consumers at max speed
+    BATCH = 256
+
+    def __init__(self, source: Union[str, Iterable[str]], speed: Optional[float] = 1.0,
+                 ticker_fanout: Optional[FanOut] = None, market_fanout: Optional[FanOut] = None,
+                 wait_for_consumers: bool = False):
+        self.files = recording_files(source)
+        self.speed = speed
+        self.wait_for_consumers = wait_for_consumers
+        # Decoding and routing are the live client's; it just never connects
+        self.client = BinanceWebSocketClient([], ticker_fanout=ticker_fanout, market_fanout=market_fanout)
+        self.latest_prices = self.client.latest_prices
+        self.messages = 0
+
+    def register_callback(self, callback, policy: str = 'drop_newest', maxsize: int = 10000):
+        return self.client.register_callback(callback, policy, maxsize)
+
+    def register_market_callback(self, callback, policy: str = 'drop_newest', maxsize: int = 10000):
+        return self.client.register_market_callback(callback, policy, maxsize)
+
+    def records(self) -> Iterator[Tuple[float, bytes]]:
+        for path in self.files:
+            yield from read_records(path)
+
+    async def _drain(self):
+        await self.client.ticker_fanout.join()
+        await self.client.market_fanout.join()
+
+    async def run(self) -> int:
+        """
+        Replays every record once; returns the number of messages delivered.
+        """
+        fanouts = (self.client.ticker_fanout, self.client.market_fanout)
+        started = [f for f in fanouts if not f.started]
+        for fanout in started:
+            fanout.start()
+
+        first_ts = None
+        wall_start = time.monotonic()
+        handled = 0
+        try:
+            for received_at, message in self.records():
+                if self.speed:
+                    if first_ts is None:
+                        first_ts = received_at
+                    wait = wall_start + (received_at - first_ts) / self.speed - time.monotonic()
+                    if wait > 0:
+                        if self.wait_for_consumers:
+                            await self._drain()
+                        await asyncio.sleep(wait)
+                payload = json_loads(message).get('data')
+                if payload is not None:
+                    self.client._handle_payload(payload)
+                    self.messages += 1
+                handled += 1
+                if handled >= self.BATCH:
+                    handled = 0
+                    if self.wait_for_consumers:
+                        await self._drain()
+                    await asyncio.sleep(0)
+            if self.wait_for_consumers:
+                await self._drain()
+        finally:
+            for fanout in started:
+                fanout.stop()
+        return self.messages
@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Epoch (1970-01-01) is a Thursday; weekly buckets are anchored on Monday
+_WEEK_ANCHOR_NS = 4 * 86400 * 10**9
+
+
+def timeframe_to_seconds(timeframe: str) -> int:
+    """
+    Converts a timeframe string such as '1m', '4h' or '1d' into seconds.
+    """
+    try:
+        amount, unit = int(timeframe[:-1]), timeframe[-1]
+        seconds = amount * _UNIT_SECONDS[unit]
+    except (ValueError, KeyError, IndexError):
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    if seconds <= 0:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return seconds
+
+
+def can_resample(base: str, target: str) -> bool:
+    """
+    True if `target` bars can be built exactly from `base` bars.
+    """
+    base_s, target_s = timeframe_to_seconds(base), timeframe_to_seconds(target)
+    return target_s >= base_s and target_s % base_s == 0
+
+
+def _bucket_starts(ts_ns: np.ndarray, timeframe: str) -> np.ndarray:
+    step = timeframe_to_seconds(timeframe) * 10**9
+    anchor = _WEEK_ANCHOR_NS if timeframe.endswith('w') else 0
+    return (ts_ns - anchor) // step * step + anchor
+
+
+def resample_ohlcv(df: pd.DataFrame, target: str) -> pd.DataFrame:
+    """
+    Builds `target` OHLCV bars from lower-timeframe bars.
+    Expects a 'timestamp' column (or DatetimeIndex) sorted ascending.
+    Returns a new DataFrame with a 'timestamp' column; the input is not modified.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    if 'timestamp' in df.columns:
+        timestamps = pd.to_datetime(df['timestamp'])
+    else:
+        timestamps = pd.to_datetime(df.index)
+
+    ts_ns = timestamps.values.astype('datetime64[ns]').astype(np.int64)
+    buckets = _bucket_starts(ts_ns, target)
+
+    # Group boundaries: rows are sorted, so each bucket is a contiguous run
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(buckets)])) - 1
+
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    volume = df['volume'].to_numpy(dtype=np.float64)
+
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(buckets[starts]),
+        'open': df['open'].to_numpy(dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': df['close'].to_numpy(dtype=np.float64)[ends],
+        'volume': np.add.reduceat(volume, starts),
+    })
+
+
+def align_higher_timeframe(base_df: pd.DataFrame, htf_df: pd.DataFrame, target: str,
+                           columns: Optional[List[str]] = None, suffix: Optional[str] = None) -> pd.DataFrame:
+    """
+    Joins higher-timeframe columns onto base bars without lookahead.
+    Each base bar only sees the last `target` bar that had fully closed by its own timestamp,
+    e.g. a daily trend filter next to hourly entries.
+    """
+    suffix = suffix or f"_{target}"
+    columns = columns or [c for c in htf_df.columns if c != 'timestamp']
+
+    htf = htf_df[['timestamp'] + columns].copy()
+    htf['timestamp'] = (pd.to_datetime(htf['timestamp']) + pd.Timedelta(seconds=timeframe_to_seconds(target))).astype('datetime64[ns]')
+    htf = htf.rename(columns={c: f"{c}{suffix}" for c in columns})
+
+    base = base_df.copy()
+    index_based = 'timestamp' not in base.columns
+    if index_based:
+        base = base.rename_axis('timestamp').reset_index()
+    base['timestamp'] = pd.to_datetime(base['timestamp']).astype('datetime64[ns]')
+
+    merged = pd.merge_asof(base.sort_values('timestamp'), htf.sort_values('timestamp'),
+                           on='timestamp', direction='backward')
+    return merged.set_index('timestamp') if index_based else merged
+
+
+class _CacheEntry:
+    def __init__(self, bars: pd.DataFrame, last_base_ts: pd.Timestamp, first_base_ts: pd.Timestamp):
+        self.bars = bars
+        self.last_base_ts = last_base_ts
+        self.first_base_ts = first_base_ts
+
+
+class ResampleCache:
+    """
+    Caches resampled series per (symbol, base, target).
+    Cached bars are reused by bucket: when the base window moves forward (more bars, or
+    the same `limit` sliding on), only its first bucket (which may now be partial), the
+    last cached bucket (which may have been partial) and the new buckets are recomputed;
+    the buckets in between are reused as-is.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], _CacheEntry]" = OrderedDict()
+        self.stats: Dict[str, int] = {'hits': 0, 'extends': 0, 'rebuilds': 0}
+
+    def get(self, symbol: str, base_df: pd.DataFrame, base: str, target: str) -> pd.DataFrame:
+        """
+        Returns `target` bars for `base_df`, reusing and extending any cached result.
+        """
+        if not can_resample(base, target):
+            raise ValueError(f"Cannot build {target} bars from {base} bars")
+        if base_df.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        if base == target:
+            return base_df.copy()
+
+        key = (symbol, base, target)
+        timestamps = pd.to_datetime(base_df['timestamp'])
+        first_ts, last_ts = timestamps.iloc[0], timestamps.iloc[-1]
+        entry = self._entries.get(key)
+
+        if entry is not None and entry.first_base_ts == first_ts and last_ts == entry.last_base_ts:
+            self.stats['hits'] += 1
+        elif (entry is not None and entry.first_base_ts <= first_ts <= entry.last_base_ts
+              and last_ts >= entry.last_base_ts and self._extend(entry, base_df, timestamps, target)):
+            entry.first_base_ts, entry.last_base_ts = first_ts, last_ts
+            self.stats['extends'] += 1
+        else:
+            entry = _CacheEntry(resample_ohlcv(base_df, target), last_ts, first_ts)
+            self._entries[key] = entry
+            self.stats['rebuilds'] += 1
+
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return entry.bars.copy()
+
+    @staticmethod
+    def _extend(entry: _CacheEntry, base_df: pd.DataFrame, timestamps: pd.Series, target: str) -> bool:
+        """
+        Moves the cached bars to the window of `base_df`. False if no whole cached bucket
+        lies strictly between its first bucket and the last cached one (nothing to reuse).
+        """
+        ts = timestamps.values.astype('datetime64[ns]')
+        head = _bucket_starts(ts[:1].astype(np.int64), target)[0]
+        cached = entry.bars['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+        tail = cached[-1]
+        lo, hi = np.searchsorted(cached, head, side='right'), len(cached) - 1
+        if lo >= hi:
+            return False
+        ts_ns = ts.astype(np.int64)
+        parts = [
+            resample_ohlcv(base_df[ts_ns < cached[lo]], target), # First bucket of the window
+            entry.bars.iloc[lo:hi],
+            resample_ohlcv(base_df[ts_ns >= tail], target),      # Last cached bucket onwards
+        ]
+        entry.bars = pd.concat(parts, ignore_index=True)
+        return True
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == symbol]:
+            del self._entries[key]
+
+
+# Global instance
+resample_cache = ResampleCache()
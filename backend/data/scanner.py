@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import math
+import os
+import time
+import warnings
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .db import get_pool
+from .exchange_config import exchange_options_from_env
+from .yf_gateway import to_yf_symbol, yf_gateway
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UNIVERSE = [
+    "BTC/USDT", "ETH/USDT", "SOL/USDT", "BNB/USDT", "XRP/USDT", "ADA/USDT",
+    "DOGE/USDT", "AVAX/USDT", "DOT/USDT", "LINK/USDT", "MATIC/USDT"
+]
+
+
+class ScannerService:
+    """
+    Keeps an in-memory scanner snapshot of the universe, refreshed in the background.
+
+    Every `refresh_interval` seconds one fetch_tickers call on a persistent exchange client
+    brings prices and 24h volume. Daily bars for the whole universe are reloaded from the DB
+    every `history_interval` seconds into (symbols x days) matrices, and relative volume,
+    volatility, multi-day returns and range position are computed across all symbols at once.
+    The current regime of each symbol is read from `regime_source` (the live regime tracker).
+    Requests only read the last snapshot, so latency doesn't depend on the universe size.
+    """
+
+    def __init__(self, universe: List[str], refresh_interval: float = 30.0,
+                 history_interval: float = 900.0, lookback_days: int = 20,
+                 exchange_options: Optional[dict] = None,
+                 regime_source: Optional[Callable[[str], Optional[dict]]] = None):
+        self.universe = list(universe)
+        self.refresh_interval = refresh_interval
+        self.history_interval = history_interval
+        self.lookback_days = lookback_days
+        self.exchange_options = exchange_options or {}
+        self.regime_source = regime_source
+        self.snapshot: List[dict] = []
+        self.updated_at: Optional[float] = None
+        self.refreshes = 0
+        self.last_error: Optional[str] = None
+
+        self._exchange = None
+        self._history: Optional[Dict[str, np.ndarray]] = None # close/volume matrices, row per symbol
+        self._history_loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self) -> List[dict]:
+        if self.updated_at is None:
+            # Cold start: the first request waits for the first snapshot
+            await self.refresh()
+        return self.snapshot
+
+    async def refresh(self):
+        async with self._lock:
+            if time.monotonic() - self._history_loaded_at > self.history_interval:
+                try:
+                    self._history = await self._load_history()
+                    self._history_loaded_at = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Scanner history load failed: {e}")
+            try:
+                tickers = await self._fetch_tickers()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Scanner ticker fetch failed: {e}, falling back to YFinance")
+                tickers = await _fetch_yf_tickers(self.universe)
+            if tickers:
+                self.snapshot = self._build(tickers)
+                self.updated_at = time.time()
+                self.refreshes += 1
+
+    async def _fetch_tickers(self) -> Dict[str, dict]:
+        if self._exchange is None:
+            import ccxt.async_support as ccxt
+            self._exchange = ccxt.binance(self.exchange_options)
+        tickers = await self._exchange.fetch_tickers(self.universe)
+        return {
+            symbol: {"price": t['last'], "change": t['percentage'],
+                     "quote_volume": t['quoteVolume'], "base_volume": t['baseVolume']}
+            for symbol, t in tickers.items()
+        }
+
+    async def _load_history(self) -> Dict[str, np.ndarray]:
+        """
+        Completed daily bars for the last lookback_days + 1 days of every symbol, as matrices.
+        """
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT symbol, timestamp, close, volume FROM market_bars
+                WHERE timeframe = '1d' AND symbol = ANY($1::varchar[])
+                  AND timestamp >= date_trunc('day', now() AT TIME ZONE 'UTC') - make_interval(days => $2)
+                  AND timestamp < date_trunc('day', now() AT TIME ZONE 'UTC')
+            """, self.universe, self.lookback_days + 1)
+        if not rows:
+            empty = np.full((len(self.universe), 0), np.nan)
+            return {"close": empty, "volume": empty}
+        df = pd.DataFrame(rows, columns=['symbol', 'timestamp', 'close', 'volume'])
+        close = df.pivot(index='symbol', columns='timestamp', values='close').reindex(self.universe)
+        volume = df.pivot(index='symbol', columns='timestamp', values='volume').reindex(self.universe)
+        return {"close": close.to_numpy(dtype=float),
+                "volume": volume.to_numpy(dtype=float)}
+
+    def _metrics(self, prices: np.ndarray, volumes_24h: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(self.universe)
+        nan = np.full(n, np.nan)
+        history = self._history
+        if history is None or history["close"].shape[1] == 0:
+            return {"rvol": nan, "volatility": nan, "change_7d": nan, "range_position": nan}
+        close, volume = history["close"], history["volume"]
+        window = close[:, -self.lookback_days:]
+
+        # Symbols without stored bars are all-NaN rows and come out as NaN
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            avg_volume = np.nanmean(volume[:, -self.lookback_days:], axis=1)
+            rvol = volumes_24h / avg_volume
+            log_returns = np.diff(np.log(close), axis=1)[:, -self.lookback_days:]
+            volatility = np.nanstd(log_returns, axis=1, ddof=1) * math.sqrt(365) * 100
+            week_ago = close[:, -7] if close.shape[1] >= 7 else nan
+            change_7d = (prices / week_ago - 1) * 100
+            high, low = np.nanmax(window, axis=1), np.nanmin(window, axis=1)
+            high, low = np.fmax(high, prices), np.fmin(low, prices)
+            range_position = (prices - low) / (high - low)
+        return {"rvol": rvol, "volatility": volatility, "change_7d": change_7d, "range_position": range_position}
+
+    def _build(self, tickers: Dict[str, dict]) -> List[dict]:
+        prices = np.array([_num(tickers.get(s, {}).get("price")) for s in self.universe])
+        volumes_24h = np.array([_num(tickers.get(s, {}).get("base_volume")) for s in self.universe])
+        metrics = self._metrics(prices, volumes_24h)
+
+        results = []
+        for i, symbol in enumerate(self.universe):
+            ticker = tickers.get(symbol)
+            if ticker is None or not np.isfinite(prices[i]):
+                continue
+            rvol = metrics["rvol"][i]
+            regime = self.regime_source(symbol) if self.regime_source else None
+            results.append({
+                "symbol": symbol,
+                "name": symbol.split('/')[0], # Simplified name
+                "price": float(prices[i]),
+                "change": _finite(ticker.get("change")),
+                "volume": _finite(ticker.get("quote_volume")), # Quote volume in USDT
+                "rvol": round(float(rvol), 2) if np.isfinite(rvol) else 1.0, # Neutral without stored history
+                "volatility": _optional(metrics["volatility"][i]),
+                "change7d": _optional(metrics["change_7d"][i]),
+                "rangePosition": _optional(metrics["range_position"][i]),
+                "regime": regime.get("summary") if regime else None,
+                "sector": "Crypto",
+                "marketCap": 0 # Not available in simple ticker, set 0 to avoid frontend error
+            })
+        return results
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Scanner refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._exchange is not None:
+            await self._exchange.close()
+            self._exchange = None
+
+    def stats(self) -> dict:
+        return {"symbols": len(self.universe), "rows": len(self.snapshot), "updated_at": self.updated_at,
+                "refreshes": self.refreshes, "last_error": self.last_error}
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def _finite(value) -> float:
+    # Avoid NaN/Infinity in the JSON response
+    value = _num(value)
+    return value if math.isfinite(value) else 0.0
+
+
+def _optional(value) -> Optional[float]:
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+async def _fetch_yf_tickers(universe: List[str]) -> Dict[str, dict]:
+    """
+    Fallback when the exchange is unreachable: last daily bar from YFinance.
+    """
+    yf_map = {to_yf_symbol(s): s for s in universe}
+    data = await yf_gateway.download(list(yf_map), period="1d")
+    tickers = {}
+    if data is None or data.empty:
+        return tickers
+    for yf_symbol, symbol in yf_map.items():
+        try:
+            row = data[yf_symbol].iloc[-1]
+        except Exception:
+            continue
+        open_p, close_p = float(row['Open']), float(row['Close'])
+        if not open_p or not math.isfinite(close_p):
+            continue
+        tickers[symbol] = {"price": close_p, "change": (close_p - open_p) / open_p * 100,
+                           "quote_volume": float(row['Volume']) * close_p, "base_volume": float(row['Volume'])}
+    return tickers
+
+
+def _scanner_from_env() -> ScannerService:
+    from analysis.regime_tracker import regime_tracker
+    universe = [s for s in os.getenv("SCANNER_UNIVERSE", ",".join(DEFAULT_UNIVERSE)).split(',') if s]
+    return ScannerService(universe, exchange_options=exchange_options_from_env(),
+                          regime_source=regime_tracker.get)
+
+
+# Global instance (SCANNER_UNIVERSE: comma-separated pairs to scan)
+scanner_service = _scanner_from_env()
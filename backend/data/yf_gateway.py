@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def to_yf_symbol(symbol: str) -> str:
+    """
+    BTC/USDT, BTC-USDT, BTC -> BTC-USD; equities pass through (BRK/B -> BRK-B).
+    """
+    yf_symbol = symbol.replace('/', '-')
+    if symbol in ["BTC", "ETH", "SOL"] or "USDT" in symbol:
+        if not yf_symbol.endswith("-USD"):
+            yf_symbol = yf_symbol.replace("-USDT", "-USD").replace("USDT", "-USD") if "USDT" in yf_symbol else f"{yf_symbol}-USD"
+    return yf_symbol
+
+
+class YFinanceBackend:
+    """
+    The real upstream. Every method is blocking and runs on the gateway's thread pool.
+    """
+
+    def info(self, symbol: str) -> dict:
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def news(self, symbol: str) -> list:
+        import yfinance as yf
+        return yf.Ticker(symbol).news or []
+
+    def history(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.Ticker(symbol).history(period=period, interval=interval)
+
+    def download(self, symbols: List[str], period: str, interval: str) -> pd.DataFrame:
+        import yfinance as yf
+        # The gateway's pool bounds concurrency; don't let yfinance spawn its own threads
+        return yf.download(symbols, period=period, interval=interval, group_by='ticker',
+                           threads=False, progress=False)
+
+
+class OfflineYFinanceBackend:
+    """
+    Deterministic stand-in for tests and offline development: synthetic daily bars seeded
+    by the symbol, a fixed info dict and no news. Same shapes as yfinance returns.
+    """
+
+    PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180, "1y": 365, "2y": 730, "5y": 1825, "max": 3650}
+
+    def _bars(self, symbol: str, period: str) -> pd.DataFrame:
+        days = self.PERIOD_DAYS.get(period, 30)
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=days, freq='D', name='Date')
+        close = (10 + zlib.crc32(symbol.encode()) % 500) * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+        open_ = close * (1 + rng.normal(0, 0.005, days))
+        return pd.DataFrame({
+            "Open": open_, "High": np.maximum(open_, close) * 1.01, "Low": np.minimum(open_, close) * 0.99,
+            "Close": close, "Volume": rng.uniform(1e5, 1e6, days),
+        }, index=index)
+
+    def info(self, symbol: str) -> dict:
+        last = self._bars(symbol, "1y")
+        return {
+            "shortName": symbol, "currency": "USD", "marketCap": 1e9, "sector": "Technology",
+            "industry": "Software", "trailingPE": 22.0, "forwardPE": 19.0, "pegRatio": 1.5,
+            "priceToBook": 4.0, "profitMargins": 0.2, "beta": 1.1,
+            "fiftyTwoWeekHigh": float(last["High"].max()), "fiftyTwoWeekLow": float(last["Low"].min()),
+            "currentPrice": float(last["Close"].iloc[-1]), "previousClose": float(last["Close"].iloc[-2]),
+            "longBusinessSummary": f"Offline stand-in data for {symbol}.",
+        }
+
+    def news(self, symbol: str) -> list:
+        return []
+
+    def history(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        return self._bars(symbol, period)
+
+    def download(self, symbols: List[str], period: str, interval: str) -> pd.DataFrame:
+        return pd.concat({s: self._bars(s, period) for s in symbols}, axis=1)
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after `ttl` seconds. Expired entries are kept until
+    evicted so they can still be served if the upstream fails.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, allow_stale: bool = False):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if not allow_stale and time.monotonic() >= expires_at:
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class YFinanceGateway:
+    """
+    The only way the backend talks to yfinance.
+
+    Calls run on a dedicated, bounded thread pool so a slow upstream can't take the default
+    executor (or the event loop) with it. A token bucket keeps the request rate under
+    Yahoo's throttling, each endpoint has its own TTL cache, and concurrent identical calls
+    share one upstream request. If a call fails or times out, the last cached value is
+    returned when there is one.
+    """
+
+    DEFAULT_TTLS = {"info": 6 * 3600.0, "news": 300.0, "history": 900.0, "download": 15.0}
+
+    def __init__(self, backend=None, max_workers: int = 4, rate: float = 2.0, burst: int = 5,
+                 ttls: Optional[Dict[str, float]] = None, max_entries: int = 1000, timeout: float = 20.0):
+        self.backend = backend or YFinanceBackend()
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yfinance")
+        self._bucket = TokenBucket(rate, burst)
+        ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self._caches = {endpoint: TTLCache(ttl, max_entries) for endpoint, ttl in ttls.items()}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "stale_served": 0}
+
+    async def _call(self, endpoint: str, key: tuple, fn: Callable, *args) -> Any:
+        value = self._caches[endpoint].get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        # The upstream call runs as its own task: a caller that gets cancelled (e.g. a
+        # client disconnecting) neither aborts it nor fails the callers sharing it
+        task = self._inflight.get((endpoint, key))
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(self._fetch(endpoint, key, fn, *args))
+            self._inflight[(endpoint, key)] = task
+            task.add_done_callback(lambda t: self._fetched(endpoint, key, t))
+        return await asyncio.shield(task)
+
+    def _fetched(self, endpoint: str, key: tuple, task: asyncio.Future):
+        self._inflight.pop((endpoint, key), None)
+        if not task.cancelled():
+            task.exception() # Callers re-raise it; don't log it as never retrieved if they all left
+
+    async def _fetch(self, endpoint: str, key: tuple, fn: Callable, *args) -> Any:
+        cache = self._caches[endpoint]
+        try:
+            await self._bucket.acquire()
+            loop = asyncio.get_running_loop()
+            value = await asyncio.wait_for(loop.run_in_executor(self._executor, fn, *args), timeout=self.timeout)
+            cache.set(key, value)
+            return value
+        except Exception as e:
+            self.stats["errors"] += 1
+            stale = cache.get(key, allow_stale=True)
+            if stale is not None:
+                self.stats["stale_served"] += 1
+                logger.warning(f"yfinance {endpoint} {key} failed ({e!r}), serving cached value")
+                return stale
+            raise
+
+    async def info(self, symbol: str) -> dict:
+        return await self._call("info", (symbol,), self.backend.info, symbol)
+
+    async def news(self, symbol: str) -> list:
+        return await self._call("news", (symbol,), self.backend.news, symbol)
+
+    async def history(self, symbol: str, period: str = "2y", interval: str = "1d") -> pd.DataFrame:
+        df = await self._call("history", (symbol, period, interval), self.backend.history, symbol, period, interval)
+        return df.copy() # Cached frames are shared between callers
+
+    async def download(self, symbols: List[str], period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        symbols = sorted(set(symbols))
+        df = await self._call("download", (tuple(symbols), period, interval),
+                              self.backend.download, symbols, period, interval)
+        return df.copy()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "cached": {endpoint: len(cache) for endpoint, cache in self._caches.items()}}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance (YF_OFFLINE=1 swaps in the deterministic stand-in)
+yf_gateway = YFinanceGateway(OfflineYFinanceBackend() if os.getenv("YF_OFFLINE") == "1" else None)
@@ -3,6 +3,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from strategies import StrategyFactory
 from risk import RiskEngine
+from data.resample import timeframe_to_seconds
+from analysis.regime import MarketRegimeDetector, TREND_LABELS
 
 class Backtester:
     def __init__(self, data: pd.DataFrame, initial_capital=10000.0, commission=0.001):
@@ -27,6 +29,10 @@ class Backtester:
         strategy_params = strategy_config.get('params', {})
         risk_config = strategy_config.get('risk', {})
         
+        # Annualization factor follows the bar size (defaults to hourly bars)
+        timeframe = strategy_config.get('timeframe') or '1h'
+        periods_per_year = 252 * 24 * 3600 / timeframe_to_seconds(timeframe)
+        
         try:
             strategy = StrategyFactory.get_strategy(strategy_name, strategy_params)
         except ValueError as e:
@@ -36,6 +42,15 @@ class Backtester:
         self.data = strategy.generate_indicators(self.data)
         self.data = strategy.generate_signals(self.data)
         
+        # Regime entry filter, e.g. {"trend": ["Strong Bullish"], "volatility": ["Normal"]}
+        # One vectorized pass over the whole history instead of per-bar detection
+        regime_filter = strategy_config.get('regime_filter')
+        timeline = MarketRegimeDetector.regime_timeline(self.data) if {'high', 'low', 'volume'} <= set(self.data.columns) else None
+        if regime_filter and timeline is None:
+            raise ValueError("Regime filter needs high, low and volume columns")
+        entry_allowed = MarketRegimeDetector.regime_mask(timeline, regime_filter) if regime_filter else None
+        trend_codes = timeline['trend'].to_numpy() if timeline is not None else None
+        
         # 3. Initialize Risk Engine
         risk_engine = RiskEngine({
             "risk_per_trade": risk_config.get("risk_per_trade", 0.02),
@@ -67,8 +82,10 @@ class Backtester:
         
         
         max_equity = self.initial_capital
+        entry_trend = None # Trend regime at entry of the open position
+        filtered_entries = 0
         
-        for index, row in self.data.iterrows():
+        for i, (index, row) in enumerate(self.data.iterrows()):
             current_price = row['close']
             atr = row.get('atr', current_price * 0.01) # Fallback ATR
             signal = row.get('signal', 0)
@@ -89,6 +106,7 @@ class Backtester:
                         'type': 'stop_loss', 
                         'price': stop_loss, 
                         'pnl': pnl - cost,
+                        'regime': entry_trend,
                         'balance': equity
                     })
                 
@@ -105,6 +123,7 @@ class Backtester:
                         'type': 'take_profit', 
                         'price': take_profit, 
                         'pnl': pnl - cost,
+                        'regime': entry_trend,
                         'balance': equity
                     })
                     
@@ -120,11 +139,14 @@ class Backtester:
                         'type': 'reversal_exit', 
                         'price': current_price, 
                         'pnl': pnl - cost,
+                        'regime': entry_trend,
                         'balance': equity
                     })
 
             # --- Entry Logic ---
-            if position == 0 and signal != 0:
+            if position == 0 and signal != 0 and entry_allowed is not None and not entry_allowed[i]:
+                filtered_entries += 1
+            elif position == 0 and signal != 0:
                 # New Entry
                 # 1. Calculate Risk Inputs
                 sl_price = risk_engine.calculate_stop_loss(current_price, atr, multiplier=2.0, side=signal)
@@ -149,6 +171,7 @@ class Backtester:
                     stop_loss = sl_price
                     take_profit = tp_price
                     position = signal
+                    entry_trend = TREND_LABELS[trend_codes[i]] if trend_codes is not None else None
                     
                     trades.append({
                         'date': index, 
@@ -158,6 +181,7 @@ class Backtester:
                         'size': position_size,
                         'sl': stop_loss,
                         'tp': take_profit,
+                        'regime': entry_trend,
                         'balance': equity
                     })
             
@@ -185,6 +209,7 @@ class Backtester:
                             'type': 'kill_switch_exit', 
                             'price': current_price, 
                             'pnl': pnl - cost,
+                            'regime': entry_trend,
                             'balance': equity
                         })
                     break
@@ -206,14 +231,14 @@ class Backtester:
         
         # 1. Sharpe Ratio
         if returns.std() != 0:
-            sharpe_ratio = (returns.mean() - risk_free_rate) / returns.std() * np.sqrt(252 * 24)
+            sharpe_ratio = (returns.mean() - risk_free_rate) / returns.std() * np.sqrt(periods_per_year)
         else:
             sharpe_ratio = 0.0
             
         # 2. Sortino Ratio (Downside Deviation)
         negative_returns = returns[returns < 0]
         if len(negative_returns) > 0 and negative_returns.std() != 0:
-            sortino_ratio = (returns.mean() - risk_free_rate) / negative_returns.std() * np.sqrt(252 * 24)
+            sortino_ratio = (returns.mean() - risk_free_rate) / negative_returns.std() * np.sqrt(periods_per_year)
         else:
             sortino_ratio = 0.0
             
@@ -223,8 +248,8 @@ class Backtester:
         max_drawdown = drawdown.min()
         
         # 4. Win Rate & Profit Factor
-        winning_trades = [t for t in trades if t['pnl'] > 0]
-        losing_trades = [t for t in trades if t['pnl'] < 0]
+        winning_trades = [t for t in trades if t.get('pnl', 0) > 0] # Entries carry no pnl
+        losing_trades = [t for t in trades if t.get('pnl', 0) < 0]
         
         num_winning = len(winning_trades)
         num_losing = len(losing_trades)
@@ -242,8 +267,21 @@ class Backtester:
         largest_win = max([t['pnl'] for t in winning_trades]) if winning_trades else 0
         largest_loss = min([t['pnl'] for t in losing_trades]) if losing_trades else 0
 
+        # Performance by trend regime at entry (exits carry their entry's regime)
+        regime_stats = {}
+        for t in trades:
+            if t['type'] == 'entry' or t.get('regime') is None:
+                continue
+            stats = regime_stats.setdefault(t['regime'], {"trades": 0, "wins": 0, "total_pnl": 0.0})
+            stats["trades"] += 1
+            stats["wins"] += int(t['pnl'] > 0)
+            stats["total_pnl"] += float(t['pnl'])
+        for stats in regime_stats.values():
+            stats["win_rate"] = stats["wins"] / stats["trades"] * 100
+            stats["avg_pnl"] = stats["total_pnl"] / stats["trades"]
+        
         # 5. Calmar Ratio
-        calmar_ratio = abs(returns.mean() * 252 * 24 / max_drawdown) if max_drawdown != 0 else 0
+        calmar_ratio = abs(returns.mean() * periods_per_year / max_drawdown) if max_drawdown != 0 else 0
         
         total_return = (equity_curve[-1] - self.initial_capital) / self.initial_capital
         
@@ -265,7 +303,9 @@ class Backtester:
                 "largest_loss": float(largest_loss),
                 "final_equity": float(equity_curve[-1])
             },
-            "trades": trades
+            "trades": trades,
+            "regime_stats": regime_stats,
+            "regime_filtered_entries": filtered_entries
         }
 
 if __name__ == "__main__":
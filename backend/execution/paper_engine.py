@@ -0,0 +1,243 @@
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from execution.portfolio import PortfolioManager, Position
+
+logger = logging.getLogger(__name__)
+
+# (position id, exit reason)
+TriggerKey = Tuple[str, str]
+
+
+class TriggerBook:
+    """
+    Stop-loss/take-profit levels of one symbol's open positions, kept in two sorted arrays:
+    levels that fire when the price falls to them (long stops, short targets) and levels
+    that fire when it rises to them (long targets, short stops). A tick bisects each array
+    once and cuts off the crossed end, so it costs O(log n + k) for k fired levels.
+
+    Levels of closed positions aren't deleted one by one (each would shift the arrays);
+    they are skipped when they fire and swept out by `compact` once they outnumber the
+    `live` ones.
+    """
+
+    __slots__ = ('below_levels', 'below_keys', 'above_levels', 'above_keys', 'live')
+
+    def __init__(self):
+        self.below_levels: List[float] = []
+        self.below_keys: List[TriggerKey] = []
+        self.above_levels: List[float] = []
+        self.above_keys: List[TriggerKey] = []
+        self.live = 0 # Levels in the arrays that belong to open positions
+
+    def __len__(self):
+        return len(self.below_levels) + len(self.above_levels)
+
+    def _side(self, fires_below: bool) -> Tuple[List[float], List[TriggerKey]]:
+        return (self.below_levels, self.below_keys) if fires_below else (self.above_levels, self.above_keys)
+
+    def add(self, level: float, key: TriggerKey, fires_below: bool):
+        levels, keys = self._side(fires_below)
+        i = bisect_right(levels, level)
+        levels.insert(i, level)
+        keys.insert(i, key)
+
+    def compact(self, is_open: Callable[[str], bool]):
+        """
+        Drops the levels of positions that are no longer open.
+        """
+        for levels, keys in ((self.below_levels, self.below_keys), (self.above_levels, self.above_keys)):
+            kept = [i for i, key in enumerate(keys) if is_open(key[0])]
+            levels[:] = [levels[i] for i in kept]
+            keys[:] = [keys[i] for i in kept]
+
+    def crossed(self, price: float) -> List[TriggerKey]:
+        """
+        Removes and returns every level the price has reached.
+        """
+        i = bisect_left(self.below_levels, price)  # Levels >= price
+        j = bisect_right(self.above_levels, price) # Levels <= price
+        fired = self.below_keys[i:] + self.above_keys[:j]
+        if i < len(self.below_levels):
+            del self.below_levels[i:]
+            del self.below_keys[i:]
+        if j:
+            del self.above_levels[:j]
+            del self.above_keys[:j]
+        return fired
+
+
+class PaperExecutionEngine:
+    """
+    Paper execution against the live feed for any number of accounts (PortfolioManager
+    instances keyed by account id).
+
+    Positions are indexed as their accounts open and close them. Each tick records the
+    symbol's mark and closes the positions whose stop-loss or take-profit it reached, at
+    the tick price (a gap through a level fills at the market, not at the level). Open P&L
+    is marked lazily: per account when its summary is read, and per symbol in aggregate
+    from running net size and cost, so ticks never walk the open positions.
+
+    A symbol is pinned in the feed when its first position opens and unpinned when its
+    last one closes, so open stops and targets never lose their ticks to eviction.
+    """
+
+    def __init__(self, default_account: PortfolioManager, initial_capital: float = 10000.0,
+                 max_accounts: int = 10000, pin_symbol: Optional[Callable[[str], None]] = None,
+                 unpin_symbol: Optional[Callable[[str], None]] = None):
+        self.initial_capital = initial_capital
+        self.max_accounts = max_accounts
+        # Keep traded symbols streaming (e.g. LiveDataManager.request(pin=True) / unpin)
+        self.pin_symbol = pin_symbol
+        self.unpin_symbol = unpin_symbol
+        self.default_account_id = default_account.account_id
+        self.accounts: Dict[str, PortfolioManager] = {}
+        self.books: Dict[str, TriggerBook] = {}
+        self.marks: Dict[str, float] = {} # symbol -> last tick price
+        self._positions: Dict[str, list] = {} # position id -> [account, position, levels still armed]
+        self._net: Dict[str, List[float]] = {} # symbol -> [signed size, signed entry cost, positions], all accounts
+        self.stats = {"ticks": 0, "stop_losses": 0, "take_profits": 0, "fill_errors": 0}
+        self.attach(default_account)
+
+    # --- Accounts ---
+
+    def attach(self, account: PortfolioManager):
+        """
+        Starts executing `account`'s positions (including ones it already holds).
+        """
+        self.accounts[account.account_id] = account
+        account.register_callback(self._on_position)
+        for pos in account.positions.values():
+            self._index(account, pos)
+
+    def account(self, account_id: Optional[str] = None, create: bool = False) -> PortfolioManager:
+        account_id = account_id or self.default_account_id
+        account = self.accounts.get(account_id)
+        if account is None:
+            if not create:
+                raise KeyError(f"Unknown paper account: {account_id}")
+            if len(self.accounts) >= self.max_accounts:
+                raise ValueError("Too many paper accounts")
+            account = PortfolioManager(self.initial_capital, account_id=account_id)
+            self.attach(account)
+        return account
+
+    def summary(self, account_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Portfolio summary with open positions marked at the latest tick.
+        """
+        account = self.account(account_id)
+        for pos in account.positions.values():
+            price = self.marks.get(pos.symbol)
+            if price is not None:
+                pos.update_pnl(price)
+        return account.get_portfolio_summary()
+
+    def open_pnl(self, symbol: Optional[str] = None) -> float:
+        """
+        Unrealized P&L across all accounts, O(1) per symbol.
+        """
+        symbols = [symbol] if symbol is not None else list(self._net)
+        total = 0.0
+        for s in symbols:
+            net, price = self._net.get(s), self.marks.get(s)
+            if net is not None and price is not None:
+                total += net[0] * price - net[1]
+        return total
+
+    # --- Index ---
+
+    def _on_position(self, event: str, account: PortfolioManager, pos: Position):
+        if event == 'open':
+            self._index(account, pos)
+        elif event == 'close':
+            self._unindex(pos)
+
+    @staticmethod
+    def _levels(pos: Position):
+        # (level, reason, fires when the price falls to it); unset levels (None/0) never fire
+        long = pos.side == 'long'
+        if pos.stop_loss:
+            yield pos.stop_loss, 'STOP_LOSS', long
+        if pos.take_profit:
+            yield pos.take_profit, 'TAKE_PROFIT', not long
+
+    def _index(self, account: PortfolioManager, pos: Position):
+        if pos.id in self._positions:
+            return
+        book = self.books.get(pos.symbol)
+        if book is None:
+            book = self.books[pos.symbol] = TriggerBook()
+        armed = 0
+        for level, reason, fires_below in self._levels(pos):
+            book.add(level, (pos.id, reason), fires_below)
+            armed += 1
+        book.live += armed
+        self._positions[pos.id] = [account, pos, armed]
+
+        sign = 1.0 if pos.side == 'long' else -1.0
+        net = self._net.get(pos.symbol)
+        if net is None:
+            net = self._net[pos.symbol] = [0.0, 0.0, 0]
+            if self.pin_symbol:
+                self.pin_symbol(pos.symbol) # First open position on the symbol
+        net[0] += sign * pos.size
+        net[1] += sign * pos.size * pos.entry_price
+        net[2] += 1
+
+    def _unindex(self, pos: Position):
+        entry = self._positions.pop(pos.id, None)
+        if entry is None:
+            return
+        book = self.books.get(pos.symbol)
+        if book is not None:
+            book.live -= entry[2] # Its remaining levels are now stale
+            if not book.live or len(book) > 2 * book.live + 64:
+                book.compact(self._positions.__contains__)
+            if not book:
+                del self.books[pos.symbol]
+
+        sign = 1.0 if pos.side == 'long' else -1.0
+        net = self._net[pos.symbol]
+        net[0] -= sign * pos.size
+        net[1] -= sign * pos.size * pos.entry_price
+        net[2] -= 1
+        if not net[2]:
+            del self._net[pos.symbol]
+            if self.unpin_symbol:
+                self.unpin_symbol(pos.symbol) # Its last position closed
+
+    # --- Feed ---
+
+    def on_tick(self, event):
+        """
+        Live feed callback.
+        """
+        symbol, price = event['symbol'], event['price']
+        self.marks[symbol] = price
+        self.stats["ticks"] += 1
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        for position_id, reason in book.crossed(price):
+            entry = self._positions.get(position_id)
+            if entry is None:
+                continue # Closed already (manually, or by its other level on this tick)
+            account, pos = entry[0], entry[1]
+            entry[2] -= 1
+            book.live -= 1
+            try:
+                if account.positions.get(pos.symbol) is pos:
+                    account.close_position(pos.symbol, price, reason=reason)
+                    self.stats["stop_losses" if reason == 'STOP_LOSS' else "take_profits"] += 1
+                else:
+                    self._unindex(pos) # Replaced or closed without notifying
+            except Exception as e:
+                self.stats["fill_errors"] += 1
+                logger.error(f"Paper {reason} fill failed for {symbol} ({account.account_id}): {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "accounts": len(self.accounts), "open_positions": len(self._positions),
+                "symbols": len(self._net), "armed_levels": sum(b.live for b in self.books.values()),
+                "open_pnl": self.open_pnl()}
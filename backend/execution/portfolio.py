@@ -1,7 +1,10 @@
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 class Position:
     def __init__(self, symbol: str, side: str, entry_price: float, size: float, stop_loss: float, take_profit: float):
         self.id = str(uuid.uuid4())
@@ -23,13 +26,28 @@ class Position:
         return self.pnl
 
 class PortfolioManager:
-    def __init__(self, initial_capital: float = 10000.0):
+    def __init__(self, initial_capital: float = 10000.0, account_id: str = "default"):
+        self.account_id = account_id
         self.initial_capital = initial_capital
         self.balance = initial_capital
         self.positions: Dict[str, Position] = {} # Key by symbol (assuming 1 pos per symbol for simplicity)
         self.trade_history: List[dict] = []
         self.daily_pnl = 0.0
         self.start_of_day_balance = initial_capital
+        self.callbacks: List[Callable] = []
+
+    def register_callback(self, callback: Callable):
+        """
+        callback(event, manager, position) after each open ('open') and close ('close').
+        """
+        self.callbacks.append(callback)
+
+    def _notify(self, event: str, pos: Position):
+        for callback in self.callbacks:
+            try:
+                callback(event, self, pos)
+            except Exception as e:
+                logger.error(f"Position callback failed for {pos.symbol}: {e}")
 
     def open_position(self, symbol: str, side: str, price: float, size: float, sl: float, tp: float):
         """
@@ -56,6 +74,7 @@ class PortfolioManager:
             'size': size,
             'time': pos.entry_time.isoformat()
         })
+        self._notify('open', pos)
         return pos
 
     def close_position(self, symbol: str, exit_price: float, reason: str = 'MANUAL'):
@@ -91,6 +110,8 @@ class PortfolioManager:
         
         # Update Daily Stats
         self.daily_pnl += pnl
+        pos.status = 'CLOSED'
+        self._notify('close', pos)
         
         return record
 
@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
 import pandas as pd
 import numpy as np
@@ -10,11 +11,27 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from engine import Backtester
 from execution.portfolio import portfolio_manager
+from execution.paper_engine import PaperExecutionEngine
 from data.live_feed import live_data_manager
+from data.db import DATABASE_URL, close_pool
+from data.resample import resample_cache, can_resample, timeframe_to_seconds
+from data.bar_store import hot_bar_store
+from data.price_stream import PriceStreamHub, PriceStreamClient
+from data.metrics import feed_metrics
+from data.order_book import order_book_manager
+from data.quote_cache import quote_cache
+from data.scanner import scanner_service
+from data.yf_gateway import yf_gateway, to_yf_symbol
 import asyncio
 from research.walk_forward import WalkForwardValidator
 
-from analysis.institutional import InstitutionalAnalyst
+from analysis.institutional import InstitutionalAnalyst, analysis_executor, stage_cache
+from analysis.fundamentals import fundamentals_store
+from analysis.scheduler import AnalysisScheduler, ReportStore
+from analysis.portfolio_risk import PortfolioRiskEngine
+from analysis.regime_tracker import regime_tracker
+from analysis.cross_asset import cross_asset_analytics
+from collections import deque
 
 app = FastAPI(title="Stratix API")
 
@@ -34,52 +51,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+price_stream_hub = PriceStreamHub(on_symbol_requested=live_data_manager.request)
+regime_changes: deque = deque(maxlen=200) # Most recent regime_change events
+# Paper accounts (the default one is portfolio_manager); symbols with open positions stay pinned
+paper_engine = PaperExecutionEngine(portfolio_manager,
+                                    pin_symbol=lambda symbol: live_data_manager.request(symbol, pin=True),
+                                    unpin_symbol=lambda symbol: live_data_manager.unpin([symbol]))
+background_tasks: List[asyncio.Task] = [] # Loops started here and cancelled on shutdown
+
 # Startup / Shutdown Events
 @app.on_event("startup")
 async def startup_event():
+    # Keep the hot bar tier current from the live feed
+    live_data_manager.register_callback(hot_bar_store.on_tick)
+    live_data_manager.register_candle_callback(hot_bar_store.on_candle)
+    live_data_manager.register_unsubscribe_callback(hot_bar_store.drop)
+    live_data_manager.register_unsubscribe_callback(feed_metrics.drop_symbol)
+    # Push clients only ever need the latest price per symbol
+    live_data_manager.register_callback(price_stream_hub.on_tick, policy='conflate')
+    background_tasks.append(asyncio.create_task(price_stream_hub.run()))
+    # Stops and targets must see every tick: called inline by the receive loop, never queued or dropped
+    live_data_manager.register_callback(paper_engine.on_tick, policy='inline')
+    # L2 books for DEPTH_SYMBOLS on their own connection
+    await order_book_manager.start()
+    scanner_service.start()
+    # Regimes advance one closed bar at a time; the scanner universe is streamed for good
+    # (bar closes only exist for streamed symbols) and seeded from stored bars
+    await live_data_manager.pin(scanner_service.universe)
+    hot_bar_store.register_bar_close_callback(regime_tracker.on_bar_close)
+    regime_tracker.register_callback(regime_changes.append)
+    asyncio.create_task(seed_regime_tracker(scanner_service.universe))
+    # Correlation/beta/volatility matrices advance one row per closed bar of every symbol in
+    # their universe, so it is streamed for good too
+    await live_data_manager.pin(cross_asset_analytics.universe)
+    hot_bar_store.register_bar_close_callback(cross_asset_analytics.on_bar_close)
+    cross_asset_analytics.start()
+    # Re-fetches day-old fundamentals rows in the background
+    fundamentals_store.start()
+    # Precompute analysis reports for the watchlist as bars close
+    hot_bar_store.register_bar_close_callback(analysis_scheduler.on_bar_close)
+    analysis_scheduler.start()
     # Start the live data feed as a background task
     asyncio.create_task(live_data_manager.start())
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    live_data_manager.stop()
-
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Flushes any buffered candles before the pool goes away
+    await live_data_manager.stop()
+    await order_book_manager.stop()
+    await scanner_service.stop()
+    await analysis_scheduler.stop()
+    await cross_asset_analytics.stop()
+    await fundamentals_store.stop()
+    yf_gateway.shutdown()
+    analysis_executor.shutdown(wait=False, cancel_futures=True)
+    await close_pool()
 
-# Database Connection
-DB_USER = os.getenv("POSTGRES_USER", "postgres")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "password")
-DB_HOST = os.getenv("POSTGRES_HOST", "localhost")
-DB_PORT = os.getenv("POSTGRES_PORT", "5432")
-DB_NAME = os.getenv("POSTGRES_DB", "stratix")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Bar size served when callers don't ask for one (matches the historical loader)
+DEFAULT_TIMEFRAME = "1h"
 
-async def get_market_data_df(symbol: str, limit: Optional[int] = 1000):
+async def get_market_data_df(symbol: str, limit: Optional[int] = 1000, timeframe: Optional[str] = None, fallback: bool = True):
     """
     Fetches market data from DB. If missing, falls back to Real-Time APIs (YFinance/CCXT).
+    Reads the most recent `limit` bars of `timeframe` (DEFAULT_TIMEFRAME if omitted), oldest first.
+    Pass fallback=False to only consult the DB.
     """
+    db_timeframe = timeframe or DEFAULT_TIMEFRAME
     try:
         conn = await asyncpg.connect(DATABASE_URL)
         try:
-# ... (skipping some lines to get to get_equity_curve, but wait, replace_file_content needs contiguous block? I should split this if they are far apart)
-# They are far apart. I will do 2 chunks.
-
-            # 1. Try Database
+            # 1. Try Database (native bars or 1m rollups via the market_bars view)
+            columns = 'timestamp, open, high, low, close, volume'
             if limit and limit > 0:
-                query = 'SELECT * FROM market_data WHERE symbol = $1 ORDER BY timestamp ASC LIMIT $2'
-                rows = await conn.fetch(query, symbol, limit)
+                query = (
+                    f'SELECT {columns} FROM ('
+                    f'SELECT {columns} FROM market_bars WHERE symbol = $1 AND timeframe = $2 '
+                    f'ORDER BY timestamp DESC LIMIT $3'
+                    f') recent ORDER BY timestamp ASC'
+                )
+                rows = await conn.fetch(query, symbol, db_timeframe, limit)
             else:
-                query = 'SELECT * FROM market_data WHERE symbol = $1 ORDER BY timestamp ASC'
-                rows = await conn.fetch(query, symbol)
+                query = f'SELECT {columns} FROM market_bars WHERE symbol = $1 AND timeframe = $2 ORDER BY timestamp ASC'
+                rows = await conn.fetch(query, symbol, db_timeframe)
                 
             if rows:
                 data = [dict(row) for row in rows]
-                df = pd.DataFrame(data)
-                numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-                for col in numeric_cols:
-                    if col in df.columns:
-                        df[col] = df[col].astype(float)
-                return df
+                return pd.DataFrame(data)
+
+            if not fallback:
+                return pd.DataFrame()
                 
             # 2. Fallback: Real Data Fetching (No Mocking)
             print(f"Data not found in DB for {symbol}, fetching live...")
@@ -93,7 +157,7 @@ async def get_market_data_df(symbol: str, limit: Optional[int] = 1000):
                 try:
                     # Map symbol format (BTC/USDT is standard for CCXT)
                     ccxt_symbol = symbol.replace('-', '/')
-                    ohlcv = await exchange.fetch_ohlcv(ccxt_symbol, timeframe='1d', limit=limit or 500)
+                    ohlcv = await exchange.fetch_ohlcv(ccxt_symbol, timeframe=db_timeframe, limit=limit or 500)
                     if ohlcv:
                         df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -103,20 +167,13 @@ async def get_market_data_df(symbol: str, limit: Optional[int] = 1000):
                 finally:
                     await exchange.close()
             
-            # Try YFinance (Stocks/Indices/Crypto fallbacks)
-            import yfinance as yf
-            # YF often uses '-' for crypto (BTC-USD)
-            yf_symbol = symbol.replace('/', '-') 
-            if is_crypto and not yf_symbol.endswith("-USD"):
-                 yf_symbol = f"{yf_symbol}-USD"
-            
-            def fetch_yf():
-                ticker = yf.Ticker(yf_symbol)
-                # period='2y' gives enough history
-                return ticker.history(period="2y")
-            
-            loop = asyncio.get_event_loop()
-            yf_df = await loop.run_in_executor(None, fetch_yf)
+            # Try YFinance (Stocks/Indices/Crypto fallbacks). It only serves daily bars here,
+            # so an explicitly requested intraday/weekly timeframe gets nothing rather than
+            # daily bars under the wrong label.
+            if timeframe is not None and timeframe != '1d':
+                return pd.DataFrame()
+            # YF often uses '-' for crypto (BTC-USD); period='2y' gives enough history
+            yf_df = await yf_gateway.history(to_yf_symbol(symbol), period="2y")
             
             if not yf_df.empty:
                 yf_df.reset_index(inplace=True)
@@ -138,12 +195,63 @@ async def get_market_data_df(symbol: str, limit: Optional[int] = 1000):
         print(f"Data Fetch Error: {e}")
         return pd.DataFrame()
 
+async def get_recent_bars_df(symbol: str, limit: int, fallback: bool = True):
+    """
+    Most recent `limit` default-timeframe bars. Streamed symbols are served from the
+    in-memory hot tier (seeded from the DB once); everything else goes to the DB.
+    With fallback=False a symbol without stored bars gets an empty frame instead of
+    exchange/yfinance bars (which may be daily and include the forming bar).
+    """
+    if symbol in live_data_manager.symbols and hot_bar_store.timeframe == DEFAULT_TIMEFRAME:
+        async def load(sym, n):
+            return await get_market_data_df(sym, limit=n, fallback=False)
+
+        df = await hot_bar_store.get_or_load(symbol, limit, load)
+        if df is not None:
+            return df
+    return await get_market_data_df(symbol, limit=limit, fallback=fallback)
+
+async def seed_regime_tracker(symbols: List[str]):
+    """
+    Seeds the regime tracker from stored bars; live bar closes take over from there.
+    """
+    for symbol in symbols:
+        try:
+            df = await get_market_data_df(symbol, limit=300, fallback=False)
+            await asyncio.get_running_loop().run_in_executor(analysis_executor, regime_tracker.sync, symbol, df)
+        except Exception as e:
+            print(f"Regime seed error for {symbol}: {e}")
+
+# Timeframes that can be stored natively or as rollups, finest last
+STORED_TIMEFRAMES = ["1d", "1h", "5m", "1m"]
+
+async def get_timeframe_df(symbol: str, timeframe: str, limit: Optional[int] = None):
+    """
+    Returns bars of any timeframe, resampling from the coarsest stored base that divides it.
+    e.g. 4h is built from 1h bars (or 5m/1m if that is all we have).
+    """
+    timeframe_to_seconds(timeframe)  # Validate early
+    for base in STORED_TIMEFRAMES:
+        if not can_resample(base, timeframe):
+            continue
+        base_limit = None
+        if limit:
+            base_limit = limit * (timeframe_to_seconds(timeframe) // timeframe_to_seconds(base))
+        df = await get_market_data_df(symbol, limit=base_limit, timeframe=base, fallback=False)
+        if not df.empty:
+            return resample_cache.get(symbol, df, base, timeframe)
+
+    # Nothing stored: fetch the requested timeframe directly from the exchange
+    return await get_market_data_df(symbol, limit=limit, timeframe=timeframe)
+
 # Pydantic Models
 class StrategyConfigPayload(BaseModel):
     name: str = "SMA_Cross"
     symbol: str = "BTC/USDT"
+    timeframe: Optional[str] = None # e.g. "4h"; resampled from stored bars when not stored natively
     params: Dict[str, Any] = {"fast_period": 50, "slow_period": 200}
     risk: Dict[str, Any] = {"risk_per_trade": 0.02, "max_drawdown": 0.20}
+    regime_filter: Optional[Dict[str, List[str]]] = None # e.g. {"trend": ["Strong Bullish"], "volatility": ["Normal"]}
 
 class BacktestResponse(BaseModel):
     equity_curve: List[float]
@@ -151,6 +259,8 @@ class BacktestResponse(BaseModel):
     num_trades: int
     metrics: Dict[str, float]
     trades: List[Dict[str, Any]]
+    regime_stats: Dict[str, Dict[str, float]] = {}
+    regime_filtered_entries: int = 0
 
 class WalkForwardPayload(BaseModel):
     strategy: str = "SMA_Cross"
@@ -167,7 +277,8 @@ async def root():
 @app.get("/api/market-data/{symbol}")
 async def get_market_data(symbol: str):
     db_symbol = symbol.replace('-', '/')
-    df = await get_market_data_df(db_symbol, limit=500)
+    live_data_manager.request(db_symbol)
+    df = await get_recent_bars_df(db_symbol, limit=500)
     
     if df.empty:
         return []
@@ -180,18 +291,46 @@ async def get_market_data(symbol: str):
     return result
 
 @app.get("/api/portfolio")
-async def get_portfolio():
+async def get_portfolio(account: Optional[str] = None):
     """
-    Returns the current simulated portfolio state (balance, open positions, PnL).
+    Returns the current simulated portfolio state (balance, open positions marked at the last tick, PnL).
     """
-    return portfolio_manager.get_portfolio_summary()
+    try:
+        return paper_engine.summary(account)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def load_daily_closes(symbol: str, limit: int) -> pd.DataFrame:
+    return await get_timeframe_df(symbol, "1d", limit=limit)
+
+# Correlated Monte Carlo over the open positions (RISK_COV_METHOD: ewma or shrinkage)
+portfolio_risk_engine = PortfolioRiskEngine(
+    load_daily_closes,
+    price_source=live_data_manager.latest_prices.get,
+    num_paths=int(os.getenv("RISK_PATHS", "100000")),
+    method=os.getenv("RISK_COV_METHOD", "ewma"),
+)
+
+@app.get("/api/portfolio/risk")
+async def get_portfolio_risk():
+    """
+    Portfolio VaR/CVaR (1 day, 95%) with per-position contributions to CVaR.
+    """
+    try:
+        return await portfolio_risk_engine.evaluate(dict(portfolio_manager.positions))
+    except Exception as e:
+        print(f"Portfolio risk error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/trades")
-async def get_trades():
+async def get_trades(account: Optional[str] = None):
     """
-    Returns the trade history for the current session.
+    Returns the trade history for the current session (entries, manual and stop/target exits).
     """
-    return portfolio_manager.trade_history
+    try:
+        return paper_engine.account(account).trade_history
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @app.get("/api/live-status")
 async def get_live_status():
@@ -200,17 +339,112 @@ async def get_live_status():
     """
     return {
         "status": "active" if live_data_manager.running else "stopped",
-        "latest_prices": live_data_manager.latest_prices
+        "latest_prices": live_data_manager.latest_prices,
+        "hot_store": hot_bar_store.stats(),
+        "subscribers": live_data_manager.subscriber_stats(),
+        "connections": live_data_manager.connection_stats(),
+        "rejected_requests": live_data_manager.rejected_requests,
+        "price_stream": price_stream_hub.stats(),
+        "order_books": order_book_manager.stats(),
+        "yfinance": yf_gateway.get_stats(),
+        "analysis_cache": stage_cache.get_stats(),
+        "analysis_scheduler": analysis_scheduler.get_stats(),
+        "regime_tracker": regime_tracker.get_stats(),
+        "cross_asset": cross_asset_analytics.get_stats(),
+        "fundamentals": fundamentals_store.get_stats(),
+        "paper_engine": paper_engine.get_stats()
     }
 
+@app.get("/api/market/orderbook/{symbol}")
+async def get_order_book(symbol: str, depth: int = 20):
+    """
+    Top levels, mid and spread of the live L2 book (DEPTH_SYMBOLS only).
+    """
+    db_symbol = symbol.replace('-', '/')
+    book = order_book_manager.get(db_symbol)
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No live order book for {db_symbol}")
+    return book.snapshot(min(max(depth, 1), 500))
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Live feed latency histograms, message and reconnect counters in Prometheus text format.
+    """
+    return PlainTextResponse(feed_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/api/stream/prices")
+async def stream_prices(websocket: WebSocket, symbols: Optional[str] = None, rate: float = 4.0):
+    """
+    Pushes live price updates for the subscribed symbols, batched into one frame
+    per interval: {"type": "prices", "data": {"BTC/USDT": {"price": ..., "timestamp": ...}}}.
+    Client messages: {"action": "subscribe" | "unsubscribe", "symbols": [...]}
+    and {"action": "rate", "rate": <updates per second>}; malformed ones get {"type": "error"}.
+    Slow clients are moved to a lower rate, then disconnected.
+    """
+    await websocket.accept()
+    client = PriceStreamClient(websocket.send_json, max_rate=min(max(rate, 0.5), 10.0))
+    price_stream_hub.add(client)
+
+    def parse(raw) -> Optional[List[str]]:
+        if not isinstance(raw, list):
+            return None # A bare string would be iterated character by character
+        return [s.strip().upper().replace('-', '/') for s in raw if isinstance(s, str) and s.strip()]
+
+    if symbols:
+        price_stream_hub.subscribe(client, parse(symbols.split(',')), live_data_manager.latest_prices)
+
+    sender = asyncio.create_task(client.run())
+    receiver = asyncio.create_task(websocket.receive_json())
+    try:
+        while True:
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if sender in done:
+                if sender.exception() is None:
+                    await websocket.close(code=1013) # Too slow: try again later
+                break
+            message = receiver.result()
+            action = message.get("action") if isinstance(message, dict) else None
+            if action in ("subscribe", "unsubscribe"):
+                requested = parse(message.get("symbols", []))
+                if requested is None:
+                    await websocket.send_json({"type": "error", "message": "symbols must be a list"})
+                elif action == "subscribe":
+                    accepted = price_stream_hub.subscribe(client, requested, live_data_manager.latest_prices)
+                    await websocket.send_json({"type": "subscribed", "symbols": sorted(accepted)})
+                else:
+                    price_stream_hub.unsubscribe(client, requested)
+            elif action == "rate":
+                try:
+                    new_rate = float(message.get("rate", client.max_rate))
+                    if not np.isfinite(new_rate):
+                        raise ValueError(new_rate)
+                except (TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "message": "rate must be a number"})
+                else:
+                    client.max_rate = client.rate = min(max(new_rate, client.min_rate), 10.0)
+            receiver = asyncio.create_task(websocket.receive_json())
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        client.closed = True
+        sender.cancel()
+        receiver.cancel()
+        price_stream_hub.remove(client)
+
 @app.post("/api/paper-trade")
 async def execute_paper_trade(trade: dict = Body(...)):
     """
-    Manually execute a paper trade.
+    Manually execute a paper trade. Its stop loss and take profit are executed against
+    the live feed, so they are refused for symbols that aren't streamed; `account`
+    (optional) opens it in that paper account, creating it if needed.
     """
     try:
-        portfolio_manager.open_position(
-            trade['symbol'], 
+        symbol = trade['symbol'].replace('-', '/')
+        if (trade.get('sl') or trade.get('tp')) and not live_data_manager.is_supported(symbol):
+            raise ValueError(f"Stop loss/take profit need a live price feed, which {symbol} doesn't have")
+        paper_engine.account(trade.get('account'), create=True).open_position(
+            symbol,
             trade['side'], 
             trade['price'], 
             trade['size'], 
@@ -228,13 +462,22 @@ async def run_backtest(config: StrategyConfigPayload):
     """
     db_symbol = config.symbol.replace('-', '/')
     
-    df = await get_market_data_df(db_symbol, limit=None)
+    if config.timeframe:
+        try:
+            df = await get_timeframe_df(db_symbol, config.timeframe)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        df = await get_market_data_df(db_symbol, limit=None)
     
     if df.empty:
          raise HTTPException(status_code=404, detail=f"No data found for symbol {db_symbol}")
     
     backtester = Backtester(df)
-    results = backtester.run(config.dict())
+    try:
+        results = backtester.run(config.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return results
 
@@ -289,10 +532,16 @@ async def get_market_quotes(symbols: str):
     
     # Check live data manager for any available real-time prices
     live_prices = live_data_manager.latest_prices
-    
-    # We will fetch missing ones in batch
+    # Missing ones come from the quote cache, batched into one upstream download
     to_fetch = []
     
+    for sym in symbol_list:
+        db_sym = sym.replace('-', '/')
+        live_data_manager.request(db_sym)
+        if db_sym not in live_prices:
+            to_fetch.append(sym)
+    cached = await quote_cache.get_many(to_fetch) if to_fetch else {}
+            
     for sym in symbol_list:
         db_sym = sym.replace('-', '/')
         if db_sym in live_prices:
@@ -308,82 +557,8 @@ async def get_market_quotes(symbols: str):
                 "open": live_prices[db_sym],
                 "previousClose": live_prices[db_sym]
             })
-        else:
-            to_fetch.append(sym)
-            
-    if not to_fetch:
-        return results
-
-    # Batch fetch from YFinance for missing
-    import yfinance as yf
-    
-    # Normalize symbols for YF
-    yf_map = {}
-    yf_list = []
-    
-    for s in to_fetch:
-        yf_s = s.replace('/', '-')
-        # Crypto handling
-        if s in ["BTC", "ETH", "SOL"] or "USDT" in s:
-            if not yf_s.endswith("-USD"):
-                yf_s = yf_s.replace("USDT", "-USD") if "USDT" in yf_s else f"{yf_s}-USD"
-        
-        yf_map[yf_s] = s
-        yf_list.append(yf_s)
-        
-    try:
-        # Fetch 5 days to ensure we cover weekends/holidays for change calc
-        data = yf.download(yf_list, period="5d", group_by='ticker', threads=True, progress=False)
-        
-        # If single ticker, data structure is different
-        if len(yf_list) == 1:
-            if not data.empty:
-                last_close = data['Close'].iloc[-1]
-                prev_close = data['Close'].iloc[-2] if len(data) > 1 else last_close
-                change = last_close - prev_close
-                pct = (change / prev_close) * 100 if prev_close != 0 else 0
-                
-                results.append({
-                    "symbol": yf_map[yf_list[0]],
-                    "price": float(last_close),
-                    "change": float(change),
-                    "changePercent": float(pct),
-                    "volume": float(data['Volume'].iloc[-1]),
-                    "marketCap": 0.0,
-                    "high": float(data['High'].iloc[-1]),
-                    "low": float(data['Low'].iloc[-1]),
-                    "open": float(data['Open'].iloc[-1]),
-                    "previousClose": float(prev_close)
-                })
-        else:
-            # Multi-ticker DataFrame
-            for yf_sym, original_sym in yf_map.items():
-                try:
-                    df = data[yf_sym]
-                    if df.empty: continue
-                    
-                    last_close = df['Close'].iloc[-1]
-                    prev_close = df['Close'].iloc[-2] if len(df) > 1 else last_close
-                    change = last_close - prev_close
-                    pct = (change / prev_close) * 100 if prev_close != 0 else 0
-                    
-                    results.append({
-                        "symbol": original_sym,
-                        "price": float(last_close),
-                        "change": float(change),
-                        "changePercent": float(pct),
-                        "volume": float(df['Volume'].iloc[-1]),
-                        "marketCap": 0.0,
-                        "high": float(df['High'].iloc[-1]),
-                        "low": float(df['Low'].iloc[-1]),
-                        "open": float(df['Open'].iloc[-1]),
-                        "previousClose": float(prev_close)
-                    })
-                except Exception:
-                    continue
-                    
-    except Exception as e:
-        print(f"Batch fetch error: {e}")
+        elif cached.get(sym):
+            results.append({"symbol": sym, **cached[sym]})
         
     return results
 
@@ -394,13 +569,22 @@ async def get_market_quote(symbol: str):
     Matches frontend Quote interface.
     """
     db_symbol = symbol.replace('-', '/')
-    price = live_data_manager.latest_prices.get(db_symbol)
-    
-    # If not in live feed, try to get last price from DB/API
+    live_data_manager.request(db_symbol)
     price = live_data_manager.latest_prices.get(db_symbol)
     change = 0.0
     change_pct = 0.0
     volume = 0.0
+    high = low = open_price = None
+    
+    # Hot tier: current bar of a streamed symbol, no DB round trip
+    bar = hot_bar_store.latest(db_symbol) if db_symbol in live_data_manager.symbols else None
+    if bar:
+        price = price or bar['close']
+        high, low, open_price = bar['high'], bar['low'], bar['open']
+        volume = bar['volume']
+        if bar['previous_close']:
+            change = price - bar['previous_close']
+            change_pct = (change / bar['previous_close']) * 100
     
     if not price:
         # Fetch last 2 days to calculate change
@@ -413,6 +597,12 @@ async def get_market_quote(symbol: str):
                 prev_close = df.iloc[-2]['close']
                 change = price - prev_close
                 change_pct = (change / prev_close) * 100
+
+    if not price:
+        # Not stored locally (e.g. equities): cached upstream quote
+        quote = await quote_cache.get(symbol)
+        if quote:
+            return {"symbol": symbol, **quote}
                 
     if not price:
          # If still no price, return 0 or error, but DO NOT FAKE IT
@@ -424,9 +614,9 @@ async def get_market_quote(symbol: str):
         "change": round(change, 2),
         "changePercent": round(change_pct, 2),
         "volume": volume,
-        "high": price * 1.05, # Estimates derived from current price if low/high not available
-        "low": price * 0.95,
-        "open": price - change,
+        "high": high if high is not None else price * 1.05, # Estimates derived from current price if low/high not available
+        "low": low if low is not None else price * 0.95,
+        "open": open_price if open_price is not None else price - change,
         "previousClose": price - change
     }
 
@@ -451,20 +641,9 @@ async def get_market_news(symbol: str, limit: int = 10):
     """
     Get real news from YFinance.
     """
-    import yfinance as yf
     try:
-        yf_symbol = symbol.replace('/', '-')
         # Adjust for crypto common format in YF
-        if '/' in symbol or symbol in ["BTC", "ETH", "SOL"]:
-             if not yf_symbol.endswith("-USD"):
-                  yf_symbol = f"{yf_symbol}-USD"
-
-        def fetch_news():
-            t = yf.Ticker(yf_symbol)
-            return t.news
-            
-        loop = asyncio.get_event_loop()
-        news_data = await loop.run_in_executor(None, fetch_news)
+        news_data = await yf_gateway.news(to_yf_symbol(symbol))
         
         formatted_news = []
         for item in news_data[:limit]:
@@ -558,98 +737,35 @@ async def create_experiment(exp: Dict[str, Any]):
 async def list_experiments():
     return []
 
+@app.get("/api/market/regimes")
+async def get_market_regimes():
+    """
+    Current regime of every tracked symbol and the latest regime changes (newest first).
+    """
+    return {
+        "regimes": {symbol: state.report for symbol, state in list(regime_tracker.states.items())},
+        "changes": list(reversed(regime_changes)),
+    }
+
+@app.get("/api/market/cross-asset")
+async def get_cross_asset(symbols: Optional[str] = None):
+    """
+    Rolling correlation/covariance matrices, beta to the benchmark and annualized volatility
+    across the cross-asset universe (latest closed bar). `symbols` (comma-separated) narrows
+    the matrices, e.g. to the symbols being sized.
+    """
+    if symbols:
+        return cross_asset_analytics.subset([s.replace('-', '/') for s in symbols.split(',') if s])
+    return Response(content=cross_asset_analytics.payload(), media_type="application/json")
+
 @app.get("/api/market/scanner")
 async def get_scanner():
     """
-    Returns scanner results based on 24h ticker data from Binance.
+    Returns the latest scanner snapshot: 24h ticker data from Binance plus relative volume,
+    volatility and multi-day metrics from stored daily bars. Refreshed in the background.
     """
     try:
-        # Use CCXT from live_data_manager or create a new instance for snapshot
-        # For speed, we'll try to use the live_data_manager's exchange if available,
-        # otherwise create a temporary one.
-        
-        # We will scan a defined universe of assets to avoid API weight limits
-        universe = [
-            "BTC/USDT", "ETH/USDT", "SOL/USDT", "BNB/USDT", "XRP/USDT", "ADA/USDT", 
-            "DOGE/USDT", "AVAX/USDT", "DOT/USDT", "LINK/USDT", "MATIC/USDT"
-        ]
-        
-        # Fetch 24hr ticker for these
-        import ccxt.async_support as ccxt
-        exchange = ccxt.binance()
-        results = []
-        try:
-            tickers = await exchange.fetch_tickers(universe)
-            for symbol, data in tickers.items():
-                results.append({
-                    "symbol": symbol,
-                    "name": symbol.split('/')[0], # Simplified name
-                    "price": data['last'],
-                    "change": data['percentage'],
-                    "volume": data['quoteVolume'], # Quote volume in USDT
-                    "rvol": 1.2, # Placeholder as real RVOL requires history
-                    "sector": "Crypto",
-                    "marketCap": 0 # Not available in simple ticker, set 0 to avoid frontend error
-                })
-            return results
-        except Exception as cx_err:
-             print(f"CCXT Scanner Error: {cx_err}, falling back to YFinance")
-             # Fallback to YFinance
-             import yfinance as yf
-             yf_universe = [s.replace('/', '-') for s in universe] # e.g. BTC-USD
-             # Check if end with USDT, replace with USD for YF if needed, YF usually BTC-USD
-             yf_universe = [s.replace('USDT', 'USD') for s in yf_universe]
-             
-             def fetch_yf_scanner():
-                 data = yf.download(yf_universe, period="1d", group_by='ticker', threads=True)
-                 return data
-             
-             loop = asyncio.get_event_loop()
-             yf_data = await loop.run_in_executor(None, fetch_yf_scanner)
-             
-             fallback_results = []
-             # yf_data columns are likely MultiIndex (Ticker, OHLCV)
-             # If failing, yf_data might be empty
-             if not yf_data.empty:
-                 for sym in yf_universe:
-                     try:
-                         # Check if symbol data exists in columns
-                         # yf.download sometimes normalizes symbols (e.g. BTC-USD)
-                         # We'll try direct access
-                         if sym in yf_data.columns.levels[0]:
-                             ticker_df = yf_data[sym]
-                             if not ticker_df.empty:
-                                 row = ticker_df.iloc[-1]
-                                 open_p = row['Open']
-                                 close_p = row['Close']
-                                 
-                                 # Avoid division by zero
-                                 if open_p == 0: continue
-                                 
-                                 change_pct = ((close_p - open_p) / open_p) * 100
-                                 
-                                 fallback_results.append({
-                                    "symbol": sym.replace('-', '/').replace('USD', 'USDT'), # Map back to USDT for frontend
-                                    "name": sym.split('-')[0],
-                                    "price": float(close_p),
-                                    "change": float(change_pct),
-                                    "volume": float(row['Volume'] * close_p), # Approx quote volume
-                                    "rvol": 1.0,
-                                    "sector": "Crypto",
-                                    "marketCap": 0
-                                 })
-                     except Exception as parse_err:
-                         # print(f"Parse error for {sym}: {parse_err}")
-                         continue
-             # Sanitize numeric values to avoid NaN/Infinity
-             for r in fallback_results:
-                 for k, v in r.items():
-                     if isinstance(v, float) and (v != v or v == float('inf') or v == float('-inf')):
-                         r[k] = 0.0 # Default to 0 for frontend safety
-             
-             return fallback_results
-        finally:
-            await exchange.close()
+        return await scanner_service.get()
     except Exception as e:
         print(f"Scanner Critical Error: {e}")
         return []
@@ -657,51 +773,27 @@ async def get_scanner():
 @app.get("/api/market/overview")
 async def get_market_overview():
     """
-    Market overview fetching real indices via yfinance.
+    Market overview fetching real indices via yfinance (one cached batch download).
     """
-    import yfinance as yf
-    
     indices = [
         {"symbol": "SPY", "name": "S&P 500"},
         {"symbol": "QQQ", "name": "Nasdaq"},
         {"symbol": "BTC-USD", "name": "Bitcoin"},
     ]
     
-    data = []
-    
-    # Run yfinance calls (note: yfinance is blocking, ideally run in executor)
-    # For simplicity in this async endpoint:
-    def fetch_yfinance(sym):
-        try:
-            t = yf.Ticker(sym)
-            info = t.info
-            # Calculate change if not provided directly
-            current = info.get('currentPrice') or info.get('regularMarketPrice')
-            previous = info.get('previousClose') or info.get('regularMarketPreviousClose')
-            
-            change = 0
-            change_pct = 0
-            if current and previous:
-                change = current - previous
-                change_pct = (change / previous) * 100
-                
-            return {
-                "symbol": sym,
-                "name": info.get('shortName') or sym,
-                "value": current,
-                "change": change,
-                "changePercent": change_pct
-            }
-        except:
-             return None
-
-    loop = asyncio.get_event_loop()
-    # Fetch in parallel
-    tasks = [loop.run_in_executor(None, fetch_yfinance, idx["symbol"]) for idx in indices]
-    results = await asyncio.gather(*tasks)
+    quotes = await quote_cache.get_many([idx["symbol"] for idx in indices])
     
     # Filter valid results
-    valid_indices = [r for r in results if r is not None]
+    valid_indices = [
+        {
+            "symbol": idx["symbol"],
+            "name": idx["name"],
+            "value": quotes[idx["symbol"]]["price"],
+            "change": quotes[idx["symbol"]]["change"],
+            "changePercent": quotes[idx["symbol"]]["changePercent"]
+        }
+        for idx in indices if quotes.get(idx["symbol"])
+    ]
 
     return {
         "indices": valid_indices,
@@ -789,6 +881,30 @@ async def get_behavioral_analytics():
         
     return results
 
+async def compute_analysis_report(db_symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    Full institutional report for a symbol, or None without market data.
+    """
+    # Fetch Data: only stored default-timeframe bars may feed the regime tracker
+    df = await get_recent_bars_df(db_symbol, limit=500, fallback=False)
+    track_regime = not df.empty
+    if df.empty:
+        df = await get_market_data_df(db_symbol, limit=500)
+    if df.empty:
+        return None
+    analyst = InstitutionalAnalyst(df, db_symbol.replace('/', '-'), track_regime=track_regime)
+    return await analyst.analyze()
+
+# ANALYSIS_WATCHLIST: comma-separated symbols always kept precomputed (plus the most viewed)
+analysis_scheduler = AnalysisScheduler(
+    compute_analysis_report,
+    ReportStore(os.getenv("ANALYSIS_STORE_DIR")),
+    watchlist=[s for s in os.getenv("ANALYSIS_WATCHLIST", "").split(',') if s],
+    max_symbols=int(os.getenv("ANALYSIS_MAX_SYMBOLS", "200")),
+    workers=int(os.getenv("ANALYSIS_WORKERS", "4")),
+    bar_seconds=timeframe_to_seconds(DEFAULT_TIMEFRAME),
+)
+
 @app.get("/api/analysis/{symbol}")
 async def get_institutional_analysis(symbol: str):
     """
@@ -796,17 +912,24 @@ async def get_institutional_analysis(symbol: str):
     Includes: Regime, Fundamentals, Monte Carlo Scenarios.
     """
     db_symbol = symbol.replace('-', '/')
+    live_data_manager.request(db_symbol)
     
-    # Fetch Data
-    df = await get_market_data_df(db_symbol, limit=500)
+    # Precomputed by the scheduler; a stale one is served while it's refreshed.
+    # Views only count for symbols with a report, so unknown tickers never get watched
+    entry = analysis_scheduler.store.latest(db_symbol)
+    if entry is not None:
+        analysis_scheduler.record_view(db_symbol)
+        if analysis_scheduler.is_stale(db_symbol):
+            analysis_scheduler.enqueue(db_symbol)
+        return entry["report"]
     
-    if df.empty:
+    # First view of a symbol: compute now, later bars are precomputed
+    entry = await analysis_scheduler.refresh(db_symbol)
+    if entry is None:
          raise HTTPException(status_code=404, detail=f"No market data found for {symbol}. Please verify the ticker.")
+    analysis_scheduler.record_view(db_symbol)
     
-    analyst = InstitutionalAnalyst(df, symbol)
-    report = analyst.analyze()
-    
-    return report
+    return entry["report"]
 
 @app.get("/api/trading/analytics")
 async def get_trading_analytics():
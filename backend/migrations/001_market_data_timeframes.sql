@@ -0,0 +1,99 @@
+-- Migrates the legacy NUMERIC, timeframe-less market_data table to the
+-- partitioned layout in schema.sql.
+--
+-- Usage (single transaction, safe to re-run once it has completed):
+--   psql -d stratix -v ON_ERROR_STOP=1 -1 -f migrations/001_market_data_timeframes.sql
+--
+-- The legacy table did not record bar size, so each symbol's timeframe is
+-- inferred from the most common spacing between its consecutive rows.
+
+DO $$
+BEGIN
+    -- Only run against the legacy (non-partitioned) table
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        WHERE c.relname = 'market_data' AND c.relkind = 'r'
+    ) THEN
+        ALTER TABLE market_data RENAME TO market_data_legacy;
+        ALTER INDEX IF EXISTS market_data_pkey RENAME TO market_data_legacy_pkey;
+        DROP INDEX IF EXISTS idx_market_data_symbol_timestamp;
+    END IF;
+END;
+$$;
+
+\ir ../schema.sql
+
+DO $$
+DECLARE
+    min_ts TIMESTAMP;
+    max_ts TIMESTAMP;
+    m TIMESTAMP;
+BEGIN
+    IF to_regclass('market_data_legacy') IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Make sure every month present in the legacy data has its own partition
+    SELECT min(timestamp), max(timestamp) INTO min_ts, max_ts FROM market_data_legacy;
+    IF min_ts IS NOT NULL THEN
+        FOR m IN SELECT generate_series(date_trunc('month', min_ts), date_trunc('month', max_ts), INTERVAL '1 month') LOOP
+            PERFORM ensure_market_data_partition(m);
+        END LOOP;
+    END IF;
+
+    WITH spacing AS (
+        SELECT symbol, timestamp - lag(timestamp) OVER (PARTITION BY symbol ORDER BY timestamp) AS step
+        FROM market_data_legacy
+    ),
+    inferred AS (
+        SELECT symbol,
+               CASE mode() WITHIN GROUP (ORDER BY step)
+                   WHEN INTERVAL '1 minute' THEN '1m'
+                   WHEN INTERVAL '5 minutes' THEN '5m'
+                   WHEN INTERVAL '15 minutes' THEN '15m'
+                   WHEN INTERVAL '1 hour' THEN '1h'
+                   WHEN INTERVAL '4 hours' THEN '4h'
+                   WHEN INTERVAL '1 day' THEN '1d'
+                   ELSE '1h'
+               END AS timeframe
+        FROM spacing
+        WHERE step IS NOT NULL
+        GROUP BY symbol
+    )
+    INSERT INTO market_data (symbol, timeframe, timestamp, open, high, low, close, volume)
+    SELECT l.symbol, COALESCE(i.timeframe, '1h'), l.timestamp,
+           l.open::double precision, l.high::double precision, l.low::double precision,
+           l.close::double precision, l.volume::double precision
+    FROM market_data_legacy l
+    LEFT JOIN inferred i ON i.symbol = l.symbol
+    ON CONFLICT DO NOTHING;
+
+    -- Symbols migrated as 1m feed the rollup tables
+    PERFORM refresh_market_data_rollups(symbol)
+    FROM (SELECT DISTINCT symbol FROM market_data WHERE timeframe = '1m') AS s;
+
+    DROP TABLE market_data_legacy;
+END;
+$$;
+
+-- Repairs rollups whose first refresh started at the ingest batch instead of the
+-- symbol's history (fixed in refresh_market_data_rollup): 1m rows older than the
+-- first 5m bucket were never rolled up. Those symbols are re-rolled from scratch.
+DO $$
+DECLARE
+    sym TEXT;
+BEGIN
+    FOR sym IN
+        SELECT s.symbol FROM market_data_rollup_state s
+        WHERE s.timeframe = '5m' AND EXISTS (
+            SELECT 1 FROM market_data m
+            WHERE m.symbol = s.symbol AND m.timeframe = '1m'
+              AND m.timestamp < (SELECT date_bin(INTERVAL '5 minutes', min(r.timestamp), TIMESTAMP '2000-01-01')
+                                 FROM market_data_5m r WHERE r.symbol = s.symbol)
+        )
+    LOOP
+        DELETE FROM market_data_rollup_state WHERE symbol = sym;
+        PERFORM refresh_market_data_rollups(sym);
+    END LOOP;
+END;
+$$;
@@ -1,14 +1,201 @@
--- Create the market_data table
+-- Stratix market data schema
+--
+-- Raw bars live in `market_data`, partitioned by month on timestamp and keyed
+-- by (symbol, timeframe, timestamp). Live ingest writes 1m bars; historical
+-- loaders may write native higher timeframes (e.g. 1h) directly.
+--
+-- 1m bars are rolled up incrementally into market_data_5m -> market_data_1h
+-- -> market_data_1d by refresh_market_data_rollups(), so higher-timeframe
+-- queries never aggregate raw minutes at read time. Read through the
+-- `market_bars` view, which prefers native bars over rolled-up ones.
+
+-- Raw OHLCV bars
 CREATE TABLE IF NOT EXISTS market_data (
+    symbol VARCHAR(20) NOT NULL,
+    timeframe VARCHAR(4) NOT NULL DEFAULT '1m',
+    timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    open DOUBLE PRECISION,
+    high DOUBLE PRECISION,
+    low DOUBLE PRECISION,
+    close DOUBLE PRECISION,
+    volume DOUBLE PRECISION,
+    PRIMARY KEY (symbol, timeframe, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catch-all for rows outside the pre-created monthly partitions
+CREATE TABLE IF NOT EXISTS market_data_default PARTITION OF market_data DEFAULT;
+
+-- Timestamps are appended in order, so a BRIN index covers time-range scans
+-- for a fraction of the size of a B-tree. Per-symbol lookups use the PK.
+CREATE INDEX IF NOT EXISTS idx_market_data_timestamp_brin
+    ON market_data USING BRIN (timestamp) WITH (pages_per_range = 32);
+
+-- Creates the monthly partition holding `ts` if it does not exist yet. Rows of
+-- that month already in the default partition are moved into it (attaching a
+-- range the default partition holds rows for would fail). MarketDataWriter
+-- calls this for the current and the next month as it writes.
+CREATE OR REPLACE FUNCTION ensure_market_data_partition(ts TIMESTAMP)
+RETURNS VOID AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', ts);
+    month_end TIMESTAMP := month_start + INTERVAL '1 month';
+    partition_name TEXT := 'market_data_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+    -- Concurrent writers reaching a new month create it once
+    PERFORM pg_advisory_xact_lock(hashtext(partition_name));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE market_data INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM market_data_default WHERE timestamp >= $1 AND timestamp < $2 RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        partition_name
+    ) USING month_start, month_end;
+    EXECUTE format(
+        'ALTER TABLE market_data ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pre-create partitions for the recent past and the next few months
+SELECT ensure_market_data_partition(m)
+FROM generate_series(
+    date_trunc('month', now()::timestamp) - INTERVAL '24 months',
+    date_trunc('month', now()::timestamp) + INTERVAL '3 months',
+    INTERVAL '1 month'
+) AS m;
+
+-- Rollup tables (derived from 1m bars, never written directly)
+CREATE TABLE IF NOT EXISTS market_data_5m (
     symbol VARCHAR(20) NOT NULL,
     timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
-    open NUMERIC,
-    high NUMERIC,
-    low NUMERIC,
-    close NUMERIC,
-    volume NUMERIC,
+    open DOUBLE PRECISION,
+    high DOUBLE PRECISION,
+    low DOUBLE PRECISION,
+    close DOUBLE PRECISION,
+    volume DOUBLE PRECISION,
     PRIMARY KEY (symbol, timestamp)
 );
 
--- specific index for time-series queries
-CREATE INDEX IF NOT EXISTS idx_market_data_symbol_timestamp ON market_data (symbol, timestamp DESC);
+CREATE TABLE IF NOT EXISTS market_data_1h (LIKE market_data_5m INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS market_data_1d (LIKE market_data_5m INCLUDING ALL);
+
+-- Newest source timestamp folded into each rollup, per symbol
+CREATE TABLE IF NOT EXISTS market_data_rollup_state (
+    symbol VARCHAR(20) NOT NULL,
+    timeframe VARCHAR(4) NOT NULL,
+    rolled_through TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (symbol, timeframe)
+);
+
+-- Earlier signatures (re-running this file must not leave ambiguous overloads)
+DROP FUNCTION IF EXISTS refresh_market_data_rollups(TEXT);
+DROP FUNCTION IF EXISTS refresh_market_data_rollup(TEXT, TEXT, TEXT, TEXT, INTERVAL);
+
+-- Re-aggregates one rollup level for a symbol, starting at the bucket that
+-- contains the previous watermark (that bucket may have been partial), or at
+-- the bucket containing `p_since` if that is older: the oldest row written
+-- since the last refresh, so late and backfilled bars are rolled up too.
+-- A symbol's first refresh has no watermark and rolls up all of its history.
+CREATE OR REPLACE FUNCTION refresh_market_data_rollup(
+    p_symbol TEXT, p_source TEXT, p_source_filter TEXT, p_target TEXT, p_bucket INTERVAL,
+    p_since TIMESTAMP DEFAULT NULL
+) RETURNS VOID AS $$
+DECLARE
+    watermark TIMESTAMP;
+    bucket_start TIMESTAMP;
+    source_max TIMESTAMP;
+BEGIN
+    SELECT rolled_through INTO watermark
+    FROM market_data_rollup_state
+    WHERE symbol = p_symbol AND timeframe = p_target;
+
+    bucket_start := COALESCE(
+        date_bin(p_bucket,
+                 CASE WHEN watermark IS NULL THEN NULL ELSE LEAST(watermark, p_since) END,
+                 TIMESTAMP '2000-01-01'),
+        TIMESTAMP '-infinity'
+    );
+
+    EXECUTE format(
+        'INSERT INTO %I (symbol, timestamp, open, high, low, close, volume)
+         SELECT symbol,
+                date_bin($3, timestamp, TIMESTAMP ''2000-01-01'') AS bucket,
+                (array_agg(open ORDER BY timestamp ASC))[1],
+                max(high),
+                min(low),
+                (array_agg(close ORDER BY timestamp DESC))[1],
+                sum(volume)
+         FROM %I
+         WHERE symbol = $1 AND timestamp >= $2 %s
+         GROUP BY symbol, bucket
+         ON CONFLICT (symbol, timestamp) DO UPDATE SET
+             open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+             close = EXCLUDED.close, volume = EXCLUDED.volume',
+        'market_data_' || p_target, p_source, p_source_filter
+    ) USING p_symbol, bucket_start, p_bucket;
+
+    EXECUTE format(
+        'SELECT max(timestamp) FROM %I WHERE symbol = $1 %s', p_source, p_source_filter
+    ) INTO source_max USING p_symbol;
+
+    IF source_max IS NOT NULL THEN
+        INSERT INTO market_data_rollup_state (symbol, timeframe, rolled_through)
+        VALUES (p_symbol, p_target, source_max)
+        ON CONFLICT (symbol, timeframe) DO UPDATE SET
+            rolled_through = GREATEST(market_data_rollup_state.rolled_through, EXCLUDED.rolled_through);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cascades 1m -> 5m -> 1h -> 1d for a symbol. Call after each ingest batch
+-- with the oldest timestamp the batch wrote for the symbol.
+CREATE OR REPLACE FUNCTION refresh_market_data_rollups(p_symbol TEXT, p_since TIMESTAMP DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM refresh_market_data_rollup(p_symbol, 'market_data', 'AND timeframe = ''1m''', '5m', INTERVAL '5 minutes', p_since);
+    PERFORM refresh_market_data_rollup(p_symbol, 'market_data_5m', '', '1h', INTERVAL '1 hour', p_since);
+    PERFORM refresh_market_data_rollup(p_symbol, 'market_data_1h', '', '1d', INTERVAL '1 day', p_since);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Unified read path: native bars win over rolled-up bars for the same slot
+CREATE OR REPLACE VIEW market_bars AS
+SELECT DISTINCT ON (symbol, timeframe, timestamp)
+    symbol, timeframe, timestamp, open, high, low, close, volume
+FROM (
+    SELECT symbol, timeframe, timestamp, open, high, low, close, volume, 0 AS priority FROM market_data
+    UNION ALL
+    SELECT symbol, '5m', timestamp, open, high, low, close, volume, 1 FROM market_data_5m
+    UNION ALL
+    SELECT symbol, '1h', timestamp, open, high, low, close, volume, 1 FROM market_data_1h
+    UNION ALL
+    SELECT symbol, '1d', timestamp, open, high, low, close, volume, 1 FROM market_data_1d
+) AS bars
+ORDER BY symbol, timeframe, timestamp, priority;
+
+-- Fundamentals snapshot per symbol (yfinance .info, parsed), refreshed in the
+-- background by data/fundamentals_store.py once fetched_at is older than a day.
+-- `valuation` is classified at refresh time so reads never recompute it.
+-- A failed refresh keeps the row and bumps attempted_at/failures, which back off its retries.
+CREATE TABLE IF NOT EXISTS fundamentals (
+    symbol VARCHAR(20) PRIMARY KEY,
+    data JSONB NOT NULL,
+    valuation VARCHAR(20),
+    fetched_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+    attempted_at TIMESTAMP WITHOUT TIME ZONE, -- Last refresh attempt, successful or not
+    failures INTEGER NOT NULL DEFAULT 0       -- Consecutive failed refreshes
+);
+
+ALTER TABLE fundamentals ADD COLUMN IF NOT EXISTS attempted_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE fundamentals ADD COLUMN IF NOT EXISTS failures INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_fundamentals_fetched_at ON fundamentals (fetched_at);
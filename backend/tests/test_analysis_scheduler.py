@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+
+from analysis.scheduler import AnalysisScheduler, ReportStore
+
+
+def test_store_keeps_the_last_versions():
+    store = ReportStore(history=3)
+
+    async def scenario():
+        for i in range(4):
+            await store.put("BTC/USDT", {"n": i}, bar_open=3600.0 * i)
+
+    asyncio.run(scenario())
+    assert [entry["version"] for entry in store.versions("BTC/USDT")] == [2, 3, 4]
+    assert store.latest("BTC/USDT")["report"] == {"n": 3}
+    assert store.latest("ETH/USDT") is None and len(store) == 1
+
+
+def test_store_writes_atomically_and_reloads(tmp_path):
+    store = ReportStore(str(tmp_path))
+
+    async def scenario():
+        await store.put("BTC/USDT", {"price": np.float64(101.5), "regime": "Bull"}, bar_open=7200.0)
+        return await store.put("BTC/USDT", {"price": np.float64(102.0), "regime": "Bull"}, bar_open=10800.0)
+
+    entry = asyncio.run(scenario())
+    (tmp_path / "broken.json").write_text("{not json")
+    assert sorted(os.listdir(tmp_path)) == ["BTC-USDT.json", "broken.json"] # No .tmp left behind
+
+    reloaded = ReportStore(str(tmp_path))
+    reloaded.load()
+    assert reloaded.latest("BTC/USDT") == json.loads(json.dumps(entry))
+    assert reloaded.latest("BTC/USDT")["version"] == 2 and len(reloaded) == 1
+
+
+def test_workers_drain_the_most_viewed_first():
+    computed = []
+
+    async def compute(symbol):
+        computed.append(symbol)
+        return {"symbol": symbol}
+
+    scheduler = AnalysisScheduler(compute, ReportStore(), watchlist=["CONF/USDT"], workers=1)
+    for symbol, views in (("A/USDT", 1), ("B/USDT", 5), ("C/USDT", 3)):
+        for _ in range(views):
+            scheduler.record_view(symbol)
+
+    async def scenario():
+        for symbol in ("A/USDT", "CONF/USDT", "B/USDT", "C/USDT", "B/USDT"): # B only once
+            scheduler.enqueue(symbol)
+        worker = asyncio.create_task(scheduler._worker())
+        await scheduler._queue.join()
+        scheduler.sweep() # Everything is current
+        scheduler.on_bar_close("X/USDT", {}) # Not watched
+        pending = scheduler._queue.qsize()
+        worker.cancel()
+        return pending
+
+    assert asyncio.run(scenario()) == 0
+    assert computed == ["B/USDT", "C/USDT", "A/USDT", "CONF/USDT"]
+    assert not any(scheduler.is_stale(s) for s in computed)
+    assert scheduler.get_stats()["computed"] == 4
+
+
+def test_symbols_without_data_stop_being_watched():
+    async def compute(symbol):
+        return None if symbol == "NOPE/USDT" else {"symbol": symbol}
+
+    scheduler = AnalysisScheduler(compute, ReportStore())
+    scheduler.record_view("NOPE/USDT")
+    scheduler.record_view("BTC/USDT")
+
+    async def scenario():
+        return await scheduler.refresh("NOPE/USDT"), await scheduler.refresh("BTC/USDT")
+
+    missing, found = asyncio.run(scenario())
+    assert missing is None and found["version"] == 1
+    assert scheduler.watchlist() == ["BTC/USDT"]
+    assert scheduler.stats["empty"] == 1
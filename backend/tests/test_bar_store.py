@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from data.bar_store import HotBarStore
+from data.candles import Candle
+
+HOUR_MS = 3_600_000
+
+
+def stored_bars(n: int, end_ms: int) -> pd.DataFrame:
+    timestamps = end_ms - HOUR_MS * np.arange(n)[::-1]
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(timestamps, unit="ms"),
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": np.full(n, 5.0),
+    })
+
+
+def test_symbol_with_live_bars_is_still_seeded_once():
+    store = HotBarStore(capacity=1000)
+    now = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+    # Three live bars built from ticks before anyone read the symbol
+    for i in range(3):
+        store.update("BTC/USDT", now + i * HOUR_MS + 5, 111.0 + i)
+    calls = []
+
+    async def loader(symbol, n):
+        calls.append((symbol, n))
+        return stored_bars(600, now) # Ends at the first live bar
+
+    async def read(limit):
+        return await store.get_or_load("BTC/USDT", limit, loader)
+
+    df = asyncio.run(read(500))
+    assert len(df) == 500
+    assert calls == [("BTC/USDT", 1000)]
+    # The overlapping bar keeps its stored volume; newer live bars are kept
+    assert pd.Timestamp(df["timestamp"].iloc[-1]).value // 10**6 == now + 2 * HOUR_MS
+    assert store.get_bars("BTC/USDT", 3)["volume"].iloc[0] == 5.0
+
+    asyncio.run(read(200))
+    assert len(calls) == 1
+
+    store.drop("BTC/USDT")
+    asyncio.run(read(10))
+    assert len(calls) == 2
+
+
+def test_bar_is_reported_closed_with_its_final_minute():
+    store = HotBarStore(close_grace_seconds=5.0)
+    closed = []
+    store.register_bar_close_callback(lambda symbol, bar: closed.append((symbol, bar["timestamp"], bar["volume"])))
+    start = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+    for minute in range(59):
+        store.on_candle(Candle("BTC/USDT", start + minute * 60_000, 100.0, 101.0, 99.0, 100.0, 1.0))
+    store.update("BTC/USDT", start + HOUR_MS + 200, 100.5) # Next bar's first tick
+    assert closed == []
+    store.on_candle(Candle("BTC/USDT", start + 59 * 60_000, 100.0, 101.0, 99.0, 100.0, 1.0))
+    assert closed == [("BTC/USDT", start, 60.0)] # Reported once, with all 60 minutes of volume
+
+    # No final candle: reported once the grace period of feed time has passed
+    store.update("BTC/USDT", start + 2 * HOUR_MS + 100, 101.0)
+    store.update("BTC/USDT", start + 2 * HOUR_MS + 4_000, 101.0)
+    assert len(closed) == 1
+    store.update("BTC/USDT", start + 2 * HOUR_MS + 5_000, 101.0)
+    assert closed[-1][1] == start + HOUR_MS and len(closed) == 2
+
+    # Complete bars (and candle-driven rolls) report the bar they supersede right away
+    store.on_bar("ETH/USDT", start, 10.0, 11.0, 9.0, 10.5, 7.0)
+    store.on_bar("ETH/USDT", start + HOUR_MS, 10.5, 11.0, 9.0, 10.0, 3.0)
+    assert closed[-1] == ("ETH/USDT", start, 7.0)
@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import data.candles as candles
+from data.candles import Candle, CandleAggregator, MarketDataWriter
+from data.exchange_sim import ExchangeSimulator
+
+
+class FakeConnection:
+    """
+    Records upserted rows; each statement takes `delay` seconds.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.rows = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(self.delay)
+        if 'INSERT INTO market_data' in query:
+            self.rows.extend(zip(*args))
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def candle(i: int) -> Candle:
+    return Candle("BTC/USDT", 1_700_000_000_000 + i * 60_000, 1.0, 2.0, 0.5, 1.5, 10.0, closed=True)
+
+
+def test_stop_writes_the_batch_in_flight(monkeypatch):
+    conn = FakeConnection(delay=0.05)
+
+    async def get_pool():
+        return FakePool(conn)
+
+    monkeypatch.setattr(candles, "get_pool", get_pool)
+
+    async def scenario():
+        writer = MarketDataWriter(batch_size=10, flush_interval=60)
+        writer.start()
+        for i in range(10):
+            writer.add(candle(i))
+        await asyncio.sleep(0.01) # The loop now holds the batch mid-write
+        assert writer.buffer == []
+        for i in range(10, 13):
+            writer.add(candle(i))
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert len(conn.rows) == 13
+    assert writer.rows_written == 13 and writer.buffer == []
+
+
+def test_cancelled_write_keeps_its_rows(monkeypatch):
+    conn = FakeConnection(delay=1.0)
+
+    async def get_pool():
+        return FakePool(conn)
+
+    monkeypatch.setattr(candles, "get_pool", get_pool)
+
+    async def scenario():
+        writer = MarketDataWriter(batch_size=5, flush_interval=60, stop_timeout=0.05)
+        writer.start()
+        for i in range(5):
+            writer.add(candle(i))
+        await asyncio.sleep(0.01)
+        conn.delay = 0.0 # The final flush after the timeout goes through
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.rows_written == 5
+    assert len(conn.rows) == 5
+
+
+# --- Reconnect backfill ordering ---
+
+MINUTE = 60_000
+T0 = 1_700_000_040_000 - 1_700_000_040_000 % MINUTE
+
+
+def kline(t: int, closed: bool) -> dict:
+    return {"k": {"t": t, "o": "1", "h": "2", "l": "0.5", "c": "1.5", "v": "3", "x": closed}}
+
+
+def backfill_rows(n: int) -> list:
+    # The stand-in's REST klines for the gap: [open time, o, h, l, c, v, ...]
+    simulator = ExchangeSimulator(["BTCUSDT"])
+    return [simulator.historic_bar("BTCUSDT", T0 + i * MINUTE)[:6] for i in range(n)]
+
+
+def outage(order: str) -> list:
+    """
+    Bar 0 is forming when the connection drops; the connection is back during bar 5.
+    """
+    aggregator = CandleAggregator()
+    closed = []
+    aggregator.register_callback(lambda candle: closed.append(candle.timestamp))
+    aggregator.on_market_event('kline', "BTC/USDT", kline(T0 - MINUTE, True))
+    aggregator.on_market_event('kline', "BTC/USDT", kline(T0, False)) # Never gets x=true
+    backfill = {'rows': backfill_rows(6), 'until': T0 + 5 * MINUTE + 30_000}
+    live = kline(T0 + 5 * MINUTE, False)
+    if order == 'backfill_first':
+        aggregator.on_market_event('backfill', "BTC/USDT", backfill)
+        aggregator.on_market_event('kline', "BTC/USDT", live)
+    else:
+        aggregator.on_market_event('kline', "BTC/USDT", live)
+        aggregator.on_market_event('backfill', "BTC/USDT", backfill)
+    aggregator.on_market_event('kline', "BTC/USDT", kline(T0 + 5 * MINUTE, True))
+    return closed
+
+
+def test_backfill_closes_the_gap_in_either_order():
+    expected = [T0 + i * MINUTE for i in range(-1, 6)]
+    assert outage('backfill_first') == expected
+    assert outage('live_first') == expected
+
+
+def test_bars_are_closed_once():
+    aggregator = CandleAggregator()
+    closed = []
+    aggregator.register_callback(lambda candle: closed.append(candle.timestamp))
+    aggregator.on_market_event('kline', "BTC/USDT", kline(T0 + MINUTE, True))
+    aggregator.on_market_event('backfill', "BTC/USDT", {'rows': backfill_rows(3), 'until': T0 + 3 * MINUTE})
+    aggregator.on_market_event('kline', "BTC/USDT", kline(T0 + 2 * MINUTE, True))
+    assert closed == [T0 + MINUTE, T0, T0 + 2 * MINUTE]
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from analysis.cross_asset import CrossAssetAnalytics, RollingCrossStats
+
+HOUR_MS = 3_600_000
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "DOGE/USDT"]
+
+
+def hourly_closes(n: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(9)
+    market = rng.normal(0, 0.01, n)
+    returns = np.column_stack([market * beta + rng.normal(0, 0.005, n) for beta in (1.0, 1.3, 1.8, 0.4)])
+    index = pd.date_range("2026-01-01", periods=n, freq="h")
+    closes = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=index, columns=SYMBOLS)
+    closes.iloc[rng.choice(n, 40, replace=False), 2] = np.nan # SOL misses some bars
+    closes.iloc[300:310, 3] = np.nan                           # DOGE is down for a while
+    return closes.drop(index[[250, 350, 351]])                 # Nobody reports these bars
+
+
+def expected(closes: pd.DataFrame, window: int, min_periods: int):
+    full = closes.reindex(pd.date_range(closes.index[0], closes.index[-1], freq="h"))
+    returns = np.log(full).diff().iloc[-window:]
+    return returns.corr(min_periods=min_periods), returns.cov(min_periods=min_periods)
+
+
+def assert_matches(analytics: CrossAssetAnalytics, closes: pd.DataFrame):
+    corr, cov = expected(closes, analytics.window, analytics.min_periods)
+    m = analytics.stats.matrices(analytics.min_periods)
+    order = [analytics.index[s] for s in SYMBOLS]
+    np.testing.assert_allclose(m["corr"][np.ix_(order, order)], corr.to_numpy(), rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(m["cov"][np.ix_(order, order)], cov.to_numpy(), rtol=1e-7, atol=1e-12)
+
+
+def test_rolling_correlation_matches_pandas_across_gaps():
+    closes = hourly_closes()
+    analytics = CrossAssetAnalytics(SYMBOLS, window=168)
+    analytics.seed(closes)
+    assert analytics.stats.size == 168
+    assert_matches(analytics, closes)
+
+
+def test_live_bars_continue_the_seeded_window():
+    closes = hourly_closes()
+    analytics = CrossAssetAnalytics(SYMBOLS, window=168)
+    analytics.seed(closes.iloc[:320])
+    for ts, row in closes.iloc[320:].iterrows():
+        open_ms = int(ts.timestamp() * 1000)
+        for symbol, close in row.items():
+            if np.isfinite(close):
+                analytics.on_bar_close(symbol, {"timestamp": open_ms, "close": close})
+        assert analytics.flush(now_ms=open_ms + HOUR_MS + 60_000)
+    assert_matches(analytics, closes)
+
+
+def test_stats_shed_removed_bars():
+    rng = np.random.default_rng(4)
+    rows = rng.normal(size=(50, 3))
+    rows[rng.random(rows.shape) < 0.1] = np.nan
+    stats = RollingCrossStats(3, 10)
+    for row in rows[:23]: # Not a multiple of the window: no rebuild since the last drop
+        stats.push(row)
+    reference = pd.DataFrame(rows[13:23]).cov(min_periods=2).to_numpy()
+    np.testing.assert_allclose(stats.matrices(min_periods=2)["cov"], reference, rtol=1e-9)
+
+
+def test_updater_publishes_each_flush_off_the_request_path():
+    closes = hourly_closes()
+    analytics = CrossAssetAnalytics(SYMBOLS, window=168)
+    analytics.seed(closes.iloc[:320])
+    analytics.publish()
+    published = analytics.payload()
+
+    ts = closes.index[320]
+    open_ms = int(ts.timestamp() * 1000)
+    for symbol, close in closes.iloc[320].items():
+        if np.isfinite(close):
+            analytics.on_bar_close(symbol, {"timestamp": open_ms, "close": close})
+    assert analytics.flush(now_ms=open_ms + HOUR_MS + 60_000)
+    assert analytics.payload() is published # Readers keep the last snapshot until the next publish
+
+    analytics.publish()
+    assert json.loads(analytics.payload()) == analytics.snapshot()
+    assert analytics.snapshot()["version"] == 1 and analytics.snapshot()["as_of"] == ts.isoformat()
+    assert analytics.get_stats()["last_publish_seconds"] is not None
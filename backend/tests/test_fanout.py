@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from data.fanout import FanOut, Subscriber
+
+
+def deliver(policy: str, events, maxsize: int = 3):
+    received = []
+
+    async def scenario():
+        fanout = FanOut()
+        subscriber = fanout.subscribe(lambda value: received.append(value), policy, maxsize)
+        for key, value in events:
+            fanout.publish(key, value) # Consumer task not started yet: the queue fills up
+        fanout.start()
+        await asyncio.sleep(0.01)
+        fanout.stop()
+        return subscriber
+
+    return received, asyncio.run(scenario())
+
+
+def test_drop_newest_refuses_events_once_full():
+    received, subscriber = deliver('drop_newest', [('BTC', i) for i in range(5)])
+    assert received == [0, 1, 2]
+    assert subscriber.dropped == 2
+
+
+def test_drop_oldest_keeps_the_newest():
+    received, subscriber = deliver('drop_oldest', [('BTC', i) for i in range(5)])
+    assert received == [2, 3, 4]
+    assert subscriber.dropped == 2
+
+
+def test_conflate_keeps_latest_per_key():
+    received, subscriber = deliver('conflate', [('BTC', 1), ('ETH', 2), ('BTC', 3)])
+    assert received == [3, 2]
+    assert subscriber.conflated == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Subscriber(print, policy='block')
+
+
+def test_inline_sees_every_event_during_publish():
+    received, subscriber = deliver('inline', [('BTC', i) for i in range(5)])
+    assert received == [0, 1, 2, 3, 4] # Despite maxsize 3 and no consumer task
+    assert (subscriber.delivered, subscriber.dropped, len(subscriber)) == (5, 0, 0)
+
+
+def test_inline_isolates_failures_and_rejects_coroutines():
+    def fail(value):
+        raise RuntimeError("boom")
+
+    fanout = FanOut()
+    failing = fanout.subscribe(fail, 'inline')
+    received = []
+    fanout.subscribe(received.append, 'inline')
+    fanout.publish('BTC', 1)
+    assert received == [1] and failing.errors == 1
+
+    async def handler(value):
+        pass
+
+    with pytest.raises(ValueError):
+        Subscriber(handler, policy='inline')
@@ -0,0 +1,46 @@
+import asyncio
+import json
+import math
+import urllib.request
+
+from data import feed_benchmark
+from data.exchange_sim import ExchangeSimulator
+
+
+def test_benchmark_receives_the_target_rate():
+    """
+    A short, low-rate run of the end-to-end benchmark: the simulator process streams,
+    the client keeps up and every percentile is measured.
+    """
+    result = asyncio.run(feed_benchmark.run_once(500, symbols=10, duration=1.0, warmup=0.5))
+    assert result["reconnects"] == 0
+    assert 0.8 * 500 < result["received_rate"] < 1.2 * 500
+    assert result["delivered_rate"] > 0
+    assert result["dropped"] == 0
+    for key in ("to_latest_prices_ms", "to_callback_ms"):
+        percentiles = result[key]
+        assert all(math.isfinite(v) for v in percentiles.values())
+        assert percentiles["p50"] <= percentiles["p99"] <= percentiles["max"]
+
+
+def test_simulator_serves_the_same_klines_twice():
+    """
+    Backfills rely on /api/v3/klines being deterministic and limited to past bars.
+    """
+    async def scenario():
+        simulator = ExchangeSimulator(["BTCUSDT"])
+        await simulator.start()
+        try:
+            url = f"{simulator.rest_url}/api/v3/klines?symbol=BTCUSDT&limit=30"
+            fetch = lambda: json.loads(urllib.request.urlopen(url, timeout=5).read())
+            return await asyncio.to_thread(fetch), await asyncio.to_thread(fetch)
+        finally:
+            await simulator.stop()
+
+    first, second = asyncio.run(scenario())
+    assert len(first) == 30
+    assert [row[0] for row in first] == list(range(first[0][0], first[0][0] + 30 * 60_000, 60_000))
+    # The same bars, unless a minute rolled over between the two calls
+    overlap = {row[0]: row for row in first}
+    assert all(overlap[row[0]] == row for row in second if row[0] in overlap)
+    assert len(overlap.keys() & {row[0] for row in second}) >= 29
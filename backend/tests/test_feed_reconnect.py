@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+import urllib.request
+
+import pytest
+
+from data.exchange_sim import ExchangeSimulator
+from data.live_feed import LiveDataManager
+
+SPEEDUP = 600 # One simulated minute every 0.1s
+
+
+@pytest.mark.parametrize("order", ["live_first", "backfill_first"])
+def test_reconnect_backfill_leaves_no_gap(monkeypatch, order):
+    """
+    Streams 1m klines from the local stand-in, drops the connection for a few simulated
+    minutes and checks that live and backfilled closes together cover every minute once.
+    With backfill_first, live events reaching the aggregator after the drop are held
+    back until the symbol's backfill has been applied.
+    """
+    start_wall, start_mono = time.time(), time.monotonic()
+    monkeypatch.setattr(time, "time", lambda: start_wall + (time.monotonic() - start_mono) * SPEEDUP)
+
+    async def scenario():
+        simulator = ExchangeSimulator(["BTCUSDT", "ETHUSDT"], rate=4000)
+        await simulator.start()
+
+        async def fetch_klines(symbol, since_ms, until_ms):
+            # The stand-in's REST endpoint, as the ccxt fetcher would call it
+            url = (f"{simulator.rest_url}/api/v3/klines?symbol={symbol.replace('/', '')}"
+                   f"&startTime={since_ms}&endTime={until_ms - 1}&limit=1000")
+            body = await asyncio.to_thread(lambda: urllib.request.urlopen(url, timeout=5).read())
+            return [[row[0], *map(float, row[1:6])] for row in json.loads(body)]
+
+        manager = LiveDataManager(["BTC/USDT", "ETH/USDT"], streams=['kline_1m'], ws_url=simulator.ws_url)
+        manager.backfiller.fetcher = fetch_klines
+        manager.writer.start = lambda: None # No database here
+
+        async def no_writes():
+            pass
+
+        manager.writer.stop = no_writes
+        for shard in manager.shards:
+            # Exactly 5 simulated minutes offline, no jitter
+            shard._backoff_delay = lambda attempt: 0.5
+        closed = {"BTC/USDT": [], "ETH/USDT": []}
+        manager.candles.register_callback(lambda candle: closed[candle.symbol].append(candle.timestamp))
+
+        holding, held = set(), []
+        deliver = manager.candles.on_market_event
+
+        def gated(event_type, symbol, payload):
+            if event_type == 'backfill':
+                deliver(event_type, symbol, payload)
+                holding.discard(symbol)
+                for args in [a for a in held if a[1] == symbol]:
+                    held.remove(args)
+                    deliver(*args)
+            elif symbol in holding:
+                held.append((event_type, symbol, payload))
+            else:
+                deliver(event_type, symbol, payload)
+
+        manager.market_fanout.subscribers[0].callback = gated
+
+        task = asyncio.create_task(manager.start())
+        try:
+            await asyncio.sleep(0.5)
+            # Drop mid-minute so the reconnect isn't racing a bar boundary: the stand-in starts
+            # a new connection's stream a few simulated seconds late, and a bar it never
+            # generated would get no final update
+            await asyncio.sleep(((90_000 - time.time() * 1000 % 60_000) % 60_000) / 1000 / SPEEDUP)
+            if order == "backfill_first":
+                holding.update(closed)
+            simulator.disconnect_all()
+            await asyncio.sleep(1.5)
+            assert sum(shard.reconnects for shard in manager.shards) == 1
+        finally:
+            # Stand-in first, while the clients still read its close frames
+            await simulator.stop()
+            await manager.stop()
+            task.cancel()
+        return closed, manager, held
+
+    closed, manager, held = asyncio.run(scenario())
+    assert manager.backfiller.bars_recovered > 0
+    assert not held
+    for symbol, timestamps in closed.items():
+        assert len(timestamps) == len(set(timestamps)), f"{symbol} closed a bar twice"
+        ordered = sorted(timestamps)
+        assert ordered == list(range(ordered[0], ordered[-1] + 60_000, 60_000)), f"{symbol} has a gap"
+        assert len(ordered) >= 10
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+
+import data.fundamentals_store as fundamentals_store
+from data.fundamentals_store import FundamentalsStore
+
+
+class FakeConnection:
+    """
+    Serves one stored row per symbol and records writes.
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.upserted = []
+        self.failed = []
+
+    async def fetchrow(self, query, symbol):
+        return self.rows.get(symbol)
+
+    async def fetch(self, query, *args):
+        return []
+
+    async def executemany(self, query, args):
+        self.upserted.extend(symbol for symbol, *_ in args)
+
+    async def execute(self, query, symbols):
+        assert 'failures = failures + 1' in query
+        self.failed.extend(symbols)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+
+    async def get_pool():
+        return FakePool(conn)
+
+    monkeypatch.setattr(fundamentals_store, "get_pool", get_pool)
+    return conn
+
+
+async def fetcher(symbol):
+    if symbol.startswith("BAD"):
+        raise ConnectionError("upstream down")
+    return {"symbol": symbol, "valuation_assessment": "Fair"}
+
+
+def stored(age: float, failures: int = 0, attempted_ago: float = 0.0) -> dict:
+    now = time.time()
+    return {"data": json.dumps({"symbol": "X"}), "fetched_at": now - age,
+            "attempted_at": now - attempted_ago if failures else now - age, "failures": failures}
+
+
+def test_failed_refreshes_are_recorded_and_leave_the_queue(conn):
+    store = FundamentalsStore(fetcher)
+    store._wanted.update({"AAPL", "BAD1", "BAD2"})
+    refreshed = asyncio.run(store.refresh_stale())
+    assert refreshed == 1
+    assert conn.upserted == ["AAPL"]
+    assert sorted(conn.failed) == ["BAD1", "BAD2"]
+    assert not store._wanted # Failed ones return through the table after their backoff
+    assert store.stats["failed"] == 2
+
+
+def test_reads_queue_stale_rows_unless_backing_off(conn):
+    store = FundamentalsStore(fetcher, retry_after=3600.0)
+    conn.rows = {
+        "FRESH": stored(age=60),
+        "STALE": stored(age=2 * 86400),
+        "RETRY_DUE": stored(age=2 * 86400, failures=2, attempted_ago=3 * 3600),   # Retried after 2h
+        "BACKING_OFF": stored(age=2 * 86400, failures=3, attempted_ago=3 * 3600), # Not before 4h
+    }
+
+    async def read_all():
+        for symbol in conn.rows:
+            await store.get(symbol)
+
+    asyncio.run(read_all())
+    assert store._wanted == {"STALE", "RETRY_DUE"}
+
+
+def test_backoff_doubles_up_to_the_cap():
+    store = FundamentalsStore(fetcher, retry_after=60.0, max_backoff=600.0)
+    assert [store._backoff(n) for n in (1, 2, 3, 4, 5, 1000)] == [60.0, 120.0, 240.0, 480.0, 600.0, 600.0]
+
+
+def test_stop_waits_for_the_refresher(conn):
+    store = FundamentalsStore(fetcher, refresh_interval=60.0)
+
+    async def scenario():
+        store.start()
+        task = store._task
+        await asyncio.sleep(0.01)
+        await store.stop()
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.done() and store._task is None
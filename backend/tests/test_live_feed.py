@@ -0,0 +1,57 @@
+import asyncio
+
+from data.live_feed import LiveDataManager
+
+
+def test_pinned_universe_survives_idle_eviction():
+    async def scenario():
+        manager = LiveDataManager(["BTC/USDT"], idle_ttl=0.0)
+        await manager.pin(["ETH/USDT", "SOL/USDT", "AAPL"])
+        await manager.subscribe(["DOGE/USDT"]) # As request() does for an API client
+        before = set(manager.symbols)
+        await manager._evict_idle()
+        return before, set(manager.symbols)
+
+    before, after = asyncio.run(scenario())
+    assert before == {"BTC/USDT", "ETH/USDT", "SOL/USDT", "DOGE/USDT"} # Only USDT pairs stream
+    assert after == {"BTC/USDT", "ETH/USDT", "SOL/USDT"}
+
+
+def test_position_pins_are_counted():
+    async def scenario():
+        manager = LiveDataManager(["BTC/USDT"], idle_ttl=0.0)
+        manager.running = True
+        await manager.pin(["ETH/USDT"])
+        manager.request("SOL/USDT", pin=True)
+        manager.request("SOL/USDT", pin=True) # Two positions' worth
+        manager.request("ETH/USDT", pin=True)
+        manager.unpin(["SOL/USDT", "ETH/USDT"])
+        await asyncio.sleep(0)
+        await manager._evict_idle()
+        held = set(manager.symbols)
+        manager.unpin(["SOL/USDT", "ETH/USDT"])
+        await manager._evict_idle()
+        return held, set(manager.symbols)
+
+    held, after = asyncio.run(scenario())
+    assert held == {"BTC/USDT", "ETH/USDT", "SOL/USDT"}
+    assert after == {"BTC/USDT"} # Released symbols go once idle
+
+
+def test_requests_for_unlisted_symbols_are_rejected():
+    async def listed():
+        return {"BTC/USDT", "ETH/USDT"}
+
+    async def scenario():
+        manager = LiveDataManager(["BTC/USDT"], market_loader=listed)
+        manager.running = True
+        manager.request("JUNK/USDT") # Before the markets load only the suffix is checked
+        await manager._load_markets()
+        for symbol in ("XYZ123/USDT", "ETH/USDT", "NOPE/USDT"):
+            manager.request(symbol)
+        await asyncio.sleep(0)
+        return manager
+
+    manager = asyncio.run(scenario())
+    assert set(manager.symbols) == {"BTC/USDT", "JUNK/USDT", "ETH/USDT"}
+    assert manager.rejected_requests == 2
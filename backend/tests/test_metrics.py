@@ -0,0 +1,35 @@
+from data.metrics import DISPATCH_TO_DONE, FeedMetrics
+
+
+def test_render_exposes_histograms_and_escapes_labels():
+    metrics = FeedMetrics()
+    metrics.observe_message("BTC/USDT", "ticker", 1_000_000.0, 1_000.002, 5.0, 5.0001)
+    metrics.observe_message("BTC/USDT", "ticker", None, 1_000.0, 6.0, 6.0)
+    metrics.observe_delivery('paper "engine"\\\n', "BTC/USDT", 0.3)
+    metrics.on_reconnect(stale=True)
+    text = metrics.render()
+    lines = text.splitlines()
+
+    assert text.endswith('\n')
+    assert 'feed_messages_total{symbol="BTC/USDT",type="ticker"} 2' in lines
+    assert 'feed_latency_seconds_bucket{stage="exchange_to_receive",symbol="BTC/USDT",le="0.0025"} 1' in lines
+    assert 'feed_latency_seconds_count{stage="receive_to_dispatch",symbol="BTC/USDT"} 2' in lines
+    assert 'feed_consumer_latency_seconds_bucket{consumer="paper \\"engine\\"\\\\\\n",le="0.25"} 0' in lines
+    assert 'feed_consumer_latency_seconds_bucket{consumer="paper \\"engine\\"\\\\\\n",le="+Inf"} 1' in lines
+    assert 'feed_stale_disconnects_total 1' in lines
+    for line in lines: # Every sample is `name{labels} value` or `name value`
+        assert line.startswith('#') or len(line.rsplit(' ', 1)) == 2
+
+
+def test_unsubscribed_symbols_drop_their_series():
+    metrics = FeedMetrics()
+    for symbol in ("BTC/USDT", "DOGE/USDT"):
+        metrics.observe_message(symbol, "ticker", 1_000_000.0, 1_000.0, 5.0, 5.0)
+        metrics.observe_message(symbol, "kline", 1_000_000.0, 1_000.0, 5.0, 5.0)
+        metrics.observe_delivery("hot_store", symbol, 0.001)
+    metrics.drop_symbol("DOGE/USDT")
+
+    assert "DOGE" not in metrics.render()
+    assert set(metrics.messages) == {("BTC/USDT", "ticker"), ("BTC/USDT", "kline")}
+    assert list(metrics.latency[DISPATCH_TO_DONE]) == ["BTC/USDT"]
+    assert metrics.consumer_latency["hot_store"].count == 2 # Per consumer, not per symbol
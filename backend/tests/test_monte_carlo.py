@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.monte_carlo import MonteCarloSimulator, StreamingQuantiles
+
+
+def price_history(n: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    return pd.DataFrame({"close": 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, n)))})
+
+
+@pytest.mark.parametrize("q", [0.01, 0.05, 0.5, 0.95, 0.99])
+def test_streaming_quantiles_match_numpy(q):
+    rng = np.random.default_rng(5)
+    values = rng.normal(0.0, 1.0, 200_000)
+    estimate = StreamingQuantiles(-8.0, 8.0)
+    for chunk in np.array_split(values, 13):
+        estimate.update(chunk)
+    bin_width = 16.0 / 8192
+    assert estimate.quantile(q) == pytest.approx(np.quantile(values, q), abs=2 * bin_width)
+
+
+def test_merged_estimates_equal_one_estimate():
+    rng = np.random.default_rng(6)
+    a, b = rng.normal(size=10_000), rng.normal(size=7_000)
+    whole, left, right = (StreamingQuantiles(-5.0, 5.0) for _ in range(3))
+    whole.update(np.concatenate([a, b]))
+    left.update(a)
+    right.update(b)
+    left.merge(right)
+    assert np.array_equal(left.counts, whole.counts)
+    assert np.isnan(StreamingQuantiles(0.0, 1.0).quantile(0.5))
+
+
+def test_chunked_simulation_agrees_with_exact_percentiles():
+    """
+    The same paths summarised exactly (one chunk) and from merged histograms (many chunks).
+    """
+    df = price_history()
+    exact = MonteCarloSimulator.run_simulation(df, 30, 20_000, rng=np.random.default_rng(1), chunk_size=20_000)
+    chunked = MonteCarloSimulator.run_simulation(df, 30, 20_000, rng=np.random.default_rng(1), chunk_size=1_000)
+    for key, value in exact["projected_range"].items():
+        assert chunked["projected_range"][key] == pytest.approx(value, rel=1e-3)
+    for key in ("var_95_percent", "max_drawdown_95_percent"):
+        assert chunked["metrics"][key] == pytest.approx(exact["metrics"][key], abs=0.05)
+    bull, base, bear = (exact["projected_range"][k] for k in ("bull_case_95", "base_case_50", "bear_case_05"))
+    assert bear < base < bull
+
+
+def test_simulation_is_reproducible_and_leaves_the_input_alone():
+    df = price_history()
+    before = df.copy()
+    first = MonteCarloSimulator.run_simulation(df, rng=np.random.default_rng(2))
+    second = MonteCarloSimulator.run_simulation(df, rng=np.random.default_rng(2))
+    assert first == second
+    pd.testing.assert_frame_equal(df, before)
+    assert "error" in MonteCarloSimulator.run_simulation(df.iloc[:10])
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from data.order_book import BookSide, OrderBook
+
+
+@pytest.mark.parametrize("is_bid", [True, False])
+def test_book_side_matches_a_sorted_dict(monkeypatch, is_bid):
+    """
+    Random level changes across many chunk splits and removals, checked against a plain dict.
+    """
+    monkeypatch.setattr(BookSide, "CHUNK", 4)
+    side, reference = BookSide(is_bid), {}
+    rng = random.Random(7)
+    for step in range(5000):
+        price = float(rng.randrange(400))
+        quantity = 0.0 if rng.random() < 0.4 else rng.random()
+        side.set(price, quantity)
+        if quantity:
+            reference[price] = quantity
+        else:
+            reference.pop(price, None)
+        if step % 500 == 499:
+            side.trim(150)
+            ordered = sorted(reference, reverse=is_bid)
+            reference = {p: reference[p] for p in ordered[:150]}
+
+        ordered = sorted(reference, reverse=is_bid)
+        assert len(side) == len(reference)
+        assert side.best() == (ordered[0] if ordered else None)
+        assert all(len(chunk) <= 2 * BookSide.CHUNK for chunk in side.chunks)
+        if step % 50 == 0:
+            assert side.top(10) == [(p, reference[p]) for p in ordered[:10]]
+            assert [p for chunk in side.chunks for p in chunk] == sorted(reference)
+            assert side.maxes == [chunk[-1] for chunk in side.chunks]
+
+
+def test_order_book_resyncs_on_a_gap():
+    book = OrderBook("BTC/USDT")
+    snapshot = {'bids': [["100", "1"], ["99", "2"]], 'asks': [["101", "1"], ["102", "3"]], 'nonce': 10}
+    assert book.apply_snapshot(snapshot, [{'U': 5, 'u': 9, 'b': [], 'a': []}])
+    assert book.apply_diff({'U': 11, 'u': 12, 'b': [["100", "0"], ["99.5", "4"]], 'a': [["100.5", "1"]]})
+    assert (book.best_bid, book.best_ask, book.spread) == (99.5, 100.5, 1.0)
+    assert book.snapshot(2)["bids"] == [(99.5, 4.0), (99.0, 2.0)]
+    assert not book.apply_diff({'U': 14, 'u': 15, 'b': [], 'a': []})
+    assert not book.synced
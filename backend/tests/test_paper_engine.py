@@ -0,0 +1,69 @@
+import pytest
+
+from execution.paper_engine import PaperExecutionEngine, TriggerBook
+from execution.portfolio import PortfolioManager
+
+
+def test_trigger_book_fires_crossed_levels_once():
+    book = TriggerBook()
+    book.add(95.0, ("a", "STOP_LOSS"), fires_below=True)
+    book.add(90.0, ("b", "STOP_LOSS"), fires_below=True)
+    book.add(110.0, ("a", "TAKE_PROFIT"), fires_below=False)
+    book.add(105.0, ("c", "STOP_LOSS"), fires_below=False) # A short's stop
+    assert book.crossed(100.0) == []
+    assert book.crossed(95.0) == [("a", "STOP_LOSS")]      # Touching a level fires it
+    assert book.crossed(96.0) == []                        # ...and only once
+    assert sorted(book.crossed(120.0)) == [("a", "TAKE_PROFIT"), ("c", "STOP_LOSS")]
+    assert book.crossed(50.0) == [("b", "STOP_LOSS")]
+    assert len(book) == 0
+
+
+def test_trigger_book_compacts_closed_positions():
+    book = TriggerBook()
+    for i in range(10):
+        book.add(100.0 - i, (f"p{i}", "STOP_LOSS"), fires_below=True)
+        book.add(110.0 + i, (f"p{i}", "TAKE_PROFIT"), fires_below=False)
+    book.compact(lambda position_id: position_id in {"p2", "p7"})
+    assert len(book) == 4
+    assert book.below_levels == [93.0, 98.0] and book.above_levels == [112.0, 117.0]
+    assert sorted(book.crossed(0.0)) == [("p2", "STOP_LOSS"), ("p7", "STOP_LOSS")]
+
+
+def tick(symbol: str, price: float) -> dict:
+    return {"symbol": symbol, "price": price}
+
+
+def test_engine_closes_positions_at_the_tick_price():
+    account = PortfolioManager(100_000.0)
+    pins = []
+    engine = PaperExecutionEngine(account, pin_symbol=lambda s: pins.append(("pin", s)),
+                                  unpin_symbol=lambda s: pins.append(("unpin", s)))
+    account.open_position("BTC/USDT", "long", 100.0, 10.0, sl=95.0, tp=110.0)
+    short = engine.account("alice", create=True)
+    short.open_position("BTC/USDT", "short", 100.0, 5.0, sl=108.0, tp=90.0)
+    assert pins == [("pin", "BTC/USDT")] # Once per symbol, not per position
+
+    engine.on_tick(tick("BTC/USDT", 104.0))
+    assert engine.open_pnl("BTC/USDT") == pytest.approx(10 * 4.0 - 5 * 4.0)
+    engine.on_tick(tick("BTC/USDT", 109.0)) # Gaps through the short's stop
+    assert "BTC/USDT" not in short.positions
+    assert (short.trade_history[-1]["exit_price"], short.trade_history[-1]["reason"]) == (109.0, "STOP_LOSS")
+    engine.on_tick(tick("BTC/USDT", 111.0))
+    assert "BTC/USDT" not in account.positions
+    assert engine.stats["stop_losses"] == 1 and engine.stats["take_profits"] == 1
+    assert engine.get_stats()["open_positions"] == 0 and not engine.books
+    assert pins == [("pin", "BTC/USDT"), ("unpin", "BTC/USDT")] # When the last one closed
+
+
+def test_manual_close_disarms_levels():
+    account = PortfolioManager(100_000.0)
+    engine = PaperExecutionEngine(account)
+    for i in range(100):
+        account.open_position(f"S{i}/USDT", "long", 100.0, 1.0, sl=90.0, tp=110.0)
+    account.close_position("S0/USDT", 100.0)
+    account.open_position("S0/USDT", "long", 100.0, 1.0, sl=80.0, tp=120.0)
+    engine.on_tick(tick("S0/USDT", 85.0)) # The old stop at 90 must not close the new position
+    assert "S0/USDT" in account.positions
+    engine.on_tick(tick("S0/USDT", 79.0))
+    assert "S0/USDT" not in account.positions
+    assert engine.stats["stop_losses"] == 1
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.portfolio_risk import PortfolioRiskEngine, PortfolioRiskModel, ewma_covariance, shrinkage_covariance
+
+SYMBOLS = ["AAPL", "BTC/USDT", "ETH/USDT"]
+
+
+def daily_returns(days: int = 300, seed: int = 8) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    return np.column_stack([market * beta + rng.normal(0, 0.008, days) for beta in (0.8, 1.5, 2.0)])
+
+
+def reference_ledoit_wolf(x: np.ndarray) -> np.ndarray:
+    """
+    Ledoit & Wolf (2004), Lemma 3.2 / 3.3, term by term.
+    """
+    t, n = x.shape
+    x = x - x.mean(axis=0)
+    s = x.T @ x / t
+    m = np.trace(s) / n
+    d2 = np.linalg.norm(s - m * np.eye(n), 'fro') ** 2 / n
+    b2_bar = sum(np.linalg.norm(np.outer(row, row) - s, 'fro') ** 2 / n for row in x) / t ** 2
+    b2 = min(b2_bar, d2)
+    return b2 / d2 * m * np.eye(n) + (d2 - b2) / d2 * s
+
+
+def test_shrinkage_matches_the_reference():
+    returns = daily_returns(60) # Few days for three assets: noticeable shrinkage
+    np.testing.assert_allclose(shrinkage_covariance(returns), reference_ledoit_wolf(returns), rtol=1e-10)
+    weights = 0.94 ** np.arange(59, -1, -1)
+    expected = (returns * (weights / weights.sum())[:, None]).T @ returns
+    np.testing.assert_allclose(ewma_covariance(returns), expected, rtol=1e-10)
+
+
+def test_cvar_contributions_sum_to_cvar_and_standalone_var():
+    cov = np.cov(daily_returns(), rowvar=False)
+    model = PortfolioRiskModel(SYMBOLS, cov, 1, 50_000, 7_000, np.random.default_rng(1))
+    result = model.evaluate(np.array([40_000.0, -25_000.0, 15_000.0]), 0.95)
+    assert result["contributions"].sum() == pytest.approx(result["cvar"], rel=1e-5)
+    assert result["cvar"] > result["var"] > 0
+
+    # A single position's standalone VaR is the portfolio VaR; shorts lose in the upper tail
+    for i, exposure in ((0, 10_000.0), (1, -10_000.0)):
+        alone = np.zeros(3)
+        alone[i] = exposure
+        single = model.evaluate(alone, 0.95)
+        assert single["standalone_var"][i] == pytest.approx(single["var"], rel=1e-2)
+        expected = 1.645 * np.sqrt(cov[i, i]) * abs(exposure)
+        assert single["var"] == pytest.approx(expected, rel=0.05)
+
+
+def test_size_and_price_changes_reuse_the_model():
+    returns = daily_returns()
+    closes = 100 * np.exp(np.cumsum(returns, axis=0))
+    index = pd.date_range("2025-01-01", periods=len(closes), freq="D")
+    loads = []
+
+    async def loader(symbol, limit):
+        loads.append(symbol)
+        return pd.DataFrame({"timestamp": index, "close": closes[:, SYMBOLS.index(symbol)]})
+
+    prices = {}
+    engine = PortfolioRiskEngine(loader, price_source=prices.get, num_paths=20_000, seed=3)
+
+    def position(side, size, price=100.0):
+        return SimpleNamespace(side=side, size=size, entry_price=price)
+
+    async def scenario():
+        book = {"AAPL": position("long", 10), "BTC/USDT": position("short", 5)}
+        first = await engine.evaluate(book)
+        doubled = await engine.evaluate({s: position(p.side, p.size * 2) for s, p in book.items()})
+        prices["AAPL"] = 120.0
+        repriced = await engine.evaluate(book)
+        builds = engine.stats["model_builds"]
+        book["ETH/USDT"] = position("long", 1)
+        await engine.evaluate(book)
+        return first, doubled, repriced, builds
+
+    first, doubled, repriced, builds = asyncio.run(scenario())
+    assert builds == 1 and engine.stats["model_builds"] == 2 # Only the new symbol rebuilt it
+    assert loads == ["AAPL", "BTC/USDT", "ETH/USDT"]         # Histories loaded once each
+    assert doubled["var"] == pytest.approx(2 * first["var"], rel=1e-5)
+    assert repriced["positions"][0]["exposure"] == 1200.0
+    assert first["unmodeled"] == []
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from data.price_stream import PriceStreamClient, PriceStreamHub
+
+
+def tick(symbol: str, price: float):
+    return SimpleNamespace(symbol=symbol, price=price, timestamp=0)
+
+
+class SlowSocket:
+    """
+    Stands in for WebSocket.send_json, taking `delay` seconds per frame.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.frames = []
+
+    async def send(self, frame: dict):
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+
+async def feed(client: PriceStreamClient, duration: float):
+    price = 100.0
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration
+    while not client.closed and loop.time() < end:
+        price += 1.0
+        client.push("BTC/USDT", {"price": price})
+        await asyncio.sleep(0.005)
+
+
+def test_hub_conflates_ticks_into_one_frame_per_interval():
+    socket = SlowSocket(0.02)
+    requested = []
+    hub = PriceStreamHub(on_symbol_requested=requested.append)
+    client = PriceStreamClient(socket.send, max_rate=10.0)
+    hub.add(client)
+    assert hub.subscribe(client, ["BTC/USDT", "ETH/USDT"], {"BTC/USDT": 99.0}) == {"BTC/USDT", "ETH/USDT"}
+
+    async def scenario():
+        sender = asyncio.create_task(client.run())
+        await asyncio.sleep(0.01) # The snapshot goes out first
+        for i in range(50):
+            hub.on_tick(tick("BTC/USDT", 100.0 + i))
+            hub.on_tick(tick("SOL/USDT", 1.0)) # Nobody subscribed
+        await asyncio.sleep(0.2)
+        client.closed = True
+        sender.cancel()
+
+    asyncio.run(scenario())
+    assert requested == ["BTC/USDT", "ETH/USDT"]
+    assert [frame["data"]["BTC/USDT"]["price"] for frame in socket.frames] == [99.0, 149.0]
+    assert client.updates_conflated == 49
+
+    hub.remove(client)
+    assert not hub.by_symbol and hub.stats()["clients"] == 0
+
+
+def test_slow_client_is_downgraded_then_disconnected():
+    socket = SlowSocket(0.12)
+    client = PriceStreamClient(socket.send, max_rate=40.0, min_rate=10.0)
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(client.run(), feed(client, 2.0)), timeout=3.0)
+
+    asyncio.run(scenario())
+    assert client.closed
+    assert client.downgrades == 2 and client.rate == 10.0 # 40 -> 20 -> 10, then too slow at the floor
+    assert client.frames_sent == 3
+
+
+def test_stalled_send_disconnects():
+    socket = SlowSocket(10.0)
+    client = PriceStreamClient(socket.send, send_timeout=0.05)
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(client.run(), feed(client, 2.0)), timeout=3.0)
+
+    asyncio.run(scenario())
+    assert client.closed and client.frames_sent == 0
@@ -0,0 +1,78 @@
+import asyncio
+from types import SimpleNamespace
+
+import data.quote_cache as quote_cache
+from data.quote_cache import QuoteCache
+
+
+class Upstream:
+    """
+    Batch fetcher that records each call; symbols starting with NONE have no data.
+    """
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.calls = []
+        self.fail = False
+
+    async def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return {s: {"price": float(len(self.calls))} for s in symbols if not s.startswith("NONE")}
+
+
+def test_concurrent_misses_share_one_batched_fetch():
+    upstream = Upstream()
+    cache = QuoteCache(upstream, batch_window=0.02)
+
+    async def scenario():
+        results = await asyncio.gather(
+            cache.get("AAPL"),
+            cache.get_many(["AAPL", "MSFT"]),
+            cache.get_many(["MSFT", "NONE1"]),
+        )
+        return results, len(cache._fetch_tasks)
+
+    (aapl, pair, other), tasks_left = asyncio.run(scenario())
+    assert upstream.calls == [["AAPL", "MSFT", "NONE1"]]
+    assert aapl == {"price": 1.0} and pair["MSFT"] == other["MSFT"] == {"price": 1.0}
+    assert other["NONE1"] is None
+    assert cache.stats["coalesced"] == 2 and cache.stats["upstream_calls"] == 1
+    assert tasks_left == 0 # Finished fetch tasks aren't kept around
+
+
+def test_batches_are_split_at_max_batch():
+    upstream = Upstream()
+    cache = QuoteCache(upstream, max_batch=2)
+    asyncio.run(cache.get_many(["A", "B", "C", "D", "E"]))
+    assert upstream.calls == [["A", "B"], ["C", "D"], ["E"]]
+
+
+def test_ttl_stale_and_negative_entries(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(quote_cache, "time", SimpleNamespace(monotonic=lambda: clock[0])) # Not the loop's clock
+    upstream = Upstream(delay=0.0)
+    cache = QuoteCache(upstream, ttl=30.0, stale_ttl=600.0, negative_ttl=120.0, batch_window=0.0)
+
+    async def scenario():
+        await cache.get_many(["AAPL", "NONE1"])
+        clock[0] += 10
+        fresh = await cache.get_many(["AAPL", "NONE1"]) # Both from memory, the miss included
+        clock[0] += 60
+        stale = await cache.get("AAPL")                   # Served at once, refreshed behind
+        await asyncio.sleep(0.01)
+        refreshed = await cache.get("AAPL")
+        clock[0] += 120
+        upstream.fail = True
+        kept = await cache.get_many(["AAPL", "NONE1"])   # Stale AAPL and expired NONE1, refetched together
+        return fresh, stale, refreshed, kept
+
+    fresh, stale, refreshed, kept = asyncio.run(scenario())
+    assert fresh == {"AAPL": {"price": 1.0}, "NONE1": None}
+    assert stale == {"price": 1.0} and refreshed == {"price": 2.0}
+    assert kept == {"AAPL": {"price": 2.0}, "NONE1": None}
+    assert upstream.calls == [["AAPL", "NONE1"], ["AAPL"], ["AAPL", "NONE1"]]
+    assert cache.stats["hits"] == 2 and cache.stats["stale_hits"] == 2
+    assert cache._entries["AAPL"] == (1070.0, {"price": 2.0}) # The failed fetch isn't cached
@@ -0,0 +1,61 @@
+import asyncio
+
+from data.exchange_sim import ExchangeSimulator
+from data.fanout import FanOut
+from data.live_feed import LiveDataManager
+from data.recorder import FeedRecorder, FeedReplayer, read_records, recording_files
+
+
+def test_recorded_session_replays_the_same_events(tmp_path):
+    """
+    Records a short session from the local stand-in, then replays it as fast as possible
+    into slow consumers: every event comes back, in order.
+    """
+    live_ticks, live_klines = [], []
+
+    async def record():
+        simulator = ExchangeSimulator(["BTCUSDT", "ETHUSDT"], rate=2000)
+        await simulator.start()
+        recorder = FeedRecorder(str(tmp_path))
+        manager = LiveDataManager(["BTC/USDT", "ETH/USDT"], ws_url=simulator.ws_url, recorder=recorder)
+        manager.writer.start = lambda: None # No database here
+
+        async def no_writes():
+            pass
+
+        manager.writer.stop = no_writes
+        manager.register_callback(lambda event: live_ticks.append((event.symbol, event.price)), policy='inline')
+        manager.market_fanout.subscribe(lambda event_type, symbol, payload: live_klines.append(payload['E']),
+                                        policy='inline')
+        task = asyncio.create_task(manager.start())
+        try:
+            await asyncio.sleep(0.5)
+        finally:
+            await simulator.stop()
+            await manager.stop() # Closes (and flushes) the recording
+            task.cancel()
+        return recorder.records
+
+    async def replay():
+        ticker_fanout, market_fanout = FanOut(), FanOut()
+        ticks, klines = [], []
+
+        async def slow_ticks(event):
+            await asyncio.sleep(0)
+            ticks.append((event.symbol, event.price))
+
+        ticker_fanout.subscribe(slow_ticks, maxsize=300)
+        market_fanout.subscribe(lambda event_type, symbol, payload: klines.append(payload['E']), maxsize=300)
+        replayer = FeedReplayer(str(tmp_path), speed=None, ticker_fanout=ticker_fanout,
+                                market_fanout=market_fanout, wait_for_consumers=True)
+        messages = await replayer.run()
+        return messages, ticks, klines, replayer
+
+    recorded = asyncio.run(record())
+    assert recorded > 200
+    assert sum(1 for path in recording_files(str(tmp_path)) for _ in read_records(path)) == recorded
+
+    messages, ticks, klines, replayer = asyncio.run(replay())
+    assert messages == recorded
+    assert ticks == live_ticks and klines == live_klines
+    assert replayer.latest_prices == dict(live_ticks)
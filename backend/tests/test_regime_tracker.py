@@ -0,0 +1,58 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.regime_tracker import RegimeTracker
+
+
+def hourly_bars(n: int) -> pd.DataFrame:
+    end = (int(time.time()) // 3600 - 2) * 3600 # All closed
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(np.arange(end - (n - 1) * 3600, end + 1, 3600), unit='s'),
+        "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.uniform(100, 200, n),
+    })
+
+
+def test_sync_on_the_executor_and_bar_closes_apply_each_bar_once():
+    tracker = RegimeTracker()
+    df = hourly_bars(400)
+    tracker.sync("BTC/USDT", df.iloc[:300])
+    assert tracker.stats["updates"] == 200 # Seeded from the last 200 bars
+
+    async def scenario():
+        with ThreadPoolExecutor(1) as executor:
+            synced = asyncio.get_running_loop().run_in_executor(executor, tracker.sync, "BTC/USDT", df)
+            for row in df.iloc[300:].itertuples():
+                tracker.on_bar_close("BTC/USDT", {"timestamp": int(row.timestamp.timestamp() * 1000),
+                                                  "high": row.high, "low": row.low, "close": row.close,
+                                                  "volume": row.volume})
+                await asyncio.sleep(0)
+            return await synced
+
+    report = asyncio.run(scenario())
+    assert tracker.stats["updates"] == 300
+    assert tracker.last_timestamp("BTC/USDT") == int(df['timestamp'].iloc[-1].timestamp() * 1000)
+
+    fresh = RegimeTracker()
+    fresh.sync("BTC/USDT", df.iloc[:300])
+    fresh.sync("BTC/USDT", df)
+    assert report == fresh.get("BTC/USDT")
+
+
+def test_daily_bars_are_refused_and_never_seed_state():
+    tracker = RegimeTracker()
+    daily = hourly_bars(300)
+    daily["timestamp"] = pd.date_range(end=pd.Timestamp.now().normalize(), periods=300, freq="D") # Forming bar last
+    assert tracker.sync("AAPL", daily) is None
+    assert tracker.stats["rejected"] == 1
+
+    tracker.on_bar_close("AAPL", {"timestamp": int(time.time() // 3600 * 3600 * 1000),
+                                  "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0})
+    assert "AAPL" not in tracker.states
+    assert tracker.stats["updates"] == 0
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from data.resample import ResampleCache, resample_ohlcv
+
+
+def minute_bars(n: int, start: str = "2024-01-01 00:07") -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    close = 100 + rng.standard_normal(n).cumsum()
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=n, freq="1min"),
+        "open": close + rng.standard_normal(n) * 0.1,
+        "high": close + 1.0,
+        "low": close - 1.0,
+        "close": close,
+        "volume": rng.uniform(1, 10, n),
+    })
+
+
+def test_sliding_limit_window_extends_instead_of_rebuilding():
+    bars = minute_bars(3000)
+    cache = ResampleCache()
+    limit = 600
+    for end in range(limit, len(bars), 37):
+        window = bars.iloc[end - limit:end].reset_index(drop=True)
+        result = cache.get("BTC/USDT", window, "1m", "1h")
+        pdt.assert_frame_equal(result, resample_ohlcv(window, "1h"))
+    assert cache.stats["rebuilds"] == 1
+    assert cache.stats["extends"] > 0
+
+
+def test_growing_window_and_hits():
+    bars = minute_bars(500)
+    cache = ResampleCache()
+    for end in (100, 100, 250, 499):
+        window = bars.iloc[:end]
+        pdt.assert_frame_equal(cache.get("ETH/USDT", window, "1m", "15m"), resample_ohlcv(window, "15m"))
+    assert cache.stats == {"hits": 1, "extends": 2, "rebuilds": 1}
+
+
+def test_older_window_rebuilds():
+    bars = minute_bars(500)
+    cache = ResampleCache()
+    cache.get("SOL/USDT", bars.iloc[200:], "1m", "1h")
+    older = bars.iloc[:300]
+    pdt.assert_frame_equal(cache.get("SOL/USDT", older, "1m", "1h"), resample_ohlcv(older, "1h"))
+    assert cache.stats["rebuilds"] == 2
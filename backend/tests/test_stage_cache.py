@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from analysis.institutional import StageCache
+
+
+def counter():
+    calls = []
+
+    async def compute(result="ok", delay=0.01):
+        calls.append(result)
+        await asyncio.sleep(delay)
+        return result
+
+    return calls, compute
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = StageCache()
+    calls, compute = counter()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("monte_carlo", "BTC", "bar1", compute)
+                                      for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 5
+    assert len(calls) == 1
+    assert cache.stats == {"hits": 4, "misses": 1}
+
+
+def test_new_key_and_invalidate_recompute():
+    cache = StageCache()
+    calls, compute = counter()
+
+    async def scenario():
+        await cache.get_or_compute("monte_carlo", "BTC", "bar1", compute)
+        await cache.get_or_compute("monte_carlo", "BTC", "bar1", compute)
+        await cache.get_or_compute("monte_carlo", "BTC", "bar2", compute) # New bar
+        await cache.get_or_compute("monte_carlo", "ETH", "bar2", compute)
+        cache.invalidate("BTC")
+        await cache.get_or_compute("monte_carlo", "BTC", "bar2", compute)
+        await cache.get_or_compute("monte_carlo", "ETH", "bar2", compute)
+
+    asyncio.run(scenario())
+    assert len(calls) == 4
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_error_results_and_exceptions_are_not_cached():
+    cache = StageCache()
+    calls, compute = counter()
+
+    async def failing():
+        calls.append("raise")
+        raise ConnectionError("upstream down")
+
+    async def scenario():
+        no_error = lambda result: "error" not in result
+        for _ in range(2):
+            await cache.get_or_compute("fundamentals", "BTC", "day", lambda: compute({"error": "x"}),
+                                       cacheable=no_error)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await cache.get_or_compute("fundamentals", "ETH", "day", failing)
+        await cache.get_or_compute("fundamentals", "SOL", "day", lambda: compute({"pe": 10}), cacheable=no_error)
+        await cache.get_or_compute("fundamentals", "SOL", "day", lambda: compute({"pe": 10}), cacheable=no_error)
+
+    asyncio.run(scenario())
+    assert len(calls) == 5 # 2 error results, 2 exceptions, 1 cached success
+    assert cache.get_stats()["entries"] == 1
+
+
+def test_oldest_entries_are_evicted():
+    cache = StageCache(max_entries=2)
+    _, compute = counter()
+
+    async def scenario():
+        for symbol in ("A", "B", "A", "C"):
+            await cache.get_or_compute("monte_carlo", symbol, "bar", compute)
+
+    asyncio.run(scenario())
+    assert [slot[1] for slot in cache._entries] == ["A", "C"]
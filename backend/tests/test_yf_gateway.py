@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from data.yf_gateway import YFinanceGateway
+
+
+class SlowBackend:
+    """
+    Blocks each info() call until released, counting upstream requests.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.fail = False
+
+    def info(self, symbol):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return {"symbol": symbol}
+
+
+def test_cancelled_caller_does_not_fail_the_others():
+    backend = SlowBackend()
+    gateway = YFinanceGateway(backend, rate=100, burst=100)
+
+    async def scenario():
+        first = asyncio.create_task(gateway.info("AAPL"))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(gateway.info("AAPL"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        backend.release.set()
+        return await second, first.cancelled()
+
+    try:
+        value, first_cancelled = asyncio.run(scenario())
+    finally:
+        gateway.shutdown()
+    assert value == {"symbol": "AAPL"}
+    assert first_cancelled
+    assert backend.calls == 1
+    assert gateway.stats["coalesced"] == 1
+    assert not gateway._inflight
+
+
+def test_shared_failure_reaches_every_caller():
+    backend = SlowBackend()
+    backend.fail = True
+    gateway = YFinanceGateway(backend, rate=100, burst=100)
+
+    async def scenario():
+        callers = [asyncio.create_task(gateway.info("AAPL")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        backend.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        gateway.shutdown()
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert backend.calls == 1
+    assert gateway.stats["errors"] == 1
@@ -142,6 +142,10 @@ export const marketAPI = {
         change: number;
         volume: number;
         rvol: number;
+        volatility?: number | null;
+        change7d?: number | null;
+        rangePosition?: number | null;
+        regime?: string | null;
         sector: string;
         marketCap: number;
     }>> {